@@ -3,6 +3,7 @@ import webview
 from flask import Flask, render_template, jsonify, request
 import threading
 from aws_manager import AWSManager
+from connections import ConnectionRegistry
 import logging
 
 # Setup Flask
@@ -12,7 +13,7 @@ app.config['DEBUG'] = True
 aws_manager = AWSManager()
 
 # Store active connections
-active_connections = []
+active_connections = ConnectionRegistry()
 
 # Configure detailed logging
 logging.basicConfig(
@@ -1,13 +1,50 @@
 import boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError, ProfileNotFound
 import logging
 import configparser
+import math
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from inventory_index import InventoryIndex
+from client_pool import ClientPool
+from single_flight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
+# Seconds an inventory snapshot is served as-is before a background revalidation starts
+DEFAULT_INVENTORY_TTL = 60
+
+# Instance IDs resolved per DescribeInstances call when details are missing or stale
+DETAILS_BATCH_SIZE = 200
+
+# Pseudo-region used as the cache key of the all-regions inventory
+ALL_REGIONS = '*'
+
+# Error codes returned by regions that are disabled or not opted in
+REGION_DISABLED_ERRORS = {'AuthFailure', 'OptInRequired', 'UnrecognizedClientException', 'InvalidClientTokenId'}
+
+def instance_summary(instance, has_ssm):
+    """Build the inventory dict of one describe_instances record
+
+    Snapshots, the inventory index and the NDJSON stream all use these
+    dicts as-is, so no intermediate row object is built per instance.
+    """
+    return {
+        'id': instance['InstanceId'],
+        'name': next((tag['Value'] for tag in instance.get('Tags', []) if tag['Key'] == 'Name'), 'N/A'),
+        'type': instance['InstanceType'],
+        'os': instance.get('PlatformDetails', 'N/A'),
+        'state': instance['State']['Name'],
+        'has_ssm': has_ssm,  # Boolean value indicating if instance has SSM
+    }
+
+
 class AWSManager:
-    def __init__(self):
+    def __init__(self, inventory_ttl=DEFAULT_INVENTORY_TTL):
+        self.client_pool = ClientPool()
         self.ssm_client = None
         self.ec2_client = None
         self.sts_client = None
@@ -16,6 +53,26 @@ class AWSManager:
         self.is_connected = False
         self.account_id = None
 
+        # Full describe_instances records: (profile, region) -> {instance_id: (record, fetched_at)}
+        self._instance_records = {}
+
+        # Inventory cache: (profile, region) -> {'data', 'fetched_at', 'refreshing', 'index'}
+        self.inventory_ttl = inventory_ttl
+        self._inventory_cache = {}
+        self._inventory_lock = threading.Lock()
+        # Concurrent fetches of the same snapshot share one set of AWS calls
+        self._inventory_flight = SingleFlight()
+        # Called with (profile, region) when a refresh returns a snapshot that differs from the cached one
+        self.on_inventory_changed = None
+
+        # All-regions fan-out: worker pool size and per-region timeout (seconds)
+        self.region_workers = 8
+        self.region_timeout = 30
+
+        # Multi-profile inventory: worker pool size and per-profile timeout (seconds)
+        self.profile_workers = 8
+        self.profile_timeout = 60
+
 
     def disconnect_profile_and_region(self):
         pass
@@ -46,13 +103,18 @@ class AWSManager:
 
     def set_profile_and_region(self, profile, region):
         try:
-            session = boto3.Session(profile_name=profile, region_name=region)
-            self.ssm_client = session.client('ssm')
-            self.ec2_client = session.client('ec2')
-            self.sts_client = session.client('sts')  # Initialize STS client
-
-            # Get AWS account ID
-            account_info = self.sts_client.get_caller_identity()
+            # Sessions and clients come from the pool so switching back to a
+            # recent profile/region reuses warm connections
+            try:
+                account_info = self._connect_clients(profile, region)
+            except ProfileNotFound:
+                raise
+            except Exception as e:
+                # The pooled session may hold expired credentials (e.g. before an
+                # SSO re-login): retry once on a fresh session before giving up
+                logger.info(f"Retrying connection to {profile}/{region} with a fresh session: {str(e)}")
+                self.client_pool.discard(profile, region)
+                account_info = self._connect_clients(profile, region)
             self.account_id = account_info['Account']
 
             self.profile = profile
@@ -69,6 +131,15 @@ class AWSManager:
             raise ValueError(f"Error connecting to AWS: {str(e)}")
 
 
+    def _connect_clients(self, profile, region):
+        """Take the pooled clients of (profile, region) and return the caller identity"""
+        self.ssm_client = self.client_pool.get_client(profile, region, 'ssm')
+        self.ec2_client = self.client_pool.get_client(profile, region, 'ec2')
+        self.sts_client = self.client_pool.get_client(profile, region, 'sts')  # Initialize STS client
+        # Get AWS account ID
+        return self.sts_client.get_caller_identity()
+
+
     def check_connection(self):
         if self.ec2_client is None:
             logger.warning("EC2 client not initialized")
@@ -83,62 +154,526 @@ class AWSManager:
         return self.is_connected
 
 
-    def list_ssm_instances(self):
-        """List all EC2 instances with their SSM status"""
+    def list_ssm_instances(self, force_refresh=False):
+        """List all EC2 instances with their SSM status
+
+        Serves the cached snapshot for the current (profile, region) when one
+        exists. Once the snapshot is older than inventory_ttl it is still
+        returned immediately and a background thread revalidates it
+        (stale-while-revalidate). force_refresh bypasses the cache and waits
+        for a fresh fetch.
+        """
         if not self.is_connected:
             logger.warning("Attempted to list instances without an active connection")
             return None
 
+        # Capture the clients now: the user may switch profile/region before a revalidation runs
+        key = (self.profile, self.region)
+        ssm_client, ec2_client = self.ssm_client, self.ec2_client
         try:
-            # Get all instances with SSM
-            paginator = self.ssm_client.get_paginator('describe_instance_information')
-            ssm_instance_ids = set()
-            for page in paginator.paginate():
-                for instance in page.get('InstanceInformationList', []):
-                    ssm_instance_ids.add(instance['InstanceId'])
+            return self._cached_inventory(
+                key,
+                lambda: self._fetch_instances(ssm_client, ec2_client, key),
+                force_refresh
+            )
+        except Exception as e:
+            logger.error(f"Error listing instances: {str(e)}")
+            if 'ExpiredTokenException' in str(e):
+                self.is_connected = False  # Set connection status to false
+                # Reconnecting must not get the session with the expired token back
+                self.client_pool.discard(*key)
+                return {'error': 'Authentication token expired. Please reconnect.'}
+            return None
 
-            logger.debug(f"Found {len(ssm_instance_ids)} instances with SSM: {ssm_instance_ids}")
 
-            # Get all EC2 instances
-            instances = []
-            paginator = self.ec2_client.get_paginator('describe_instances')
+    def iter_ssm_instances(self):
+        """Yield instance dicts (see instance_summary) as describe_instances pages arrive
 
+        A fresh cached snapshot is replayed without calling AWS. Otherwise the
+        SSM paginator runs on a worker thread while EC2 pages are consumed
+        here; rows are yielded page by page as soon as the SSM set is known,
+        so the first rows are available before the last EC2 page is fetched.
+        Rows come in AWS order, not in the sorted order of list_ssm_instances,
+        and a live stream is not stored in the inventory cache.
+        """
+        if not self.is_connected:
+            raise ValueError("Not connected to AWS")
+
+        with self._inventory_lock:
+            entry = self._inventory_cache.get((self.profile, self.region))
+        if entry and time.time() - entry['fetched_at'] < self.inventory_ttl:
+            yield from entry['data']
+            return
+
+        ssm_client, ec2_client = self.ssm_client, self.ec2_client
+        started = time.perf_counter()
+        count = 0
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='inventory') as executor:
+            ssm_future = executor.submit(self._fetch_ssm_instance_ids, ssm_client)
+            ssm_instance_ids = None
+            paginator = ec2_client.get_paginator('describe_instances')
             for page in paginator.paginate():
+                if ssm_instance_ids is None:
+                    ssm_instance_ids = ssm_future.result()
+                    logger.debug(f"First inventory page after {time.perf_counter() - started:.2f}s")
                 for reservation in page['Reservations']:
                     for instance in reservation['Instances']:
-                        instance_id = instance['InstanceId']
-                        # Explicitly check if the instance ID is in the SSM set
-                        has_ssm = instance_id in ssm_instance_ids
-
-                        instance_data = {
-                            'id': instance_id,
-                            'name': next((tag['Value'] for tag in instance.get('Tags', []) if tag['Key'] == 'Name'), 'N/A'),
-                            'type': instance['InstanceType'],
-                            'os': instance.get('PlatformDetails', 'N/A'),
-                            'state': instance['State']['Name'],
-                            'has_ssm': has_ssm  # Boolean value indicating if instance has SSM
-                        }
-                        logger.debug(f"Instance {instance_id} has_ssm: {has_ssm}")
-                        instances.append(instance_data)
-
-            # Sort instances: SSM instances first, then by name
-            instances.sort(key=lambda x: (not x['has_ssm'], x.get('name', '').lower()))
-
-            logger.info(f"Successfully listed {len(instances)} instances (with SSM: {len(ssm_instance_ids)})")
+                        count += 1
+                        yield instance_summary(instance, instance['InstanceId'] in ssm_instance_ids)
+
+        logger.info(f"Streamed {count} instances in {time.perf_counter() - started:.2f}s")
+
+
+    def get_inventory_index(self, force_refresh=False):
+        """Return the InventoryIndex of the current snapshot, building it once per snapshot
+
+        Returns None or {'error': ...} under the same conditions as list_ssm_instances.
+        """
+        instances = self.list_ssm_instances(force_refresh)
+        if not isinstance(instances, list):
             return instances
 
-        except Exception as e:
-            logger.error(f"Error listing instances: {str(e)}")
-            if 'ExpiredTokenException' in str(e):
-                self.is_connected = False  # Set connection status to false
+        with self._inventory_lock:
+            entry = self._inventory_cache.get((self.profile, self.region))
+            if entry is None or entry['data'] is not instances:
+                # Snapshot was replaced in the meantime; index what we were given
+                return InventoryIndex(instances)
+            if entry['index'] is None:
+                entry['index'] = InventoryIndex(instances)
+            return entry['index']
+
+
+    def warm_inventory(self):
+        """Start fetching the current snapshot in the background
+
+        A caller of list_ssm_instances arriving before the fetch completes
+        joins it through the single-flight instead of starting another one.
+
+        Returns:
+            'cached' if a snapshot was already cached, otherwise 'warming'.
+        """
+        if self.get_snapshot_age() is not None:
+            # Still goes through list_ssm_instances so a stale snapshot gets revalidated
+            self.list_ssm_instances()
+            return 'cached'
+
+        key = (self.profile, self.region)
+        ssm_client, ec2_client = self.ssm_client, self.ec2_client
+
+        def warm():
+            try:
+                self._refresh_inventory(key, lambda: self._fetch_instances(ssm_client, ec2_client, key))
+                logger.debug(f"Inventory for {key} warmed")
+            except Exception as e:
+                # The next list_ssm_instances call retries and reports the error
+                logger.error(f"Background inventory warm-up failed for {key}: {str(e)}")
+
+        threading.Thread(target=warm, daemon=True).start()
+        return 'warming'
+
+
+    def list_all_region_instances(self, force_refresh=False):
+        """List instances from every enabled region of the current profile
+
+        Regions are queried concurrently on a pool of region_workers threads.
+        A region that does not answer within region_timeout seconds is
+        reported as 'timeout' instead of holding up the merged list.
+
+        Returns:
+            dict with 'instances' (list, each tagged with 'region') and
+            'regions' (region name -> 'ok' | 'skipped' | 'timeout' | 'error: ...'),
+            None when not connected, or {'error': ...} if the token expired.
+        """
+        if not self.is_connected:
+            logger.warning("Attempted to list instances without an active connection")
+            return None
+
+        profile = self.profile
+        for attempt in range(2):
+            try:
+                return self._cached_inventory(
+                    (profile, ALL_REGIONS),
+                    lambda: self._fetch_all_regions(profile),
+                    force_refresh or attempt > 0
+                )
+            except Exception as e:
+                if 'ExpiredTokenException' not in str(e):
+                    logger.error(f"Error listing instances across regions: {str(e)}")
+                    return None
+                # The fan-out clients share the profile's pooled session: drop it
+                # so a refreshed token on disk is picked up, and try once more
+                self.client_pool.discard(profile, self.region)
+                if attempt == 0:
+                    logger.warning("Token expired listing instances across regions, retrying on a fresh session")
+                    continue
+                logger.error(f"Error listing instances across regions: {str(e)}")
+                self.is_connected = False
                 return {'error': 'Authentication token expired. Please reconnect.'}
+
+
+    def list_profiles_instances(self, profiles, region, force_refresh=False):
+        """Collect the inventory of several profiles in parallel and merge it by account
+
+        Each profile gets its own session and STS identity check, and its
+        instance list goes through the same (profile, region) cache used by
+        list_ssm_instances. A profile that fails or exceeds profile_timeout
+        is reported in 'profiles' instead of failing the whole call.
+        Profiles that resolve to the same account are merged without
+        duplicating instances.
+
+        Args:
+            profiles: profile names from ~/.aws/config.
+            region: region to query for every profile.
+
+        Returns:
+            dict with 'instances' (list, each tagged with 'account_id' and
+            'profile'), 'accounts' (account ID -> {'profiles', 'instance_count'})
+            and 'profiles' (profile -> {'status': 'ok' | 'error' | 'timeout', ...}).
+        """
+        started = time.perf_counter()
+        instances = []
+        accounts = {}
+        statuses = {}
+        seen = set()
+
+        executor = ThreadPoolExecutor(max_workers=self.profile_workers, thread_name_prefix='profile')
+        try:
+            futures = {
+                executor.submit(self._fetch_profile_inventory, profile, region, force_refresh): profile
+                for profile in profiles
+            }
+            waves = max(1, math.ceil(len(futures) / self.profile_workers))
+            done, not_done = wait(futures, timeout=self.profile_timeout * waves)
+
+            for future in done:
+                profile = futures[future]
+                try:
+                    account_id, profile_instances = future.result()
+                except Exception as e:
+                    logger.warning(f"Inventory for profile {profile} failed: {str(e)}")
+                    statuses[profile] = {'status': 'error', 'error': str(e)}
+                    continue
+
+                account = accounts.setdefault(account_id, {'profiles': [], 'instance_count': 0})
+                account['profiles'].append(profile)
+                for instance in profile_instances:
+                    if (account_id, instance['id']) in seen:
+                        continue
+                    seen.add((account_id, instance['id']))
+                    instances.append({**instance, 'account_id': account_id, 'profile': profile})
+                    account['instance_count'] += 1
+                statuses[profile] = {
+                    'status': 'ok',
+                    'account_id': account_id,
+                    'instance_count': len(profile_instances)
+                }
+
+            for future in not_done:
+                profile = futures[future]
+                logger.warning(f"Inventory for profile {profile} did not finish within {self.profile_timeout}s")
+                statuses[profile] = {'status': 'timeout'}
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        instances.sort(key=lambda x: (not x['has_ssm'], x.get('name', '').lower(), x['account_id']))
+
+        logger.info(
+            f"Listed {len(instances)} instances from {len(accounts)} accounts "
+            f"({len(profiles)} profiles) in {time.perf_counter() - started:.2f}s"
+        )
+        return {'instances': instances, 'accounts': accounts, 'profiles': statuses}
+
+
+    def _fetch_profile_inventory(self, profile, region, force_refresh=False):
+        """Resolve the account of profile and return (account_id, instances) for region"""
+        config = self._profile_client_config()
+        account_id = self.client_pool.get_client(
+            profile, region, 'sts', config, variant='profiles'
+        ).get_caller_identity()['Account']
+        ssm_client = self.client_pool.get_client(profile, region, 'ssm', config, variant='profiles')
+        ec2_client = self.client_pool.get_client(profile, region, 'ec2', config, variant='profiles')
+        instances = self._cached_inventory(
+            (profile, region),
+            lambda: self._fetch_instances(ssm_client, ec2_client, (profile, region)),
+            force_refresh
+        )
+        return account_id, instances
+
+
+    def get_snapshot_age(self, region=None):
+        """Return the age in seconds of the current profile's inventory snapshot, or None if there is none
+
+        Args:
+            region: region of the snapshot, ALL_REGIONS for the fan-out
+                    snapshot; defaults to the connected region.
+        """
+        with self._inventory_lock:
+            entry = self._inventory_cache.get((self.profile, region or self.region))
+        if not entry:
             return None
+        return round(time.time() - entry['fetched_at'], 1)
+
+
+    def invalidate_inventory(self, profile=None, region=None):
+        """Drop cached snapshots and instance records; with no arguments everything is cleared"""
+        with self._inventory_lock:
+            if profile is None and region is None:
+                self._inventory_cache.clear()
+                self._instance_records.clear()
+            else:
+                self._inventory_cache.pop((profile, region), None)
+                self._instance_records.pop((profile, region), None)
+
+
+    def _cached_inventory(self, key, fetch, force_refresh=False):
+        """Return the cached snapshot for key, fetching it with fetch() when missing or forced
+
+        A snapshot older than inventory_ttl is returned as-is while a
+        background revalidation is started. Exceptions from a synchronous
+        fetch propagate to the caller.
+        """
+        with self._inventory_lock:
+            entry = self._inventory_cache.get(key)
+
+        if entry and not force_refresh:
+            age = time.time() - entry['fetched_at']
+            if age >= self.inventory_ttl:
+                self._revalidate_inventory(key, fetch)
+            logger.debug(f"Serving inventory snapshot for {key} (age {age:.1f}s)")
+            return entry['data']
+
+        return self._refresh_inventory(key, fetch)
+
+
+    def _refresh_inventory(self, key, fetch):
+        """Fetch a fresh snapshot and store it in the cache under key
+
+        Callers arriving while a fetch for the same key is in flight wait for
+        that fetch instead of starting their own.
+        """
+        def fetch_and_store():
+            data = fetch()
+            with self._inventory_lock:
+                previous = self._inventory_cache.get(key)
+                self._inventory_cache[key] = {
+                    'data': data,
+                    'fetched_at': time.time(),
+                    'refreshing': False,
+                    'index': None,
+                }
+            if previous is not None and previous['data'] != data and self.on_inventory_changed:
+                try:
+                    self.on_inventory_changed(*key)
+                except Exception as e:
+                    logger.error(f"Inventory change callback failed for {key}: {str(e)}")
+            return data
+
+        return self._inventory_flight.do(key, fetch_and_store)
+
+
+    def get_inventory_stats(self):
+        """Return inventory fetch counters: fetches executed and calls coalesced onto them"""
+        return self._inventory_flight.stats()
+
+
+    def _revalidate_inventory(self, key, fetch):
+        """Refresh the snapshot for key in a background thread, at most one at a time"""
+        with self._inventory_lock:
+            entry = self._inventory_cache.get(key)
+            if entry is None or entry['refreshing']:
+                return
+            entry['refreshing'] = True
+
+        def revalidate():
+            try:
+                self._refresh_inventory(key, fetch)
+                logger.debug(f"Inventory snapshot for {key} revalidated")
+            except Exception as e:
+                logger.error(f"Background inventory refresh failed for {key}: {str(e)}")
+                with self._inventory_lock:
+                    if key in self._inventory_cache:
+                        self._inventory_cache[key]['refreshing'] = False
+
+        threading.Thread(target=revalidate, daemon=True).start()
+
+
+    def _get_enabled_regions(self, profile):
+        """Return the regions from get_regions() that are enabled for the account
+
+        describe_regions without AllRegions only returns regions that need no
+        opt-in or have been opted in. If that call fails every known region is
+        returned and disabled ones are filtered out by their error code later.
+        """
+        regions = self.get_regions()
+        try:
+            ec2 = self.client_pool.get_client(profile, self.region, 'ec2')
+            enabled = {r['RegionName'] for r in ec2.describe_regions()['Regions']}
+        except Exception as e:
+            logger.warning(f"Could not determine enabled regions, querying all: {str(e)}")
+            return regions
+        return [r for r in regions if r in enabled]
+
+
+    def _profile_client_config(self):
+        """Client config that lets a profile worker give up close to profile_timeout
+
+        wait() in list_profiles_instances only stops waiting; without short
+        socket timeouts a stuck worker would keep its thread for minutes.
+        """
+        return Config(
+            connect_timeout=5,
+            read_timeout=max(5, self.profile_timeout // 2),
+            retries={'max_attempts': 2}
+        )
+
+
+    def _region_client_config(self):
+        """Client config that keeps a single slow region from stalling the fan-out"""
+        return Config(
+            connect_timeout=5,
+            read_timeout=self.region_timeout,
+            retries={'max_attempts': 2}
+        )
+
+
+    def _fetch_all_regions(self, profile):
+        """Query every enabled region concurrently and merge the results"""
+        started = time.perf_counter()
+        regions = self._get_enabled_regions(profile)
+
+        # Clients are created up front on one per-profile session; short-timeout
+        # variants are kept apart from the interactive clients of the same region
+        config = self._region_client_config()
+        clients = {
+            region: (self.client_pool.get_regional_client(profile, region, 'ssm', config, variant='fanout'),
+                     self.client_pool.get_regional_client(profile, region, 'ec2', config, variant='fanout'))
+            for region in regions
+        }
+
+        instances = []
+        statuses = {}
+        executor = ThreadPoolExecutor(max_workers=self.region_workers, thread_name_prefix='region')
+        try:
+            futures = {
+                executor.submit(self._fetch_instances, ssm_client, ec2_client, (profile, region)): region
+                for region, (ssm_client, ec2_client) in clients.items()
+            }
+            # Regions queued behind a full pool get their own timeout window
+            waves = max(1, math.ceil(len(futures) / self.region_workers))
+            done, not_done = wait(futures, timeout=self.region_timeout * waves)
+
+            for future in done:
+                region = futures[future]
+                try:
+                    for instance in future.result():
+                        instance['region'] = region
+                        instances.append(instance)
+                    statuses[region] = 'ok'
+                except ClientError as e:
+                    code = e.response.get('Error', {}).get('Code', '')
+                    if code in REGION_DISABLED_ERRORS:
+                        logger.debug(f"Skipping region {region}: {code}")
+                        statuses[region] = 'skipped'
+                    else:
+                        if code == 'ExpiredTokenException':
+                            raise
+                        logger.warning(f"Region {region} failed: {str(e)}")
+                        statuses[region] = f'error: {str(e)}'
+                except Exception as e:
+                    logger.warning(f"Region {region} failed: {str(e)}")
+                    statuses[region] = f'error: {str(e)}'
+
+            for future in not_done:
+                region = futures[future]
+                logger.warning(f"Region {region} did not answer within {self.region_timeout}s")
+                statuses[region] = 'timeout'
+        finally:
+            # Do not wait for timed-out regions; their threads finish on their own
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        instances.sort(key=lambda x: (not x['has_ssm'], x.get('name', '').lower(), x['region']))
+
+        ok = sum(1 for status in statuses.values() if status == 'ok')
+        logger.info(
+            f"Listed {len(instances)} instances from {ok}/{len(regions)} regions "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
+        return {'instances': instances, 'regions': statuses}
+
+
+    def _fetch_instances(self, ssm_client, ec2_client, records_key=None):
+        """Run the SSM and EC2 paginators concurrently and return the merged instance list
+
+        When records_key (profile, region) is given, the full describe_instances
+        records are kept in the instance record store so details can be served
+        without another API call.
+        """
+        def timed(fetch, client):
+            started = time.perf_counter()
+            result = fetch(client)
+            return result, time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix='inventory') as executor:
+            ssm_future = executor.submit(timed, self._fetch_ssm_instance_ids, ssm_client)
+            ec2_future = executor.submit(timed, self._fetch_ec2_instances, ec2_client)
+            ssm_instance_ids, ssm_elapsed = ssm_future.result()
+            ec2_instances, ec2_elapsed = ec2_future.result()
+
+        if records_key is not None:
+            self._store_instance_records(records_key, ec2_instances, replace=True)
+
+        logger.debug(f"Found {len(ssm_instance_ids)} instances with SSM: {ssm_instance_ids}")
+
+        # Join on instance ID once both sources are complete
+        merge_started = time.perf_counter()
+        instances = []
+        for instance in ec2_instances:
+            # Explicitly check if the instance ID is in the SSM set
+            has_ssm = instance['InstanceId'] in ssm_instance_ids
+            instances.append(instance_summary(instance, has_ssm))
+
+        # Sort instances: SSM instances first, then by name
+        instances.sort(key=lambda x: (not x['has_ssm'], x.get('name', '').lower()))
+        merge_elapsed = time.perf_counter() - merge_started
+
+        logger.info(f"Successfully listed {len(instances)} instances (with SSM: {len(ssm_instance_ids)})")
+        logger.info(
+            f"Inventory timing: total {time.perf_counter() - started:.2f}s "
+            f"(ssm {ssm_elapsed:.2f}s, ec2 {ec2_elapsed:.2f}s, merge {merge_elapsed:.3f}s)"
+        )
+        return instances
+
+
+    @staticmethod
+    def _fetch_ssm_instance_ids(ssm_client):
+        """Return the set of instance IDs registered with SSM"""
+        ssm_instance_ids = set()
+        paginator = ssm_client.get_paginator('describe_instance_information')
+        for page in paginator.paginate():
+            for instance in page.get('InstanceInformationList', []):
+                ssm_instance_ids.add(instance['InstanceId'])
+        return ssm_instance_ids
+
+
+    @staticmethod
+    def _fetch_ec2_instances(ec2_client):
+        """Return the raw instance records from every describe_instances page"""
+        instances = []
+        paginator = ec2_client.get_paginator('describe_instances')
+        for page in paginator.paginate():
+            for reservation in page['Reservations']:
+                instances.extend(reservation['Instances'])
+        return instances
 
 
     def get_instance_details(self, instance_id):
         """
         Get detailed information about a specific EC2 instance
 
+        Answered from the record kept by the last inventory fetch when it is
+        younger than inventory_ttl; otherwise the instance is described again.
+
         Args:
             instance_id (str): The ID of the EC2 instance
 
@@ -146,61 +681,124 @@ class AWSManager:
             dict: Detailed information about the instance or None if an error occurs
         """
         try:
-            response = self.ec2_client.describe_instances(InstanceIds=[instance_id])
-
-            if not response['Reservations']:
+            details = self.get_instances_details([instance_id])
+            if instance_id not in details:
                 logger.warning(f"No instance found with ID: {instance_id}")
                 return None
 
-            instance = response['Reservations'][0]['Instances'][0]
-
-            # Get instance IAM role if it exists
-            iam_role = ''
-            if instance.get('IamInstanceProfile'):
-                iam_role = instance['IamInstanceProfile'].get('Arn', '').split('/')[-1]
-
-            # Get security group names
-            security_groups = [sg['GroupName'] for sg in instance.get('SecurityGroups', [])]
-
-            # LaunchTime = last time the instance was started (updated on every stop/start)
-            launch_time = instance.get('LaunchTime')
-            last_started = launch_time.strftime('%Y-%m-%d %H:%M:%S UTC') if launch_time else 'N/A'
-
-            # Created at = AttachTime of the root EBS volume, which is set at instance creation
-            # and never changes even after stop/start cycles
-            root_device = instance.get('RootDeviceName', '')
-            created_at = 'N/A'
-            for bd in instance.get('BlockDeviceMappings', []):
-                if bd.get('DeviceName') == root_device:
-                    attach_time = bd.get('Ebs', {}).get('AttachTime')
-                    if attach_time:
-                        created_at = attach_time.strftime('%Y-%m-%d %H:%M:%S UTC')
-                    break
-
-            instance_details = {
-                'id': instance['InstanceId'],
-                'name': next((tag['Value'] for tag in instance.get('Tags', []) if tag['Key'] == 'Name'), 'N/A'),
-                'platform': instance.get('PlatformDetails', 'N/A'),
-                'public_ip': instance.get('PublicIpAddress', 'N/A'),
-                'private_ip': instance.get('PrivateIpAddress', 'N/A'),
-                'vpc_id': instance.get('VpcId', 'N/A'),
-                'subnet_id': instance.get('SubnetId', 'N/A'),
-                'iam_role': iam_role,
-                'ami_id': instance.get('ImageId', 'N/A'),
-                'key_name': instance.get('KeyName', 'N/A'),
-                'security_groups': ', '.join(security_groups) if security_groups else 'N/A',
-                'last_started': last_started,
-                'created_at': created_at,
-            }
-
             logger.debug(f"Retrieved details for instance {instance_id}")
-            return instance_details
+            return details[instance_id]
 
         except Exception as e:
             logger.error(f"Error getting instance details: {str(e)}")
             return None
 
 
+    def get_instances_details(self, instance_ids):
+        """
+        Get detailed information about several EC2 instances at once
+
+        Records kept from the inventory fetch are used while fresh; missing or
+        stale ones are resolved together with as few DescribeInstances calls
+        as possible (one per DETAILS_BATCH_SIZE IDs).
+
+        Args:
+            instance_ids (list): EC2 instance IDs
+
+        Returns:
+            dict: instance ID -> details; IDs that do not exist are left out
+
+        Raises:
+            ValueError if not connected to AWS
+            botocore ClientError if DescribeInstances fails
+        """
+        if not self.is_connected or self.ec2_client is None:
+            raise ValueError("Not connected to AWS")
+
+        key = (self.profile, self.region)
+        now = time.time()
+        records = {}
+        missing = []
+        with self._inventory_lock:
+            store = self._instance_records.get(key, {})
+            for instance_id in dict.fromkeys(instance_ids):
+                cached = store.get(instance_id)
+                if cached and now - cached[1] < self.inventory_ttl:
+                    records[instance_id] = cached[0]
+                else:
+                    missing.append(instance_id)
+
+        if missing:
+            fetched = []
+            paginator = self.ec2_client.get_paginator('describe_instances')
+            for start in range(0, len(missing), DETAILS_BATCH_SIZE):
+                # A filter (rather than InstanceIds) ignores unknown IDs instead of failing the batch
+                chunk = missing[start:start + DETAILS_BATCH_SIZE]
+                for page in paginator.paginate(Filters=[{'Name': 'instance-id', 'Values': chunk}]):
+                    for reservation in page['Reservations']:
+                        fetched.extend(reservation['Instances'])
+            self._store_instance_records(key, fetched)
+            records.update((instance['InstanceId'], instance) for instance in fetched)
+            logger.debug(f"Described {len(missing)} instances, {len(records)} details resolved")
+
+        return {instance_id: self._format_instance_details(instance)
+                for instance_id, instance in records.items()}
+
+
+    def _store_instance_records(self, key, instances, replace=False):
+        """Keep describe_instances records for key; replace=True drops records not in instances"""
+        now = time.time()
+        with self._inventory_lock:
+            if replace or key not in self._instance_records:
+                self._instance_records[key] = {}
+            store = self._instance_records[key]
+            for instance in instances:
+                store[instance['InstanceId']] = (instance, now)
+
+
+    @staticmethod
+    def _format_instance_details(instance):
+        """Turn a describe_instances record into the details shown in the Info modal"""
+        # Get instance IAM role if it exists
+        iam_role = ''
+        if instance.get('IamInstanceProfile'):
+            iam_role = instance['IamInstanceProfile'].get('Arn', '').split('/')[-1]
+
+        # Get security group names
+        security_groups = [sg['GroupName'] for sg in instance.get('SecurityGroups', [])]
+
+        # LaunchTime = last time the instance was started (updated on every stop/start)
+        launch_time = instance.get('LaunchTime')
+        last_started = launch_time.strftime('%Y-%m-%d %H:%M:%S UTC') if launch_time else 'N/A'
+
+        # Created at = AttachTime of the root EBS volume, which is set at instance creation
+        # and never changes even after stop/start cycles
+        root_device = instance.get('RootDeviceName', '')
+        created_at = 'N/A'
+        for bd in instance.get('BlockDeviceMappings', []):
+            if bd.get('DeviceName') == root_device:
+                attach_time = bd.get('Ebs', {}).get('AttachTime')
+                if attach_time:
+                    created_at = attach_time.strftime('%Y-%m-%d %H:%M:%S UTC')
+                break
+
+        return {
+            'id': instance['InstanceId'],
+            'name': next((tag['Value'] for tag in instance.get('Tags', []) if tag['Key'] == 'Name'), 'N/A'),
+            'platform': instance.get('PlatformDetails', 'N/A'),
+            'public_ip': instance.get('PublicIpAddress', 'N/A'),
+            'private_ip': instance.get('PrivateIpAddress', 'N/A'),
+            'vpc_id': instance.get('VpcId', 'N/A'),
+            'subnet_id': instance.get('SubnetId', 'N/A'),
+            'iam_role': iam_role,
+            'ami_id': instance.get('ImageId', 'N/A'),
+            'key_name': instance.get('KeyName', 'N/A'),
+            'security_groups': ', '.join(security_groups) if security_groups else 'N/A',
+            'last_started': last_started,
+            'created_at': created_at,
+        }
+
+
     def get_windows_password_data(self, instance_id: str) -> dict:
         """Retrieve the encrypted Administrator password for a Windows EC2 instance.
 
@@ -0,0 +1,128 @@
+import boto3
+from botocore.config import Config
+from collections import OrderedDict
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class ClientPool:
+    """Bounded LRU pool of boto3 sessions and clients keyed by (profile, region)
+
+    Creating a session reloads endpoint data and re-resolves credentials, and
+    every new client opens its own HTTPS connection pool. Keeping recent
+    contexts around makes switching back to them reuse warm connections.
+    boto3 sessions are not thread-safe, so sessions and clients are only
+    created while holding the pool lock; the clients themselves are safe to
+    share between threads.
+    """
+
+    def __init__(self, max_entries=16, max_pool_connections=20):
+        self.max_entries = max_entries
+        self.max_pool_connections = max_pool_connections
+        # (profile, region) -> {'session': Session, 'clients': {(service, variant): client}}
+        # (profile, None) -> the same, with (service, variant, region) keys (see get_regional_client)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, max_entries=None, max_pool_connections=None):
+        """Update the pool limits; a new connection limit applies to clients created afterwards"""
+        with self._lock:
+            if max_entries is not None:
+                self.max_entries = max_entries
+            if max_pool_connections is not None:
+                self.max_pool_connections = max_pool_connections
+            self._evict()
+
+    def get_session(self, profile, region):
+        """Return the pooled session for (profile, region), creating it if needed"""
+        with self._lock:
+            return self._get_entry(profile, region)['session']
+
+    def get_client(self, profile, region, service, config=None, variant='default'):
+        """Return a pooled client for service in (profile, region)
+
+        Args:
+            config: extra botocore Config merged over the pool defaults.
+            variant: name distinguishing clients of the same service created
+                     with a different config (e.g. short timeouts).
+        """
+        with self._lock:
+            entry = self._get_entry(profile, region)
+            return self._get_client(entry, (service, variant), service, config, None, f"{profile}/{region} ({variant})")
+
+    def get_regional_client(self, profile, region, service, config=None, variant='default'):
+        """Return a pooled client for service in region, built on the profile's own session
+
+        For fan-outs over every region: all of a profile's regional clients
+        live in a single (profile, None) entry, so one pass over the regions
+        neither evicts itself nor pushes the interactive entries out of the
+        LRU. Arguments as for get_client.
+        """
+        with self._lock:
+            entry = self._get_entry(profile, None)
+            return self._get_client(entry, (service, variant, region), service, config, region,
+                                    f"{profile}/{region} ({variant})")
+
+    def _get_client(self, entry, key, service, config, region_name, label):
+        """Return the client stored under key in entry, creating it if needed; lock must be held"""
+        client = entry['clients'].get(key)
+        if client is None:
+            self.misses += 1
+            client_config = Config(max_pool_connections=self.max_pool_connections)
+            if config is not None:
+                client_config = client_config.merge(config)
+            client = entry['session'].client(service, region_name=region_name, config=client_config)
+            entry['clients'][key] = client
+            logger.debug(f"Created {service} client for {label}")
+        else:
+            self.hits += 1
+        return client
+
+    def discard(self, profile, region):
+        """Drop a context, e.g. after its credentials failed
+
+        The profile's regional entry goes too: it holds the same credentials.
+        """
+        with self._lock:
+            self._entries.pop((profile, region), None)
+            self._entries.pop((profile, None), None)
+
+    def clear(self):
+        """Drop every pooled session and client"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+    def _get_entry(self, profile, region):
+        """Return the entry for (profile, region) and mark it most recently used; lock must be held"""
+        key = (profile, region)
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = {
+                'session': boto3.Session(profile_name=profile, region_name=region),
+                'clients': {},
+            }
+            self._entries[key] = entry
+            self._evict()
+            logger.debug(f"Created session for {profile}/{region}")
+        else:
+            self._entries.move_to_end(key)
+        return entry
+
+    def _evict(self):
+        """Drop least recently used entries beyond max_entries; lock must be held"""
+        while len(self._entries) > self.max_entries:
+            (profile, region), _ = self._entries.popitem(last=False)
+            logger.debug(f"Evicted session for {profile}/{region} from client pool")
@@ -0,0 +1,270 @@
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import threading
+import time
+import psutil
+from tunnels import probe_port
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionRegistry:
+    """Thread-safe store of the active connections
+
+    Connections are plain dicts keyed by 'connection_id'. Request threads and
+    the tunnel supervisor thread both mutate the registry, so every read and
+    write goes through a single lock. Besides the primary index by
+    connection ID the registry keeps secondary indexes by instance ID and by
+    local port, so none of the common lookups scans the whole set.
+
+    Port forwards that carry a 'forward_key' can be shared: retain_forward()
+    hands out a live forward with the same key and bumps its 'refcount',
+    release() drops one reference.
+
+    Listeners registered with add_listener() are called with ('added', conn)
+    and ('removed', conn) after the change, outside the lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._by_id = {}
+        # instance_id -> set of connection IDs
+        self._by_instance = {}
+        # local_port -> connection ID
+        self._by_port = {}
+        # forward_key -> connection ID
+        self._by_forward = {}
+        self._listeners = []
+
+    def add_listener(self, listener):
+        """Call listener(change, connection) after every add and remove"""
+        self._listeners.append(listener)
+
+    def _notify(self, change, connection):
+        for listener in self._listeners:
+            try:
+                listener(change, connection)
+            except Exception as e:
+                logger.error(f"Connection listener failed on {change}: {str(e)}")
+
+    def add(self, connection):
+        """Register a connection; replaces any connection with the same ID"""
+        connection_id = connection['connection_id']
+        with self._lock:
+            if connection_id in self._by_id:
+                self._unindex(self._by_id[connection_id])
+            self._by_id[connection_id] = connection
+            self._by_instance.setdefault(connection['instance_id'], set()).add(connection_id)
+            if connection.get('local_port') is not None:
+                self._by_port[connection['local_port']] = connection_id
+            if connection.get('forward_key') is not None:
+                connection.setdefault('refcount', 1)
+                self._by_forward[connection['forward_key']] = connection_id
+        self._notify('added', connection)
+        return connection
+
+    def get(self, connection_id):
+        """Return the connection with this ID, or None"""
+        with self._lock:
+            return self._by_id.get(connection_id)
+
+    def remove(self, connection_id):
+        """Unregister a connection and return it, or None if it was already gone"""
+        with self._lock:
+            connection = self._by_id.pop(connection_id, None)
+            if connection is not None:
+                self._unindex(connection)
+        if connection is not None:
+            self._notify('removed', connection)
+        return connection
+
+    def retain_forward(self, forward_key):
+        """Take a reference on the live forward with this key and return it, or None"""
+        with self._lock:
+            connection = self._by_id.get(self._by_forward.get(forward_key))
+            if connection is None:
+                return None
+            tunnel = connection.get('tunnel')
+            if tunnel is not None and not tunnel.is_running():
+                return None
+            connection['refcount'] += 1
+            return connection
+
+    def release(self, connection_id):
+        """Drop one reference on a connection and return how many are left
+
+        Connections without a refcount have a single user, so releasing them
+        always returns 0. Returns None if the connection is not registered.
+        """
+        with self._lock:
+            connection = self._by_id.get(connection_id)
+            if connection is None:
+                return None
+            if connection.get('refcount', 1) <= 1:
+                connection['refcount'] = 0
+                # About to be torn down: nobody may retain it any more
+                if self._by_forward.get(connection.get('forward_key')) == connection_id:
+                    del self._by_forward[connection['forward_key']]
+                return 0
+            connection['refcount'] -= 1
+            return connection['refcount']
+
+    def update(self, connection_id, **changes):
+        """Atomically apply changes to a registered connection
+
+        Returns the updated connection, or None if it is no longer registered.
+        Changing 'local_port' keeps the port index in sync.
+        """
+        with self._lock:
+            connection = self._by_id.get(connection_id)
+            if connection is None:
+                return None
+            if 'local_port' in changes and self._by_port.get(connection.get('local_port')) == connection_id:
+                del self._by_port[connection['local_port']]
+            connection.update(changes)
+            if connection.get('local_port') is not None:
+                self._by_port[connection['local_port']] = connection_id
+            return connection
+
+    def by_instance(self, instance_id):
+        """Return the connections open to an instance"""
+        with self._lock:
+            return [self._by_id[i] for i in self._by_instance.get(instance_id, ())]
+
+    def by_local_port(self, local_port):
+        """Return the connection forwarding local_port, or None"""
+        with self._lock:
+            connection_id = self._by_port.get(local_port)
+            return self._by_id.get(connection_id) if connection_id else None
+
+    def instance_ids(self):
+        """Return the IDs of the instances with at least one connection"""
+        with self._lock:
+            return set(self._by_instance)
+
+    def snapshot(self):
+        """Return a list of the registered connections, safe to iterate without the lock"""
+        with self._lock:
+            return list(self._by_id.values())
+
+    def __len__(self):
+        with self._lock:
+            return len(self._by_id)
+
+    def __contains__(self, connection_id):
+        with self._lock:
+            return connection_id in self._by_id
+
+    def _unindex(self, connection):
+        """Drop a connection from the secondary indexes; lock must be held"""
+        connection_id = connection['connection_id']
+        ids = self._by_instance.get(connection['instance_id'])
+        if ids is not None:
+            ids.discard(connection_id)
+            if not ids:
+                del self._by_instance[connection['instance_id']]
+        local_port = connection.get('local_port')
+        if local_port is not None and self._by_port.get(local_port) == connection_id:
+            del self._by_port[local_port]
+        forward_key = connection.get('forward_key')
+        if forward_key is not None and self._by_forward.get(forward_key) == connection_id:
+            del self._by_forward[forward_key]
+
+
+class ConnectionHealthChecker:
+    """Background thread that keeps the health of every connection cached
+
+    Every interval seconds it checks all registered connections in one pass:
+    the session process must still be running and, for port forwards whose
+    tunnel is ready, the local port must still be listening. Listening ports
+    are read once per pass from the socket table (psutil.net_connections),
+    so no TCP connection is ever opened through the tunnel. Where the table
+    is not readable (AccessDenied, e.g. macOS without root) the ports are
+    probed with connect_ex, concurrently. Dead connections are dropped from
+    the registry and their session process is terminated; readers only look
+    at the cached results.
+    """
+
+    def __init__(self, registry, interval=2, probe_workers=8):
+        self.registry = registry
+        self.interval = interval
+        self.probe_workers = probe_workers
+        # connection_id -> {'healthy': bool, 'checked_at': float}
+        self._results = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the checker thread if it is not running yet"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='connection-health', daemon=True)
+                self._thread.start()
+
+    def trigger(self):
+        """Run the next pass now instead of waiting for the interval"""
+        self._wakeup.set()
+
+    def get(self, connection_id):
+        """Return the cached result for a connection, or None if it was not checked yet"""
+        with self._lock:
+            return self._results.get(connection_id)
+
+    def check_now(self):
+        """Check every registered connection once and update the cache"""
+        connections = self.registry.snapshot()
+        listening = self._listening_ports(connections)
+        checked_at = time.time()
+
+        results = {}
+        for conn in connections:
+            tunnel = conn.get('tunnel')
+            healthy = bool(tunnel and tunnel.is_running())
+            if healthy and conn.get('local_port') and tunnel.ready.is_set():
+                healthy = conn['local_port'] in listening
+            results[conn['connection_id']] = {'healthy': healthy, 'checked_at': checked_at}
+
+        with self._lock:
+            self._results = results
+
+        for conn in connections:
+            if results[conn['connection_id']]['healthy']:
+                continue
+            logger.info(f"Connection {conn['connection_id']} failed its health check, removing it")
+            tunnel = conn.get('tunnel')
+            if tunnel is not None and tunnel.is_running():
+                # The supervisor's exit callback then frees the local port
+                try:
+                    tunnel.terminate()
+                except Exception as e:
+                    logger.error(f"Error terminating session process {tunnel.pid}: {str(e)}")
+            self.registry.remove(conn['connection_id'])
+        return results
+
+    def _listening_ports(self, connections):
+        """Return the set of local ports, among those of connections, that accept connections"""
+        ports = {c['local_port'] for c in connections
+                 if c.get('local_port') and c.get('tunnel') and c['tunnel'].ready.is_set()}
+        if not ports:
+            return set()
+
+        try:
+            return {c.laddr.port for c in psutil.net_connections(kind='tcp')
+                    if c.status == psutil.CONN_LISTEN and c.laddr and c.laddr.port in ports}
+        except psutil.AccessDenied:
+            logger.debug("Socket table not readable, probing forwarded ports instead")
+
+        with ThreadPoolExecutor(max_workers=min(self.probe_workers, len(ports))) as executor:
+            open_ports = executor.map(lambda port: port if probe_port(port) else None, ports)
+            return {port for port in open_ports if port is not None}
+
+    def _run(self):
+        while True:
+            if len(self.registry):
+                try:
+                    self.check_now()
+                except Exception as e:
+                    logger.error(f"Error checking connection health: {str(e)}")
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
@@ -0,0 +1,77 @@
+import itertools
+import json
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Events kept per subscriber before the oldest ones are dropped
+SUBSCRIBER_QUEUE_SIZE = 256
+
+# Seconds between keep-alive comments on an idle stream
+HEARTBEAT_INTERVAL = 15
+
+
+class EventBus:
+    """In-process publish/subscribe hub feeding the /api/events SSE stream
+
+    publish() never blocks: every subscriber has a bounded queue and a slow
+    one loses its oldest events rather than holding up the publisher. Events
+    carry a sequence number that is sent as the SSE id, so a client can tell
+    it missed some and resynchronise.
+    """
+
+    def __init__(self, queue_size=SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._sequence = itertools.count(1)
+
+    def subscribe(self):
+        """Return a new subscriber queue; pass it to unsubscribe() when done"""
+        subscriber = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        logger.debug(f"Event subscriber added ({len(self._subscribers)} total)")
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, event_type, data=None):
+        """Queue an event for every subscriber"""
+        with self._lock:
+            event = (next(self._sequence), event_type, data or {})
+            subscribers = list(self._subscribers)
+
+        for subscriber in subscribers:
+            while True:
+                try:
+                    subscriber.put_nowait(event)
+                    break
+                except queue.Full:
+                    try:
+                        subscriber.get_nowait()
+                    except queue.Empty:
+                        pass
+
+    def stream(self, subscriber, heartbeat=HEARTBEAT_INTERVAL):
+        """Yield the events of subscriber formatted as SSE messages, forever
+
+        A comment line is sent after heartbeat idle seconds so proxies keep
+        the connection open and a closed client is detected on the next write.
+        """
+        yield 'retry: 3000\n\n'
+        while True:
+            try:
+                event_id, event_type, data = subscriber.get(timeout=heartbeat)
+            except queue.Empty:
+                yield ': keep-alive\n\n'
+                continue
+            yield f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data, default=str)}\n\n"
@@ -0,0 +1,153 @@
+import bisect
+import re
+
+# Sort orders accepted by InventoryIndex.query; 'default' keeps the snapshot order
+# (SSM instances first, then by name)
+SORT_FIELDS = ('default', 'name', 'id', 'type', 'state', 'os')
+
+# Filtered sets smaller than 1/SMALL_MATCH_FACTOR of the snapshot are sorted by
+# rank; larger ones are collected by walking the precomputed order
+SMALL_MATCH_FACTOR = 16
+
+# Characters that split an instance name into separately searchable words
+_TOKEN_SPLIT = re.compile(r'[\s\-_.:/]+')
+
+
+def os_family(os_name):
+    """Map a PlatformDetails string to 'linux', 'windows' or 'other' (same rules as the UI)"""
+    os_name = (os_name or '').lower()
+    if 'linux' in os_name or 'unix' in os_name:
+        return 'linux'
+    if 'windows' in os_name:
+        return 'windows'
+    return 'other'
+
+
+class InventoryIndex:
+    """Read-only lookup indexes over one inventory snapshot
+
+    Built once per snapshot so that /api/instances can filter, search, sort
+    and page without scanning the whole fleet on every request. Positions
+    refer to the index of an instance in the snapshot list.
+    """
+
+    def __init__(self, instances):
+        self.instances = instances
+        self.by_id = {}
+        self.by_os = {}
+        self.by_ssm = {True: set(), False: set()}
+        self.by_state = {}
+
+        # Sorted (key, position) pairs for prefix search on ID and name words
+        prefixes = []
+        for pos, instance in enumerate(instances):
+            self.by_id[instance['id']] = pos
+            self.by_os.setdefault(os_family(instance.get('os')), set()).add(pos)
+            self.by_ssm[bool(instance.get('has_ssm'))].add(pos)
+            self.by_state.setdefault(instance.get('state'), set()).add(pos)
+
+            instance_id = instance['id'].lower()
+            name = (instance.get('name') or '').lower()
+            keys = {instance_id, instance_id.split('-', 1)[-1], name}
+            keys.update(token for token in _TOKEN_SPLIT.split(name) if token)
+            prefixes.extend((key, pos) for key in keys if key)
+        prefixes.sort()
+        self._prefix_keys = [key for key, _ in prefixes]
+        self._prefix_positions = [pos for _, pos in prefixes]
+
+        # Positions in each sort order, plus the rank of every position, so no
+        # query has to sort: unfiltered pages slice the order directly, large
+        # filtered sets walk it in order, small ones are sorted by rank
+        self._orders = {}
+        self._ranks = {}
+        for field in SORT_FIELDS:
+            if field == 'default':
+                order = list(range(len(instances)))
+            else:
+                order = sorted(range(len(instances)),
+                               key=lambda pos: (str(instances[pos].get(field) or '').lower(), pos))
+            ranks = [0] * len(instances)
+            for rank, pos in enumerate(order):
+                ranks[pos] = rank
+            self._orders[field] = order
+            self._ranks[field] = ranks
+
+    def counts(self):
+        """Return the fleet-wide totals shown in the UI counters"""
+        return {
+            'total': len(self.instances),
+            'linux': len(self.by_os.get('linux', ())),
+            'windows': len(self.by_os.get('windows', ())),
+            'ssm': len(self.by_ssm[True]),
+        }
+
+    def search(self, term):
+        """Return the positions whose ID or any name word starts with term (case-insensitive)"""
+        term = term.lower()
+        start = bisect.bisect_left(self._prefix_keys, term)
+        matches = set()
+        for i in range(start, len(self._prefix_keys)):
+            if not self._prefix_keys[i].startswith(term):
+                break
+            matches.add(self._prefix_positions[i])
+        return matches
+
+    def query(self, os=None, has_ssm=None, state=None, search=None, instance_ids=None,
+              sort='default', descending=False, cursor=0, limit=None):
+        """Filter, sort and page the snapshot
+
+        Args:
+            os: OS family ('linux', 'windows', 'other').
+            has_ssm: keep only instances with (True) or without (False) SSM.
+            state: EC2 state name, e.g. 'running'.
+            search: prefix of the instance ID or of a word of its name.
+            instance_ids: keep only these instance IDs.
+            sort: one of SORT_FIELDS.
+            descending: reverse the sort order.
+            cursor: offset of the first row to return.
+            limit: maximum number of rows, at least 1; None returns every remaining row.
+
+        Returns:
+            dict with 'instances' (the page), 'total' (number of matches) and
+            'next_cursor' (offset of the next page, or None on the last page).
+        """
+        if sort not in self._orders:
+            raise ValueError(f"Unsupported sort field '{sort}'")
+
+        # Intersect the smallest candidate sets first
+        candidates = []
+        if os is not None:
+            candidates.append(self.by_os.get(os, set()))
+        if has_ssm is not None:
+            candidates.append(self.by_ssm[bool(has_ssm)])
+        if state is not None:
+            candidates.append(self.by_state.get(state, set()))
+        if search:
+            candidates.append(self.search(search))
+        if instance_ids is not None:
+            candidates.append({self.by_id[i] for i in instance_ids if i in self.by_id})
+
+        order = self._orders[sort]
+        if candidates:
+            candidates.sort(key=len)
+            matches = set(candidates[0]).intersection(*candidates[1:])
+            if len(matches) * SMALL_MATCH_FACTOR < len(order):
+                ordered = sorted(matches, key=self._ranks[sort].__getitem__)
+            else:
+                ordered = [pos for pos in order if pos in matches]
+        else:
+            ordered = order
+
+        total = len(ordered)
+        cursor = max(0, cursor)
+        end = total if limit is None else cursor + max(1, limit)
+        if descending:
+            # Read the page from the end instead of reversing the whole order
+            positions = (ordered[total - 1 - i] for i in range(cursor, min(end, total)))
+        else:
+            positions = ordered[cursor:end]
+        return {
+            'instances': [self.instances[pos] for pos in positions],
+            'total': total,
+            'next_cursor': end if end < total else None,
+        }
@@ -0,0 +1,169 @@
+import logging
+import os
+import shutil
+import subprocess
+import sys
+from tunnels import TunnelProcess
+
+logger = logging.getLogger(__name__)
+
+
+def start_session_argv(instance_id, region, profile, document=None, parameters=None):
+    """Build the argv of an 'aws ssm start-session' call
+
+    Args:
+        document: SSM document name, e.g. 'AWS-StartPortForwardingSession'.
+        parameters: document parameters, e.g. {'portNumber': 22, 'localPortNumber': 60001}.
+    """
+    argv = ['aws', 'ssm', 'start-session', '--target', instance_id]
+    if document:
+        argv += ['--document-name', document]
+    if parameters:
+        argv += ['--parameters', ','.join(f'{key}={value}' for key, value in parameters.items())]
+    argv += ['--region', region, '--profile', profile]
+    return argv
+
+
+def _powershell_quote(arg):
+    """Quote one argument as a PowerShell single-quoted string literal"""
+    return "'" + str(arg).replace("'", "''") + "'"
+
+
+def _interactive(popen):
+    """Track an interactive session process"""
+    tunnel = TunnelProcess(popen)
+    # Interactive sessions forward no port: they are usable once the console is up
+    tunnel.ready.set()
+    return tunnel
+
+
+class WindowsLauncher:
+    """Starts sessions the way the app always has on Windows
+
+    Port forwards run in a hidden PowerShell host with captured output;
+    interactive sessions get their own console window through cmd /c.
+    """
+
+    name = 'windows'
+
+    def hidden_popen_kwargs(self):
+        """Popen keyword arguments that keep a console child process window hidden"""
+        startupinfo = subprocess.STARTUPINFO()
+        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+        startupinfo.wShowWindow = subprocess.SW_HIDE
+        return {'startupinfo': startupinfo}
+
+    def launch_hidden(self, argv, local_port=None):
+        """Run argv in a hidden PowerShell with captured output
+
+        The returned TunnelProcess is usable immediately: the PID is the one of
+        the Popen handle, no process-table search is needed. Pass the forwarded
+        local_port to enable the TCP probe fallback of wait_ready.
+        """
+        command = '& ' + ' '.join(_powershell_quote(arg) for arg in argv)
+        popen = subprocess.Popen(
+            ["powershell", "-Command", command],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,  # one pipe, drained by the tunnel supervisor
+            **self.hidden_popen_kwargs()
+        )
+        logger.debug(f"Launched hidden session process {popen.pid}")
+        return TunnelProcess(popen, local_port)
+
+    def launch_console(self, argv):
+        """Run argv in a new console window that closes when it exits"""
+        # /c closes cmd.exe automatically when aws ssm start-session exits,
+        # so the connection is detected as terminated as soon as the session ends.
+        popen = subprocess.Popen(
+            ['cmd', '/c'] + argv,
+            creationflags=subprocess.CREATE_NEW_CONSOLE
+        )
+        logger.debug(f"Launched console session process {popen.pid}")
+        return _interactive(popen)
+
+    def open_rdp_client(self, local_port):
+        return subprocess.Popen(['mstsc', f'/v:localhost:{local_port}'])
+
+
+class PosixLauncher:
+    """Starts sessions on Linux and macOS by running the aws CLI directly from an argv list
+
+    No shell or wrapper host sits between the app and the aws CLI: the Popen
+    handle is the aws process itself. Each session gets its own process
+    session so signals aimed at the app's terminal do not reach it.
+    """
+
+    name = 'posix'
+
+    # Terminal emulators tried for interactive sessions, with the flags that
+    # make them run a command and stay attached until it exits
+    TERMINALS = (
+        ('x-terminal-emulator', ['-e']),
+        ('gnome-terminal', ['--wait', '--']),
+        ('konsole', ['-e']),
+        ('xfce4-terminal', ['-x']),
+        ('xterm', ['-e']),
+    )
+
+    # RDP clients tried in order, with the argument format they take
+    RDP_CLIENTS = (
+        ('xfreerdp3', '/v:localhost:{port}'),
+        ('xfreerdp', '/v:localhost:{port}'),
+        ('remmina', 'rdp://localhost:{port}'),
+    )
+
+    def hidden_popen_kwargs(self):
+        return {}
+
+    def launch_hidden(self, argv, local_port=None):
+        """Run argv directly with captured output; see WindowsLauncher.launch_hidden"""
+        popen = subprocess.Popen(
+            self._resolve(argv),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,  # one pipe, drained by the tunnel supervisor
+            start_new_session=True
+        )
+        logger.debug(f"Launched session process {popen.pid}")
+        return TunnelProcess(popen, local_port)
+
+    def launch_console(self, argv):
+        """Run argv in a new terminal emulator window ($TERMINAL first, if set)"""
+        terminals = self.TERMINALS
+        if os.environ.get('TERMINAL'):
+            terminals = ((os.environ['TERMINAL'], ['-e']),) + terminals
+
+        for terminal, flags in terminals:
+            if shutil.which(terminal):
+                popen = subprocess.Popen([terminal] + flags + self._resolve(argv), start_new_session=True)
+                logger.debug(f"Launched console session process {popen.pid} in {terminal}")
+                return _interactive(popen)
+        raise RuntimeError('No terminal emulator found; set the TERMINAL environment variable')
+
+    def open_rdp_client(self, local_port):
+        for client, target in self.RDP_CLIENTS:
+            if shutil.which(client):
+                return subprocess.Popen([client, target.format(port=local_port)], start_new_session=True)
+        logger.warning(f"No RDP client found; connect manually to localhost:{local_port}")
+        return None
+
+    @staticmethod
+    def _resolve(argv):
+        """Replace argv[0] with its full path so a missing aws CLI fails with a clear message"""
+        executable = shutil.which(argv[0])
+        if executable is None:
+            raise FileNotFoundError(f"'{argv[0]}' not found in PATH")
+        return [executable] + list(argv[1:])
+
+
+LAUNCHERS = {
+    WindowsLauncher.name: WindowsLauncher,
+    PosixLauncher.name: PosixLauncher,
+}
+
+
+def get_launcher(name=None):
+    """Return the launcher called name, or the one for the current platform"""
+    if name is None:
+        name = WindowsLauncher.name if sys.platform == 'win32' else PosixLauncher.name
+    return LAUNCHERS[name]()
@@ -0,0 +1,105 @@
+from collections import deque
+import logging
+import socket
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def port_is_bindable(port, host='127.0.0.1'):
+    """Return True if a listening socket could be bound to host:port right now"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        sock.bind((host, port))
+        return True
+    except OSError:
+        return False
+    finally:
+        sock.close()
+
+
+class PortAllocator:
+    """Hands out local ports from the configured range and keeps them reserved
+
+    A bitmap over the range marks the ports reserved by this process; the
+    unreserved ones wait in a FIFO queue, so allocation takes the next free
+    port without scanning the range or guessing randomly. A candidate is only
+    handed out after a test bind succeeds; ports held by other programs go to
+    the back of the queue and are retried later. A port stays reserved until
+    release() is called, so two requests can never get the same port even
+    before the aws CLI has bound it. Released ports also go to the back of
+    the queue, which keeps them out of use while they sit in TIME_WAIT.
+    """
+
+    def __init__(self, start, end):
+        self._lock = threading.Lock()
+        self.start = start
+        self.end = end
+        self._bitmap = bytearray()
+        self._free = deque()
+        # Reserved ports left outside the range by configure()
+        self._outside = set()
+        self.configure(start, end)
+
+    def configure(self, start, end):
+        """Switch to a new port range, keeping the current reservations"""
+        with self._lock:
+            reserved = self._reserved_ports()
+            self.start = start
+            self.end = end
+            self._bitmap = bytearray(max(0, end - start + 1))
+            self._free = deque()
+            for port in range(start, end + 1):
+                if port in reserved:
+                    self._bitmap[port - start] = 1
+                else:
+                    self._free.append(port)
+            self._outside = {port for port in reserved if not start <= port <= end}
+        logger.debug(f"Port allocator range set to {start}-{end}")
+
+    def allocate(self):
+        """Reserve and return a free port, or None if every port in the range is taken"""
+        with self._lock:
+            for _ in range(len(self._free)):
+                port = self._free.popleft()
+                if port_is_bindable(port):
+                    self._bitmap[port - self.start] = 1
+                    logger.info(f"Reserved local port {port}")
+                    return port
+                logger.debug(f"Port {port} is in use by another program")
+                self._free.append(port)
+        logger.error(f"No free port in range {self.start}-{self.end}")
+        return None
+
+    def release(self, port):
+        """Return a port to the pool; releasing a port that is not reserved does nothing"""
+        if port is None:
+            return
+        with self._lock:
+            if self.start <= port <= self.end:
+                if self._bitmap[port - self.start]:
+                    self._bitmap[port - self.start] = 0
+                    self._free.append(port)
+                    logger.debug(f"Released local port {port}")
+            else:
+                self._outside.discard(port)
+
+    def is_reserved(self, port):
+        with self._lock:
+            if self.start <= port <= self.end:
+                return bool(self._bitmap[port - self.start])
+            return port in self._outside
+
+    def stats(self):
+        with self._lock:
+            return {
+                'start': self.start,
+                'end': self.end,
+                'reserved': len(self._reserved_ports()),
+                'free': len(self._free),
+            }
+
+    def _reserved_ports(self):
+        """Return every reserved port; lock must be held"""
+        reserved = {self.start + offset for offset, bit in enumerate(self._bitmap) if bit}
+        return reserved | self._outside
@@ -17,6 +17,27 @@ class PreferencesHandler:
             "level": "INFO",
             "format": "%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s"
         },
+        "inventory": {
+            "cache_ttl": 60,
+            "region_workers": 8,
+            "region_timeout": 30,
+            "profile_workers": 8,
+            "profile_timeout": 60
+        },
+        "client_pool": {
+            "max_entries": 16,
+            "max_pool_connections": 20
+        },
+        "transfers": {
+            "tunnel_idle_timeout": 300,
+            "max_concurrent": 4,
+            "per_instance_concurrent": 2,
+            "parallel_streams": 4,
+            "chunk_threshold_mb": 64,
+            "chunk_size_mb": 16,
+            "compression": "auto",
+            "min_compression_ratio": 1.5
+        },
         "dark_mode": False,
         "last_profile": "",
         "last_region": ""
@@ -77,6 +98,21 @@ class PreferencesHandler:
         port_range = self.preferences.get('port_range', self.DEFAULT_PREFERENCES['port_range'])
         return port_range['start'], port_range['end']
 
+    def get_inventory_settings(self):
+        """Get inventory cache, region and profile fan-out settings, filling in missing keys from defaults"""
+        inventory = self.preferences.get('inventory', {})
+        return {**self.DEFAULT_PREFERENCES['inventory'], **inventory}
+
+    def get_client_pool_settings(self):
+        """Get boto3 session/client pool limits, filling in missing keys from defaults"""
+        client_pool = self.preferences.get('client_pool', {})
+        return {**self.DEFAULT_PREFERENCES['client_pool'], **client_pool}
+
+    def get_transfer_settings(self):
+        """Get file transfer settings, filling in missing keys from defaults"""
+        transfers = self.preferences.get('transfers', {})
+        return {**self.DEFAULT_PREFERENCES['transfers'], **transfers}
+
     def update_preferences(self, new_preferences):
         """Update preferences with new values"""
         try:
@@ -1,36 +1,102 @@
-from flask import jsonify, request, render_template
+from flask import jsonify, request, render_template, Response, stream_with_context
 import urllib.request
 import json as _json
 import base64
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.primitives.asymmetric import padding
 from app import app, aws_manager, active_connections
+from aws_manager import ALL_REGIONS
 from version import __version__
 import subprocess
-import random
-import socket
 import time
-from subprocess import STARTUPINFO, STARTF_USESHOWWINDOW, CREATE_NEW_CONSOLE, SW_HIDE
 import tempfile
 import os
 import re
 import shutil
 import logging
 from preferences_handler import PreferencesHandler
+from tunnels import shared_supervisor
+from launchers import get_launcher, start_session_argv
+from connections import ConnectionHealthChecker
+from event_bus import EventBus
+from port_allocator import PortAllocator
+from transfers import (TransferTunnelPool, TransferQueue, TransferCheckpoints, ChunkedTransfer,
+                       TarStreamTransfer, remote_stat, local_sha256, remote_sha256,
+                       local_compression_ratio, COMPRESSION_MIN_SIZE)
 import threading
-import psutil
+import uuid
+from collections import OrderedDict
 import webview
 
 
 # Create preferences handler instance
 preferences_handler = PreferencesHandler()
 
-active_connections = []
+
+def apply_inventory_settings():
+    """Push the inventory and client pool preferences onto the shared AWSManager"""
+    settings = preferences_handler.get_inventory_settings()
+    aws_manager.inventory_ttl = settings['cache_ttl']
+    aws_manager.region_workers = settings['region_workers']
+    aws_manager.region_timeout = settings['region_timeout']
+    aws_manager.profile_workers = settings['profile_workers']
+    aws_manager.profile_timeout = settings['profile_timeout']
+
+    pool_settings = preferences_handler.get_client_pool_settings()
+    aws_manager.client_pool.configure(
+        max_entries=pool_settings['max_entries'],
+        max_pool_connections=pool_settings['max_pool_connections']
+    )
+
+
+apply_inventory_settings()
+
+# Starts session processes: hidden PowerShell/console windows on Windows, the aws CLI directly elsewhere
+launcher = get_launcher()
+
+# Local ports of port forwards, reserved from the preferences range for the connection's lifetime
+port_allocator = PortAllocator(*preferences_handler.get_port_range())
+
+# Warm port-22 tunnels shared by the file transfers to each instance
+transfer_tunnels = TransferTunnelPool(
+    launcher, port_allocator,
+    idle_timeout=preferences_handler.get_transfer_settings()['tunnel_idle_timeout']
+)
+
+# Serialises the lookup-or-launch of shareable forwards so identical requests never race
+forward_lock = threading.Lock()
+
+# Seconds to wait for a port-forward tunnel to accept connections
+TUNNEL_READY_TIMEOUT = 15
+
+# One thread watches every session process, drains its output and reports
+# exits within ~0.2 s
+tunnel_supervisor = shared_supervisor()
+
+# Checks process and listening port of every connection in the background;
+# /api/active-connections only reads its cached results
+health_checker = ConnectionHealthChecker(active_connections)
+
+# Pushes connection, transfer and inventory updates to /api/events subscribers
+event_bus = EventBus()
+aws_manager.on_inventory_changed = lambda profile, region: event_bus.publish(
+    'inventory-changed', {'profile': profile, 'region': region})
+
+# Output of recently closed connections: connection_id -> log dict, oldest first
+closed_connection_logs = OrderedDict()
+CLOSED_CONNECTION_LOGS_MAX = 50
 
 # Dict tracking in-progress file transfers: transfer_id -> state dict.
 # Internal keys prefixed with '_' are not sent to the client.
 active_transfers = {}
 
+# Transfers queued together: batch_id -> [transfer_id, ...]
+transfer_batches = {}
+TRANSFER_STATUSES = ('queued', 'starting', 'running', 'completed', 'error', 'cancelled')
+
+# How far interrupted single-file transfers got, for POST /api/transfers/<batch_id>/retry
+transfer_checkpoints = TransferCheckpoints()
+
 @app.route('/api/version')
 def get_version():
     """Return the application version from version.py.
@@ -65,8 +131,9 @@ def refresh_profiles():
         current_profile = aws_manager.profile
         current_region = aws_manager.region
         
-        # Get fresh list of profiles
+        # Get fresh list of profiles; pooled sessions may hold outdated profile config
         profiles = aws_manager.get_profiles()
+        aws_manager.client_pool.clear()
         
         # Check if current profile is still valid
         is_current_valid = current_profile in profiles if current_profile else False
@@ -100,6 +167,15 @@ def get_regions():
 
 @app.route('/api/connect', methods=['POST'])
 def connect():
+    """Connect to a profile/region and warm its inventory in the background.
+
+    Returns as soon as the STS identity check succeeds. The inventory fetch
+    keeps running after the response; the next /api/instances call receives
+    its result (waiting for it if it is still in flight).
+
+    Returns:
+        JSON with 'status', 'account_id' and 'inventory' ('cached' or 'warming').
+    """
     try:
         data = request.json
         profile = data.get('profile')
@@ -107,31 +183,179 @@ def connect():
         if not profile or not region:
             return jsonify({'error': 'Profile and region are required'}), 400
         aws_manager.set_profile_and_region(profile, region)
-        # Try to list instances immediately to verify connection
-        instances = aws_manager.list_ssm_instances()
-        
+        inventory_status = aws_manager.warm_inventory()
+
         # Include account ID in the response
         return jsonify({
             'status': 'success',
-            'account_id': aws_manager.account_id
+            'account_id': aws_manager.account_id,
+            'inventory': inventory_status
         })
-        
-        if isinstance(instances, dict) and 'error' in instances:
-            # Token is expired
-            return jsonify({'error': instances['error']}), 401
-        return jsonify({'status': 'success'})
     except Exception as e:
         logging.error(f"Connection error: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/instances')
 def get_instances():
+    """Return one page of the cached instance inventory for the current profile/region.
+
+    Filtering, search, sorting and paging are answered from the snapshot's
+    precomputed InventoryIndex. Without a limit every matching row is returned.
+
+    Query params:
+        os (str): 'linux', 'windows' or 'other'.
+        has_ssm (bool): only instances with (true) or without (false) SSM.
+        state (str): EC2 state name, e.g. 'running'.
+        active (bool): only instances with an active connection.
+        search (str): prefix of the instance ID or of a word of its name.
+        sort (str): 'default', 'name', 'id', 'type', 'state' or 'os'.
+        order (str): 'asc' or 'desc'.
+        cursor (int): offset returned as 'next_cursor' by the previous page.
+        limit (int): page size.
+        force (bool): bypass the inventory cache.
+
+    Returns:
+        JSON with 'instances' (the page), 'total' (matching rows),
+        'next_cursor', 'counts' (fleet-wide totals) and 'snapshot_age'.
+    """
+    try:
+        args = request.args
+        index = aws_manager.get_inventory_index(force_refresh=_arg_is_true(args.get('force')))
+        if isinstance(index, dict) and 'error' in index:
+            return jsonify({'error': index['error']}), 401
+        if index is None:
+            return jsonify({'instances': [], 'total': 0, 'next_cursor': None,
+                            'counts': None, 'snapshot_age': None})
+
+        instance_ids = None
+        if _arg_is_true(args.get('active')):
+            instance_ids = active_connections.instance_ids()
+
+        cursor = args.get('cursor', 0, type=int)
+        limit = args.get('limit', type=int)
+        if cursor < 0 or (limit is not None and limit < 1):
+            return jsonify({'error': 'cursor must be >= 0 and limit >= 1'}), 400
+
+        try:
+            page = index.query(
+                os=args.get('os') or None,
+                has_ssm=_arg_is_true(args['has_ssm']) if 'has_ssm' in args else None,
+                state=args.get('state') or None,
+                search=args.get('search', '').strip() or None,
+                instance_ids=instance_ids,
+                sort=args.get('sort', 'default'),
+                descending=args.get('order') == 'desc',
+                cursor=cursor,
+                limit=limit
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        page['counts'] = index.counts()
+        page['snapshot_age'] = aws_manager.get_snapshot_age()
+        return jsonify(page)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/instances/stream')
+def stream_instances():
+    """Stream the instance inventory as NDJSON, one instance per line.
+
+    Lines are sent as pages arrive from the EC2 paginator. The last line is
+    {"done": true, "count": n}, or {"error": "..."} if the listing failed
+    part way through.
+    """
+    if not aws_manager.is_connected:
+        return jsonify({'error': 'Not connected to AWS'}), 400
+
+    def generate():
+        count = 0
+        try:
+            for instance in aws_manager.iter_ssm_instances():
+                count += 1
+                yield _json.dumps(instance) + '\n'
+            yield _json.dumps({'done': True, 'count': count}) + '\n'
+        except Exception as e:
+            logging.error(f"Error streaming instances: {str(e)}")
+            yield _json.dumps({'error': str(e)}) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+@app.route('/api/inventory-stats')
+def get_inventory_stats():
+    """Return inventory fetch and client pool counters.
+
+    Returns:
+        JSON with 'inventory' (executed, coalesced and in-flight fetches) and
+        'client_pool' (pooled contexts, hits and misses).
+    """
+    return jsonify({
+        'inventory': aws_manager.get_inventory_stats(),
+        'client_pool': aws_manager.client_pool.stats(),
+    })
+
+
+def _arg_is_true(value):
+    """Interpret a query-string flag such as ?force=1 or ?active=true"""
+    return (value or '').lower() in ('1', 'true', 'yes')
+
+
+@app.route('/api/instances/all-regions')
+def get_all_region_instances():
+    """Return the merged inventory of every enabled region for the current profile.
+
+    Query params:
+        force (bool): bypass the inventory cache and query all regions now.
+
+    Returns:
+        JSON with 'instances' (list, each tagged with 'region'), 'regions'
+        (region -> status: 'ok', 'skipped', 'timeout' or 'error: ...') and
+        'snapshot_age' (seconds).
+    """
     try:
-        instances = aws_manager.list_ssm_instances()
-        return jsonify(instances) if instances else jsonify([])
+        result = aws_manager.list_all_region_instances(force_refresh=_arg_is_true(request.args.get('force')))
+        if result is None:
+            return jsonify({'error': 'Not connected to AWS'}), 400
+        if 'error' in result:
+            return jsonify({'error': result['error']}), 401
+        return jsonify({
+            'instances': result['instances'],
+            'regions': result['regions'],
+            'snapshot_age': aws_manager.get_snapshot_age(ALL_REGIONS)
+        })
     except Exception as e:
+        logging.error(f"Error listing instances across regions: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/instances/multi-profile', methods=['POST'])
+def get_multi_profile_instances():
+    """Return the merged inventory of several profiles, keyed by account ID.
+
+    Request body (JSON):
+        profiles (list): profile names to query; defaults to every profile.
+        region (str): region to query; defaults to the connected region.
+        force (bool): bypass the inventory cache.
+
+    Returns:
+        JSON with 'instances', 'accounts' and per-profile 'profiles' status.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        profiles = data.get('profiles')
+        if profiles is not None and (not isinstance(profiles, list)
+                                     or not all(isinstance(p, str) for p in profiles)):
+            return jsonify({'error': 'profiles must be a list of profile names'}), 400
+        profiles = profiles or aws_manager.get_profiles()
+        region = data.get('region') or aws_manager.region
+        if not region:
+            return jsonify({'error': 'Region is required'}), 400
+        result = aws_manager.list_profiles_instances(profiles, region, force_refresh=bool(data.get('force')))
+        return jsonify(result)
+    except Exception as e:
+        logging.error(f"Error listing instances across profiles: {str(e)}")
+        return jsonify({"error": str(e)}), 500
 
 
 @app.route('/api/ssh/<instance_id>', methods=['POST'])
@@ -144,56 +368,23 @@ def start_ssh(instance_id):
         # Crea un ID univoco per la connessione
         connection_id = f"ssh_{instance_id}_{int(time.time())}"
         
-        # Crea il comando AWS SSM e avvia il processo
-        cmd_command = f'aws ssm start-session --target {instance_id} --region {region} --profile {profile}'
-        # /c closes cmd.exe automatically when aws ssm start-session exits,
-        # so the connection is detected as terminated as soon as the SSH session ends.
-        process = subprocess.Popen(f'start cmd /c "{cmd_command}"', shell=True)
-        
-        def find_cmd_pid():
-            time.sleep(2)  # Wait for process to start
-            for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
-                try:
-                    if proc.name().lower() == 'cmd.exe':
-                        cmdline = ' '.join(proc.cmdline()).lower()
-                        if cmd_command.lower() in cmdline:
-                            return proc.pid
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                    continue
-            return None
-
-        # Trova il PID del processo cmd.exe
-        cmd_pid = find_cmd_pid()
+        # Crea il comando AWS SSM e avvia il processo in una nuova console
+        aws_args = start_session_argv(instance_id, region, profile)
+        tunnel = launcher.launch_console(aws_args)
         
         # Aggiungi alla lista delle connessioni attive
         connection = {
             'connection_id': connection_id,
             'instance_id': instance_id,
             'type': 'SSH',
-            'process': process,
-            'pid': cmd_pid
+            'process': tunnel.popen,
+            'tunnel': tunnel,
+            'pid': tunnel.pid
         }
-        active_connections.append(connection)
-        
-        # Monitora il processo in un thread separato
-        def monitor_process():
-            try:
-                if cmd_pid:
-                    try:
-                        proc = psutil.Process(cmd_pid)
-                        proc.wait()  # Attendi che il processo termini
-                    except (psutil.NoSuchProcess, psutil.AccessDenied):
-                        pass
-                    finally:
-                        # Rimuovi la connessione quando il processo termina
-                        global active_connections
-                        active_connections[:] = [c for c in active_connections 
-                                              if c['connection_id'] != connection_id]
-            except Exception as e:
-                logging.error(f"Error monitoring SSH process: {str(e)}")
+        active_connections.add(connection)
         
-        thread = threading.Thread(target=monitor_process, daemon=True)
-        thread.start()
+        # Monitora il processo tramite il supervisor condiviso
+        tunnel_supervisor.watch(connection_id, tunnel, on_connection_exit)
         
         return jsonify({
             "status": "success",
@@ -219,60 +410,27 @@ def start_remote_host_port(instance_id):
         # Generate connection ID
         connection_id = f"remote_port_{instance_id}_{int(time.time())}"
         
-        # Get free port
-        local_port = find_free_port()
-        if local_port is None:
-            logging.error("Could not find available port for port forwarding")
-            return jsonify({'error': 'No available ports'}), 503
-            
         logging.info(f"Starting remote host port forwarding - Instance: {instance_id}, Host: {remote_host}, Remote Port: {remote_port}")
         
-        # Create AWS command for remote host port forwarding
-        aws_command = f'aws ssm start-session --region {region} --target {instance_id} --document-name AWS-StartPortForwardingSessionToRemoteHost --parameters host="{remote_host}",portNumber="{remote_port}",localPortNumber="{local_port}" --profile {profile}'
-        
-        startupinfo = subprocess.STARTUPINFO()
-        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-        startupinfo.wShowWindow = subprocess.SW_HIDE
-        
-        # Start port forwarding process
-        process = subprocess.Popen(
-            ["powershell", "-Command", aws_command],
-            startupinfo=startupinfo,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
-        
-        # Find PowerShell process PID (reuse existing function)
-        ps_pid = find_powershell_pid()
-            
-        # Add to active connections
-        connection = {
-            'connection_id': connection_id,
-            'instance_id': instance_id,
-            'type': 'Remote Host Port',
-            'local_port': local_port,
-            'remote_port': remote_port,
-            'remote_host': remote_host,
-            'process': process,
-            'pid': ps_pid
-        }
-        active_connections.append(connection)
-        
-        # Monitor process (reuse existing monitoring logic)
-        monitor_thread = threading.Thread(
-            target=monitor_process, 
-            args=(connection_id, ps_pid),
-            daemon=True
+        # Start port forwarding process, or share an identical live one
+        connection, shared = open_forward(
+            connection_id, 'Remote Host Port', instance_id, profile, region,
+            'AWS-StartPortForwardingSessionToRemoteHost', remote_port, remote_host
         )
-        monitor_thread.start()
+        if connection is None:
+            logging.error("Could not find available port for port forwarding")
+            return jsonify({'error': 'No available ports'}), 503
         
         logging.info(f"Remote host port forwarding started - Instance: {instance_id}, Host: {remote_host}, Port: {remote_port}")
         return jsonify({
             "status": "success",
-            "connection_id": connection_id,
-            "local_port": local_port,
+            "connection_id": connection['connection_id'],
+            "local_port": connection['local_port'],
             "remote_port": remote_port,
-            "remote_host": remote_host
+            "remote_host": remote_host,
+            "shared": shared,
+            "refcount": connection['refcount'],
+            "ready": connection['tunnel'].ready.is_set()
         })
         
     except Exception as e:
@@ -291,7 +449,7 @@ def start_rdp(instance_id):
         connection_id = f"rdp_{instance_id}_{int(time.time())}"
         
         # Get free port
-        local_port = find_free_port()
+        local_port = port_allocator.allocate()
         if local_port is None:
             logging.error("Could not find available port for RDP connection")
             return jsonify({'error': 'No available ports for RDP connection'}), 503
@@ -299,37 +457,23 @@ def start_rdp(instance_id):
         logging.info(f"Starting RDP - Instance: {instance_id}, Port: {local_port}")
         
         # Create AWS command
-        aws_command = f"aws ssm start-session --target {instance_id} --document-name AWS-StartPortForwardingSession --parameters portNumber=3389,localPortNumber={local_port} --region {region} --profile {profile}"
-        
-        startupinfo = subprocess.STARTUPINFO()
-        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-        startupinfo.wShowWindow = subprocess.SW_HIDE
-        
-        # Start port forwarding process
-        process = subprocess.Popen(
-            ["powershell", "-Command", aws_command],
-            startupinfo=startupinfo,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
+        aws_args = start_session_argv(
+            instance_id, region, profile,
+            document='AWS-StartPortForwardingSession',
+            parameters={'portNumber': 3389, 'localPortNumber': local_port}
         )
         
-        def find_powershell_pid():
-            time.sleep(2)
-            for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
-                try:
-                    if proc.name().lower() == 'powershell.exe':
-                        cmdline = ' '.join(proc.cmdline()).lower()
-                        if aws_command.lower() in cmdline:
-                            return proc.pid
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                        continue
-            return None
-            
-        # Find PowerShell process PID
-        ps_pid = find_powershell_pid()
+        # Start port forwarding process
+        tunnel = launch_forward(aws_args, local_port)
         
-        # Start RDP client
-        subprocess.Popen(f'mstsc /v:localhost:{local_port}')
+        # Start RDP client as soon as the tunnel accepts connections
+        def open_rdp_client():
+            if tunnel.wait_ready(TUNNEL_READY_TIMEOUT):
+                launcher.open_rdp_client(local_port)
+            else:
+                logging.error(f"RDP tunnel on port {local_port} did not become ready")
+
+        threading.Thread(target=open_rdp_client, daemon=True).start()
         
         # Add to active connections
         connection = {
@@ -337,35 +481,22 @@ def start_rdp(instance_id):
             'instance_id': instance_id,
             'type': 'RDP',
             'local_port': local_port,
-            'process': process,
-            'pid': ps_pid
+            'process': tunnel.popen,
+            'tunnel': tunnel,
+            'pid': tunnel.pid
         }
-        active_connections.append(connection)
-        
-        # Monitor process
-        def monitor_process():
-            try:
-                if ps_pid:
-                    try:
-                        proc = psutil.Process(ps_pid)
-                        proc.wait()
-                    except (psutil.NoSuchProcess, psutil.AccessDenied):
-                        pass
-                    finally:
-                        global active_connections
-                        active_connections[:] = [c for c in active_connections 
-                                              if c['connection_id'] != connection_id]
-            except Exception as e:
-                logging.error(f"Error monitoring RDP process: {str(e)}")
+        active_connections.add(connection)
         
-        thread = threading.Thread(target=monitor_process, daemon=True)
-        thread.start()
+        # Monitor process through the shared supervisor
+        tunnel_supervisor.watch(connection_id, tunnel, on_connection_exit)
         
         logging.info(f"RDP session started - Instance: {instance_id}, Port: {local_port}")
         return jsonify({
             "status": "success", 
             "connection_id": connection_id,
-            "port": local_port
+            "port": local_port,
+            "local_port": local_port,
+            "ready": tunnel.ready.is_set()
         })
         
     except Exception as e:
@@ -389,6 +520,34 @@ def get_instance_details(instance_id):
     
     
     
+@app.route('/api/instance-details', methods=['POST'])
+def get_instances_details():
+    """Get details for several EC2 instances in one request.
+
+    Request body (JSON):
+        instance_ids (list): EC2 instance IDs.
+
+    Returns:
+        JSON with 'details' (instance ID -> details) and 'not_found' (list of IDs).
+    """
+    if not aws_manager.is_connected:
+        return jsonify({'error': 'Not connected to AWS'}), 400
+    try:
+        data = request.get_json(silent=True) or {}
+        instance_ids = data.get('instance_ids') or []
+        if not isinstance(instance_ids, list):
+            return jsonify({'error': 'instance_ids must be a list'}), 400
+        details = aws_manager.get_instances_details(instance_ids)
+        return jsonify({
+            'details': details,
+            'not_found': [i for i in instance_ids if i not in details]
+        })
+    except Exception as e:
+        logging.error(f"Error getting instance details: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
+
 @app.route('/api/windows-password/<instance_id>', methods=['POST'])
 def get_windows_password(instance_id: str):
     """Decrypt the Windows Administrator password for a Windows EC2 instance.
@@ -456,6 +615,14 @@ def update_preferences():
     try:
         new_preferences = request.json
         if preferences_handler.update_preferences(new_preferences):
+            apply_inventory_settings()
+            port_allocator.configure(*preferences_handler.get_port_range())
+            transfer_settings = preferences_handler.get_transfer_settings()
+            transfer_tunnels.idle_timeout = transfer_settings['tunnel_idle_timeout']
+            transfer_queue.configure(
+                max_concurrent=transfer_settings['max_concurrent'],
+                per_instance=transfer_settings['per_instance_concurrent']
+            )
             return jsonify({'status': 'success'})
         return jsonify({'error': 'Failed to update preferences'}), 500
     except Exception as e:
@@ -465,12 +632,20 @@ def update_preferences():
     
 @app.route('/api/refresh', methods=['POST'])
 def refresh_data():
-    """Refresh instances data"""
+    """Refresh instances data
+
+    Request body (JSON, optional):
+        force (bool): bypass the inventory cache and fetch from AWS now.
+    """
     try:
-        instances = aws_manager.list_ssm_instances()
+        data = request.get_json(silent=True) or {}
+        instances = aws_manager.list_ssm_instances(force_refresh=bool(data.get('force')))
+        if isinstance(instances, dict) and 'error' in instances:
+            return jsonify({'error': instances['error']}), 401
         return jsonify({
             "status": "success",
-            "instances": instances if instances else []
+            "instances": instances if instances else [],
+            "snapshot_age": aws_manager.get_snapshot_age()
         })
     except Exception as e:
         print(f"Error refreshing data: {str(e)}")
@@ -491,85 +666,34 @@ def start_custom_port(instance_id):
         # Generate connection ID based on mode
         connection_id = f"port_{mode}_{instance_id}_{int(time.time())}"
         
-        # Get free port
-        local_port = find_free_port()
-        if local_port is None:
-            logging.error("Could not find available port for port forwarding")
-            return jsonify({'error': 'No available ports'}), 503
-            
-        # Create appropriate AWS command based on mode
+        # Pick the SSM document based on mode
         if mode == 'local':
-            logging.info(f"Starting local port forwarding - Instance: {instance_id}, Local: {local_port}, Remote: {remote_port}")
-            aws_command = f"aws ssm start-session --target {instance_id} --document-name AWS-StartPortForwardingSession --parameters portNumber={remote_port},localPortNumber={local_port} --region {region} --profile {profile}"
+            logging.info(f"Starting local port forwarding - Instance: {instance_id}, Remote: {remote_port}")
+            connection_type = 'Custom Port'
+            document = 'AWS-StartPortForwardingSession'
+            remote_host = None
         else:
             logging.info(f"Starting remote host port forwarding - Instance: {instance_id}, Host: {remote_host}, Port: {remote_port}")
-            #aws_command = f'aws ssm start-session --region {region} --target {instance_id} --document-name AWS-StartPortForwardingSessionToRemoteHost --parameters host="{remote_host}",portNumber="{remote_port}",localPortNumber="{local_port}" --profile {profile}'
-            aws_command = f"aws ssm start-session --target {instance_id} --document-name AWS-StartPortForwardingSessionToRemoteHost --parameters host={remote_host},portNumber={remote_port},localPortNumber={local_port} --region {region} --profile {profile}"
-        startupinfo = subprocess.STARTUPINFO()
-        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-        startupinfo.wShowWindow = subprocess.SW_HIDE
-        
-        # Start port forwarding process
-        process = subprocess.Popen(
-            ["powershell", "-Command", aws_command],
-            startupinfo=startupinfo,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
+            connection_type = 'Remote Host Port'
+            document = 'AWS-StartPortForwardingSessionToRemoteHost'
+
+        # Start port forwarding process, or share an identical live one
+        connection, shared = open_forward(
+            connection_id, connection_type, instance_id, profile, region,
+            document, remote_port, remote_host
         )
-        
-        # Define find_powershell_pid function
-        def find_powershell_pid():
-            time.sleep(2)
-            for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
-                try:
-                    if proc.name().lower() == 'powershell.exe':
-                        cmdline = ' '.join(proc.cmdline()).lower()
-                        if aws_command.lower() in cmdline:
-                            return proc.pid
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                    continue
-            return None
-            
-        # Find PowerShell process PID
-        ps_pid = find_powershell_pid()
-        
-        # Create connection object with appropriate type and info
-        connection = {
-            'connection_id': connection_id,
-            'instance_id': instance_id,
-            'type': 'Remote Host Port' if mode != 'local' else 'Custom Port',
-            'local_port': local_port,
-            'remote_port': remote_port,
-            'remote_host': remote_host if mode != 'local' else None,
-            'process': process,
-            'pid': ps_pid
-        }
-        active_connections.append(connection)
-        
-        # Monitor process
-        def monitor_process():
-            try:
-                if ps_pid:
-                    try:
-                        proc = psutil.Process(ps_pid)
-                        proc.wait()
-                    except (psutil.NoSuchProcess, psutil.AccessDenied):
-                        pass
-                    finally:
-                        global active_connections
-                        active_connections[:] = [c for c in active_connections 
-                                              if c['connection_id'] != connection_id]
-            except Exception as e:
-                logging.error(f"Error monitoring port forwarding process: {str(e)}")
-        
-        thread = threading.Thread(target=monitor_process, daemon=True)
-        thread.start()
+        if connection is None:
+            logging.error("Could not find available port for port forwarding")
+            return jsonify({'error': 'No available ports'}), 503
         
         response_data = {
             "status": "success",
-            "connection_id": connection_id,
-            "local_port": local_port,
+            "connection_id": connection['connection_id'],
+            "local_port": connection['local_port'],
             "remote_port": remote_port,
+            "shared": shared,
+            "refcount": connection['refcount'],
+            "ready": connection['tunnel'].ready.is_set()
         }
 
         # Add remote_host to response only for remote mode
@@ -583,62 +707,52 @@ def start_custom_port(instance_id):
         logging.error(f"Error starting port forwarding: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/events')
+def stream_events():
+    """Server-Sent Events stream of connection, transfer and inventory updates.
+
+    Events:
+        connection-started / connection-closed: the connection fields of
+            /api/active-connections ('connection-closed' adds 'exit_code').
+        transfer-progress: 'transfer_id' plus the /api/transfer-progress fields.
+        inventory-changed: 'profile' and 'region' of a snapshot whose content
+            changed on refresh.
+    """
+    subscriber = event_bus.subscribe()
+
+    def generate():
+        try:
+            yield from event_bus.stream(subscriber)
+        finally:
+            event_bus.unsubscribe(subscriber)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
 @app.route('/api/active-connections')
 def get_active_connections():
-    """Get list of active connections with port information"""
+    """Get list of active connections with port information.
+
+    Only reads the state cached by the background health checker, so the
+    UI polling never waits on process or port checks. Connections created
+    since the last check pass are listed with 'checked_at' set to None.
+    """
     try:
+        health_checker.start()
         active = []
-        to_remove = []
         
-        for conn in active_connections:
-            try:
-                is_active = False
-                pid = conn.get('pid')
-                
-                if pid:
-                    try:
-                        process = psutil.Process(pid)
-                        if process.is_running():
-                            # Per RDP e Custom Port, verifica anche che la porta sia ancora in uso
-                            if conn['type'] in ['RDP', 'Custom Port']:
-                                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                                try:
-                                    result = sock.connect_ex(('127.0.0.1', conn['local_port']))
-                                    is_active = (result == 0)  # La porta è in uso
-                                finally:
-                                    sock.close()
-                            else:
-                                is_active = True
-                    except (psutil.NoSuchProcess, psutil.AccessDenied):
-                        pass
-                        
-                if is_active:
-                    connection_info = {
-                        'connection_id': conn['connection_id'],
-                        'instance_id': conn['instance_id'],
-                        'type': conn['type']
-                    }
-                    
-                    # Add port information if available
-                    if 'local_port' in conn:
-                        connection_info['local_port'] = conn['local_port']
-                    if 'remote_port' in conn:
-                        connection_info['remote_port'] = conn['remote_port']
-                        
-                    active.append(connection_info)
-                else:
-                    to_remove.append(conn)
-                    
-            except Exception as e:
-                logging.error(f"Error checking connection: {str(e)}")
-                to_remove.append(conn)
-                
-        # Remove inactive connections
-        for conn in to_remove:
-            try:
-                active_connections.remove(conn)
-            except ValueError:
-                pass
+        for conn in active_connections.snapshot():
+            health = health_checker.get(conn['connection_id'])
+            if health is not None and not health['healthy']:
+                continue
+
+            connection_info = _connection_info(conn)
+            connection_info['checked_at'] = health['checked_at'] if health else None
+            active.append(connection_info)
                 
         return jsonify(active)
         
@@ -648,56 +762,120 @@ def get_active_connections():
         
 
 
-def monitor_process(connection_id, pid):
-    """Monitor a specific process and update connection status"""
-    try:
-        process = psutil.Process(pid)
-        while process.is_running():
-            try:
-                # Verifica che il processo sia ancora un cmd.exe
-                if process.name().lower() != 'cmd.exe':
-                    break
-                time.sleep(1)
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                break
-    except (psutil.NoSuchProcess, psutil.AccessDenied):
-        pass
-    finally:
-        # Rimuovi la connessione quando il processo termina
-        global active_connections
-        active_connections[:] = [c for c in active_connections if c['connection_id'] != connection_id]
-        
+def _connection_info(conn):
+    """Client-visible fields of a connection"""
+    tunnel = conn.get('tunnel')
+    connection_info = {
+        'connection_id': conn['connection_id'],
+        'instance_id': conn['instance_id'],
+        'type': conn['type'],
+        'ready': bool(tunnel and tunnel.ready.is_set())
+    }
+
+    # Add port information if available
+    if 'local_port' in conn:
+        connection_info['local_port'] = conn['local_port']
+    if 'remote_port' in conn:
+        connection_info['remote_port'] = conn['remote_port']
+    if 'refcount' in conn:
+        connection_info['refcount'] = conn['refcount']
+    return connection_info
+
+
+def _publish_connection_change(change, conn):
+    """Registry listener: push connection start and exit on the event stream"""
+    if change == 'added':
+        event_bus.publish('connection-started', _connection_info(conn))
+        tunnel = conn.get('tunnel')
+        if tunnel is not None:
+            # Forwards only accept connections a moment later; tell the UI when they do
+            tunnel.on_ready(lambda tunnel: event_bus.publish('connection-ready', _connection_info(conn)))
+    else:
+        tunnel = conn.get('tunnel')
+        event_bus.publish('connection-closed', {
+            **_connection_info(conn),
+            'exit_code': tunnel.popen.returncode if tunnel else None
+        })
+
+
+active_connections.add_listener(_publish_connection_change)
+
+
+def on_connection_exit(connection_id, tunnel):
+    """Supervisor callback: record the output of an exited session and drop its connection"""
+    # Keep the output around so /api/connection-log can show why the tunnel died
+    closed_connection_logs[connection_id] = _tunnel_log(tunnel)
+    while len(closed_connection_logs) > CLOSED_CONNECTION_LOGS_MAX:
+        closed_connection_logs.popitem(last=False)
+    # Rimuovi la connessione quando il processo termina
+    active_connections.remove(connection_id)
+    # The forward is gone with its process: its local port can be handed out again
+    port_allocator.release(tunnel.local_port)
+
+
+def _tunnel_log(tunnel):
+    """Build the /api/connection-log payload for a session process"""
+    return {
+        'pid': tunnel.pid,
+        'session_id': tunnel.session_id,
+        'running': tunnel.is_running(),
+        'exit_code': tunnel.popen.returncode,
+        'lines': tunnel.get_output(),
+    }
+
+
+@app.route('/api/connection-log/<connection_id>')
+def get_connection_log(connection_id):
+    """Return the buffered stdout/stderr of a connection's session process.
+
+    Works for active connections, recently closed ones and file transfer
+    tunnels (pass the transfer_id).
+
+    Returns:
+        JSON with 'pid', 'session_id', 'running', 'exit_code' and 'lines'
+        (list of {'time', 'stream', 'line'}, oldest first).
+    """
+    connection = active_connections.get(connection_id)
+    if connection and connection.get('tunnel'):
+        return jsonify(_tunnel_log(connection['tunnel']))
+
+    if connection_id in closed_connection_logs:
+        return jsonify(closed_connection_logs[connection_id])
+
+    transfer = active_transfers.get(connection_id)
+    if transfer:
+        tunnel = transfer.get('_tunnel_process')
+        if tunnel:
+            return jsonify(_tunnel_log(tunnel))
+        if transfer.get('_tunnel_log'):
+            return jsonify(transfer['_tunnel_log'])
+
+    return jsonify({'error': 'Connection not found'}), 404
+
+
 @app.route('/api/terminate-connection/<connection_id>', methods=['POST'])
 def terminate_connection(connection_id):
     """Terminate a connection"""
     try:
-        connection = next((c for c in active_connections 
-                         if c.get('connection_id') == connection_id), None)
+        connection = active_connections.get(connection_id)
         
         if not connection:
             return jsonify({"error": "Connection not found"}), 404
+
+        # Shared forwards stay up until their last user lets go
+        refcount = active_connections.release(connection_id)
+        if refcount:
+            logging.info(f"Released connection {connection_id}, {refcount} references left")
+            return jsonify({"status": "success", "refcount": refcount})
             
-        pid = connection.get('pid')
-        if pid:
-            try:
-                process = psutil.Process(pid)
-                # Termina il processo e tutti i suoi figli
-                for child in process.children(recursive=True):
-                    child.terminate()
-                process.terminate()
-                
-                # Attendi che terminino
-                gone, alive = psutil.wait_procs([process], timeout=3)
-                for p in alive:
-                    p.kill()
-                    
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                pass
+        tunnel = connection.get('tunnel')
+        if tunnel:
+            # Termina il processo e tutti i suoi figli
+            tunnel.terminate()
                 
-        active_connections[:] = [c for c in active_connections 
-                               if c.get('connection_id') != connection_id]
+        active_connections.remove(connection_id)
                                
-        return jsonify({"status": "success"})
+        return jsonify({"status": "success", "refcount": 0})
         
     except Exception as e:
         logging.error(f"Error terminating connection: {str(e)}")
@@ -812,10 +990,11 @@ def open_file_dialog():
     """Open a native file or folder selection dialog via pywebview.
 
     Request body (JSON):
-        type (str): 'open' for a single file, 'folder' for a directory.
+        type (str): 'open' for one or more files, 'folder' for a directory.
 
     Returns:
-        JSON with key 'path' (str or None if cancelled).
+        JSON with 'paths' (list, empty if cancelled) and 'path' (the first
+        selection, or None).
     """
     try:
         data = request.json or {}
@@ -829,12 +1008,12 @@ def open_file_dialog():
         else:
             result = window.create_file_dialog(
                 webview.OPEN_DIALOG,
-                allow_multiple=False,
+                allow_multiple=True,
             )
 
         if result:
-            return jsonify({'path': result[0]})
-        return jsonify({'path': None})
+            return jsonify({'path': result[0], 'paths': list(result)})
+        return jsonify({'path': None, 'paths': []})
 
     except Exception as e:
         logging.error(f"File dialog error: {e}")
@@ -843,222 +1022,806 @@ def open_file_dialog():
 
 @app.route('/api/transfer/<instance_id>', methods=['POST'])
 def start_transfer(instance_id: str):
-    """Start an SCP file transfer to/from an EC2 instance via an SSM SSH tunnel.
-
-    Flow:
-        1. Allocate a free local port and open an SSM port-forward to port 22.
-        2. Wait up to 15 s for the tunnel port to become reachable.
-        3. Run SCP against 127.0.0.1:<local_port>, capturing stdout/stderr for
-           progress updates parsed via regex.
-        4. Kill the tunnel once SCP exits.
+    """Queue SCP file transfers to/from an EC2 instance via an SSM SSH tunnel.
+
+    Every path becomes one transfer in the transfer queue, which runs them
+    under the global and per-instance concurrency limits of the preferences.
+    Each transfer then:
+        1. Takes the instance's warm SSM port-forward to port 22 from the
+           transfer tunnel pool, opening it if there is none.
+        2. For a new tunnel, waits up to 15 s for the plugin to report the
+           tunnel port as listening (TCP probe as fallback).
+        3. Runs SCP (recursive, so directories work too) against
+           127.0.0.1:<local_port>, capturing stdout/stderr for progress
+           updates parsed via regex.
+        4. Hands the tunnel back to the pool once SCP exits; it is closed
+           after the configured idle timeout.
 
     Request body (JSON):
         direction (str): 'upload' or 'download'.
         remote_user (str): SSH username on the remote instance (e.g. 'ec2-user').
         key_path (str): Optional path to an SSH private key (.pem).
-        local_path (str): Local file path for upload source, or local destination
-                          directory for download.
+        local_path (str): Local file or directory for upload source, or local
+                          destination directory for download.
+        local_paths (list): Several upload sources (instead of local_path).
         remote_path (str): Remote destination directory for upload, or remote
-                           source file path for download.
+                           source path for download.
+        remote_paths (list): Several download sources (instead of remote_path).
+        priority (int): Higher runs first; default 0.
         profile (str): AWS CLI profile name.
         region (str): AWS region string.
 
     Returns:
-        JSON with 'transfer_id' on success.
+        JSON with 'batch_id', 'transfer_ids' and 'transfer_id' (the first one).
     """
     try:
-        data = request.json
-        direction   = (data.get('direction') or '').strip()
-        remote_user = (data.get('remote_user') or 'ec2-user').strip()
-        key_path    = (data.get('key_path') or '').strip()
-        local_path  = (data.get('local_path') or '').strip()
-        remote_path = (data.get('remote_path') or '').strip()
-        profile     = data.get('profile')
-        region      = data.get('region')
-
-        if not direction or not remote_user or not local_path or not remote_path:
-            return jsonify({'error': 'Missing required fields'}), 400
-
-        transfer_id = f"transfer_{instance_id}_{int(time.time())}"
-        filename = os.path.basename(
-            local_path if direction == 'upload' else remote_path
+        data = request.json or {}
+        items, error = _transfer_items(instance_id, data)
+        if error:
+            return jsonify({'error': error}), 400
+
+        batch_id, transfer_ids = _queue_transfers(items, data.get('profile'), data.get('region'))
+        return jsonify({
+            'status': 'success',
+            'batch_id': batch_id,
+            'transfer_ids': transfer_ids,
+            'transfer_id': transfer_ids[0],
+        })
+
+    except Exception as e:
+        logging.error(f"Error starting transfer: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/transfers', methods=['POST'])
+def start_transfers():
+    """Queue one batch of transfers across several instances.
+
+    Request body (JSON):
+        items (list): one object per instance with 'instance_id' plus the
+                      fields of POST /api/transfer/<instance_id> (direction,
+                      remote_user, key_path, local_path(s), remote_path(s),
+                      priority).
+        priority (int): default priority of the items.
+        profile (str): AWS CLI profile name.
+        region (str): AWS region string.
+
+    Returns:
+        JSON with 'batch_id' and 'transfer_ids'.
+    """
+    try:
+        data = request.json or {}
+        if not data.get('items'):
+            return jsonify({'error': 'No transfers given'}), 400
+        if not isinstance(data['items'], list) or not all(isinstance(spec, dict) for spec in data['items']):
+            return jsonify({'error': 'items must be a list of objects'}), 400
+        try:
+            default_priority = _parse_priority(data.get('priority')) or 0
+        except ValueError:
+            return jsonify({'error': 'priority must be an integer'}), 400
+
+        items = []
+        for spec in data['items']:
+            if not spec.get('instance_id'):
+                return jsonify({'error': 'Missing instance_id'}), 400
+            spec_items, error = _transfer_items(spec['instance_id'], spec)
+            if error:
+                return jsonify({'error': f"{spec['instance_id']}: {error}"}), 400
+            items.extend(spec_items)
+
+        batch_id, transfer_ids = _queue_transfers(
+            items, data.get('profile'), data.get('region'), default_priority
         )
+        return jsonify({'status': 'success', 'batch_id': batch_id, 'transfer_ids': transfer_ids})
+
+    except Exception as e:
+        logging.error(f"Error starting transfers: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/transfers')
+def list_transfers():
+    """Return the aggregated progress of a batch (batch_id=...) or of every transfer.
+
+    Returns:
+        JSON with 'status', 'progress' (0-100, weighted by size when every
+        size is known), 'message', 'speed', 'eta', per-status counts and
+        'transfers' (the /api/transfer-progress fields of each item).
+    """
+    batch_id = request.args.get('batch_id')
+    if batch_id and batch_id not in transfer_batches:
+        return jsonify({'error': 'Batch not found'}), 404
+    transfer_ids = transfer_batches[batch_id] if batch_id else list(active_transfers)
+    result = _batch_progress(transfer_ids)
+    result['batch_id'] = batch_id
+    result['transfers'] = [
+        {'transfer_id': tid, **_transfer_progress(active_transfers[tid])} for tid in transfer_ids
+    ]
+    result['queue'] = transfer_queue.stats()
+    return jsonify(result)
+
+
+@app.route('/api/transfers/<batch_id>', methods=['DELETE'])
+def cancel_batch(batch_id: str):
+    """Cancel every transfer of a batch that has not finished yet."""
+    for transfer_id in transfer_batches.get(batch_id, []):
+        _cancel_transfer(transfer_id)
+    return jsonify({'status': 'success'})
+
+
+@app.route('/api/transfers/<batch_id>/retry', methods=['POST'])
+def retry_batch(batch_id: str):
+    """Queue the failed and cancelled transfers of a batch again, resuming where possible.
+
+    Single files pick up from the last verified offset (see _chunked_plan);
+    directories are sent again in full. Completed transfers are left alone.
+
+    Returns:
+        JSON with 'status' and 'transfer_ids' (the transfers queued again).
+    """
+    try:
+        if batch_id not in transfer_batches:
+            return jsonify({'error': 'Batch not found'}), 404
+
+        retried = []
+        for transfer_id in transfer_batches[batch_id]:
+            t = active_transfers[transfer_id]
+            if t['status'] not in ('error', 'cancelled'):
+                continue
+            t['_job']['resume'] = True
+            # _cancelled is cleared when the retry starts: a cancelled run may still be stopping
+            t['_retry'] = True
+            _update_transfer(transfer_id, {
+                'status': 'queued',
+                'message': 'Queued to resume…',
+                'speed': '',
+                'eta': '',
+            })
+            transfer_queue.submit(transfer_id, t['_job']['instance_id'], t['_job']['priority'])
+            retried.append(transfer_id)
+
+        logging.info(f"Retrying {len(retried)} transfer(s) of {batch_id}")
+        return jsonify({'status': 'success', 'batch_id': batch_id, 'transfer_ids': retried})
+
+    except Exception as e:
+        logging.error(f"Error retrying transfers of {batch_id}: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+def _transfer_items(instance_id, data):
+    """Expand one transfer request into one item per path
+
+    Returns:
+        (items, error): items are dicts ready for _queue_transfers; error is
+        a message when a required field is missing.
+    """
+    if not all(isinstance(data.get(field) or '', str)
+               for field in ('direction', 'remote_user', 'key_path', 'local_path', 'remote_path')):
+        return [], 'direction, remote_user, key_path and paths must be strings'
+    local_paths  = _path_list(data, 'local_paths', 'local_path')
+    remote_paths = _path_list(data, 'remote_paths', 'remote_path')
+    if local_paths is None or remote_paths is None:
+        return [], 'local_paths and remote_paths must be lists of strings'
+
+    direction   = (data.get('direction') or '').strip()
+    remote_user = (data.get('remote_user') or 'ec2-user').strip()
+    key_path    = (data.get('key_path') or '').strip()
+
+    if direction not in ('upload', 'download') or not remote_user or not local_paths or not remote_paths:
+        return [], 'Missing required fields'
+    try:
+        priority = _parse_priority(data.get('priority'))
+    except ValueError:
+        return [], 'priority must be an integer'
+
+    base = {
+        'instance_id': instance_id,
+        'direction': direction,
+        'remote_user': remote_user,
+        'key_path': key_path,
+        'priority': priority,
+        # 'auto' splits large single files into parallel ranges, 'scp' never does
+        'mode': data.get('mode') if data.get('mode') in ('auto', 'scp', 'chunked') else 'auto',
+        # 'auto' compresses when a sample of the data compresses well, 'on' always, 'off' never
+        'compression': data.get('compression') if data.get('compression') in ('auto', 'on', 'off') else None,
+    }
+    if direction == 'upload':
+        # Every source goes into the same remote directory
+        return [{**base, 'local_path': p, 'remote_path': remote_paths[0]} for p in local_paths], None
+    # Every source goes into the same local directory
+    return [{**base, 'local_path': local_paths[0], 'remote_path': p} for p in remote_paths], None
+
+
+def _path_list(data, plural, single):
+    """Return the non-blank paths of data[plural] (or of data[single] alone), None if not strings"""
+    paths = data.get(plural) or [data.get(single) or '']
+    if not isinstance(paths, list) or not all(isinstance(p, str) for p in paths):
+        return None
+    return [p.strip() for p in paths if p.strip()]
+
+
+def _parse_priority(value):
+    """Return a transfer priority as an int, or None when not given
+
+    Raises:
+        ValueError if value is not a whole number.
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise ValueError(f"Invalid priority: {value!r}")
+    try:
+        return int(value)
+    except TypeError:
+        raise ValueError(f"Invalid priority: {value!r}")
+
+
+def _local_size(path):
+    """Size in bytes of a local file or directory tree, or None if unreadable"""
+    try:
+        if os.path.isdir(path):
+            return sum(
+                os.path.getsize(os.path.join(root, name))
+                for root, _, names in os.walk(path) for name in names
+            )
+        return os.path.getsize(path)
+    except OSError:
+        return None
+
+
+def _queue_transfers(items, profile, region, priority=0):
+    """Register items as transfers of a new batch and submit them to the queue"""
+    batch_id = f"batch_{int(time.time())}_{uuid.uuid4().hex[:8]}"
+    transfer_ids = []
+    for item in items:
+        transfer_id = f"transfer_{item['instance_id']}_{int(time.time())}_{uuid.uuid4().hex[:8]}"
+        source = item['local_path'] if item['direction'] == 'upload' else item['remote_path']
+        # Priorities were validated by _transfer_items
+        item_priority = item['priority'] if item['priority'] is not None else priority
 
         active_transfers[transfer_id] = {
             'progress': 0,
-            'status': 'starting',
-            'message': 'Setting up SSH tunnel…',
-            'filename': filename,
+            'status': 'queued',
+            'message': 'Queued…',
+            'filename': os.path.basename(source.rstrip('/\\')),
             'speed': '',
             'eta': '',
+            'batch_id': batch_id,
+            # Upload sizes weight the batch progress; download sizes are unknown up front
+            'size': _local_size(source) if item['direction'] == 'upload' else None,
+            '_job': {**item, 'priority': item_priority, 'profile': profile, 'region': region},
             '_tunnel_process': None,  # not sent to client
+            '_scp_process': None,     # terminated by DELETE /api/transfer/<id>
+            '_processes': [],         # ssh streams of a chunked transfer, terminated on cancel too
             '_cancelled': False,      # set by DELETE /api/transfer/<id>
         }
+        transfer_ids.append(transfer_id)
 
-        def run_transfer():
-            """Background thread: tunnel → SCP → cleanup."""
-            tunnel_proc = None
-            try:
-                # --- Step 1: start SSM port-forward to port 22 ---
-                local_port = find_free_port()
-                if not local_port:
-                    active_transfers[transfer_id].update({
-                        'status': 'error',
-                        'message': 'No free port available for SSH tunnel.',
-                    })
-                    return
+    transfer_batches[batch_id] = transfer_ids
+    for transfer_id in transfer_ids:
+        _update_transfer(transfer_id, {})
+        job = active_transfers[transfer_id]['_job']
+        transfer_queue.submit(transfer_id, job['instance_id'], job['priority'])
+    logging.info(f"Queued {len(transfer_ids)} transfer(s) as {batch_id}")
+    return batch_id, transfer_ids
 
-                aws_cmd = (
-                    f"aws ssm start-session --target {instance_id} "
-                    f"--document-name AWS-StartPortForwardingSession "
-                    f"--parameters portNumber=22,localPortNumber={local_port} "
-                    f"--region {region} --profile {profile}"
-                )
-                startupinfo = subprocess.STARTUPINFO()
-                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-                startupinfo.wShowWindow = subprocess.SW_HIDE
-
-                tunnel_proc = subprocess.Popen(
-                    ["powershell", "-Command", aws_cmd],
-                    startupinfo=startupinfo,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
+
+def _chunked_plan(job, local_port, probe=None):
+    """Decide whether a transfer goes through ChunkedTransfer
+
+    Single regular files of at least chunk_threshold_mb always do. Smaller
+    ones only do when they can resume: a retry, or a file with a recorded
+    checkpoint. A resume point is the smaller of the checkpoint and the size
+    of the partial destination file, and is only trusted once the checksums
+    of that prefix match on both sides.
+
+    Everything that can be ruled out locally is, before the instance is
+    asked anything: a small fresh upload costs no extra ssh call, and a
+    download candidate costs one remote_stat, or none when run_transfer
+    already made it (probe).
+
+    Returns:
+        dict with local_file, remote_file, size, start_offset and key, or
+        None to use SCP (directories, small fresh files, ssh missing, mode 'scp').
+    """
+    settings = preferences_handler.get_transfer_settings()
+    if job.get('mode') == 'scp' or not shutil.which('ssh'):
+        return None
+    popen_kwargs = launcher.hidden_popen_kwargs()
+    ssh_target = (local_port, job['remote_user'], job['key_path'])
+
+    key = (job['instance_id'], job['direction'], job['local_path'], job['remote_path'])
+    resume = job.get('resume') or key in transfer_checkpoints
+    chunkable = settings['parallel_streams'] >= 2
+    threshold = 0 if job.get('mode') == 'chunked' else settings['chunk_threshold_mb'] * 1024 * 1024
+    if not resume and not chunkable:
+        return None
+
+    if job['direction'] == 'upload':
+        local_file = job['local_path']
+        if not os.path.isfile(local_file):
+            return None
+        size = os.path.getsize(local_file)
+        if not resume and size < max(threshold, 1):
+            return None
+        # One lookup tells where the file goes and how much of it is already there
+        remote = remote_stat(*ssh_target, job['remote_path'], os.path.basename(local_file), popen_kwargs)
+        remote_file = job['remote_path']
+        if remote['kind'] == 'dir':
+            remote_file = remote_file.rstrip('/') + '/' + os.path.basename(local_file)
+        partial = remote['size'] or 0
+    else:
+        remote_file = job['remote_path']
+        remote = probe or remote_stat(*ssh_target, remote_file, popen_kwargs=popen_kwargs)
+        size = remote['size']
+        if remote['kind'] != 'file' or not size:
+            return None
+        if not resume and size < max(threshold, 1):
+            return None
+        local_file = job['local_path']
+        if os.path.isdir(local_file):
+            local_file = os.path.join(local_file, os.path.basename(remote_file.rstrip('/')))
+        partial = os.path.getsize(local_file) if os.path.isfile(local_file) else 0
+
+    recorded = transfer_checkpoints.get(key, size)
+    start_offset = 0
+    if resume:
+        offset = min(partial, size if recorded is None else recorded)
+        if offset < size:
+            offset -= offset % ChunkedTransfer.CHUNK_ALIGN
+        if offset and local_sha256(local_file, offset) == remote_sha256(*ssh_target, remote_file, offset, popen_kwargs):
+            start_offset = offset
+            logging.info(f"Resuming {job['direction']} of {remote_file} at byte {offset} of {size}")
+        elif offset:
+            logging.info(f"Partial copy of {remote_file} does not match, transferring it again")
+
+    return {'local_file': local_file, 'remote_file': remote_file, 'size': size,
+            'start_offset': start_offset, 'key': key}
+
+
+def _run_chunked_transfer(transfer_id, tunnel_proc, plan):
+    """Move one large file as parallel ranges, one stream per pooled tunnel slot
+
+    Slot 0 is the tunnel run_transfer already holds; the other slots are
+    opened in parallel. Slots that fail to come up are skipped, so the
+    transfer goes ahead with however many streams are available. Progress
+    is checkpointed in transfer_checkpoints until the file is verified.
+    """
+    t = active_transfers[transfer_id]
+    job = t['_job']
+    settings = preferences_handler.get_transfer_settings()
+    should_stop = lambda: t.get('_cancelled')
+    size, start_offset = plan['size'], plan['start_offset']
+    chunk_size = settings['chunk_size_mb'] * 1024 * 1024
+
+    # No more streams than ranges left to send
+    streams = max(1, min(settings['parallel_streams'], -(-(size - start_offset) // chunk_size)))
+    _update_transfer(transfer_id, {
+        'size': size,
+        'resumed_from': start_offset,
+        'message': f"Opening {streams} parallel streams…",
+    })
+    extra = [None] * (streams - 1)
+
+    def open_slot(index):
+        try:
+            extra[index] = transfer_tunnels.acquire(
+                job['instance_id'], job['profile'], job['region'], TUNNEL_READY_TIMEOUT,
+                should_stop=should_stop, slot=index + 1
+            )
+        except Exception as e:
+            logging.warning(f"Transfer stream {index + 1} not available: {str(e)}")
+
+    openers = [threading.Thread(target=open_slot, args=(i,), daemon=True) for i in range(len(extra))]
+    for opener in openers:
+        opener.start()
+    for opener in openers:
+        opener.join()
+
+    extra = [tunnel for tunnel in extra if tunnel is not None]
+    try:
+        if should_stop():
+            return
+        ports = [tunnel_proc.local_port] + [tunnel.local_port for tunnel in extra]
+        started = time.monotonic()
+        last_update = [0.0]
+
+        def on_progress(done, total):
+            now = time.monotonic()
+            if now - last_update[0] < 0.5 and done < total:
+                return
+            last_update[0] = now
+            speed = (done - start_offset) / (now - started) if now > started else 0
+            eta = int((total - done) / speed) if speed else 0
+            _update_transfer(transfer_id, {
+                'progress': int(done * 100 / total),
+                'speed': f'{speed / 1e6:.1f}MB/s',
+                'eta': f'{eta // 60}:{eta % 60:02d}',
+                'message': f'Transferring… {int(done * 100 / total)}% over {len(ports)} streams',
+            })
+
+        resumed = f' from {start_offset * 100 // size}%' if start_offset else ''
+        _update_transfer(transfer_id, {
+            'status': 'running',
+            'message': f'Transferring over {len(ports)} streams{resumed}…',
+            'progress': start_offset * 100 // size,
+            'streams': len(ports),
+        })
+        transfer_checkpoints.record(plan['key'], size, start_offset)
+        stats = ChunkedTransfer(
+            job['direction'], plan['local_file'], plan['remote_file'], size, ports,
+            job['remote_user'], job['key_path'],
+            chunk_size=chunk_size,
+            on_progress=on_progress,
+            should_stop=should_stop,
+            popen_kwargs=launcher.hidden_popen_kwargs(),
+            on_process=t['_processes'].append,
+            start_offset=start_offset,
+            on_checkpoint=lambda offset: transfer_checkpoints.record(plan['key'], size, offset),
+            compress=t.get('compression') == 'ssh',
+        ).run()
+        transfer_checkpoints.clear(plan['key'])
+
+        if should_stop():
+            return
+        report = _throughput_report(stats['throughput'], t.get('compression'), t.get('compression_ratio'))
+        if not stats['bytes']:
+            message = 'Already complete, checksum verified.'
+        else:
+            details = f" ({stats['speedup']}x a single stream)" if stats['speedup'] else ''
+            if start_offset:
+                details += f", resumed at {start_offset * 100 // size}%"
+            if _throughput_summary(report):
+                details += f", {_throughput_summary(report)}"
+            message = f"Completed at {stats['throughput'] / 1e6:.1f} MB/s over {stats['streams']} streams{details}, checksum verified."
+        _update_transfer(transfer_id, {
+            **report,
+            'status': 'completed',
+            'progress': 100,
+            'message': message,
+            'speed': '',
+            'eta': '',
+            'speedup': stats['speedup'],
+        })
+    except Exception as exc:
+        if not should_stop():
+            logging.error(f"Chunked transfer error [{transfer_id}]: {exc}")
+            _update_transfer(transfer_id, {'status': 'error', 'message': str(exc)})
+    finally:
+        t['_processes'] = []
+        for tunnel in extra:
+            transfer_tunnels.release(tunnel)
+
+
+def _compression_setting(job):
+    """The compression setting of a transfer: 'auto', 'on' or 'off'"""
+    return job.get('compression') or preferences_handler.get_transfer_settings()['compression']
+
+
+def _download_probe(job, local_port):
+    """Look up the source of a download once for _choose_compression, _chunked_plan and the tar stream
+
+    Returns:
+        remote_stat result including the compression sample, or None when
+        nothing needs it up front (uploads, compression 'off', ssh missing).
+    """
+    if job['direction'] != 'download' or _compression_setting(job) == 'off' or not shutil.which('ssh'):
+        return None
+    return remote_stat(local_port, job['remote_user'], job['key_path'], job['remote_path'],
+                       popen_kwargs=launcher.hidden_popen_kwargs(), sample=True)
+
+
+def _choose_compression(job, size, probe):
+    """Sample the data of a transfer and pick how to compress it on the wire
+
+    Data whose sample compresses by at least min_compression_ratio (or any
+    data with compression 'on') is compressed: directories go as a tar+gzip
+    stream, single files through ssh compression (scp -C, or -C on every
+    stream of a chunked transfer). Everything else goes raw. Data smaller
+    than COMPRESSION_MIN_SIZE is not sampled.
+
+    Args:
+        size: local size of an upload, None if unknown.
+        probe: _download_probe result for a download.
+
+    Returns:
+        dict with 'compression' ('raw', 'ssh' or 'stream') and
+        'compression_ratio' (the sampled ratio, None if not sampled).
+    """
+    settings = preferences_handler.get_transfer_settings()
+    setting = _compression_setting(job)
+    if setting == 'off':
+        return {'compression': 'raw', 'compression_ratio': None}
+
+    have_ssh = shutil.which('ssh') is not None
+    if job['direction'] == 'upload':
+        is_dir = os.path.isdir(job['local_path'])
+        ratio = local_compression_ratio(job['local_path']) if (size or 0) >= COMPRESSION_MIN_SIZE else None
+    elif probe:
+        is_dir, ratio = probe['kind'] == 'dir', probe['ratio']
+    else:
+        is_dir, ratio = False, None
+
+    if setting == 'auto' and (ratio is None or ratio < settings['min_compression_ratio']):
+        mode = 'raw'
+    elif is_dir and have_ssh:
+        mode = 'stream'
+    else:
+        mode = 'ssh'
+    ratio = round(ratio, 2) if ratio else None
+    logging.info(f"Compression for {job['direction']} of {job['local_path'] if job['direction'] == 'upload' else job['remote_path']}: "
+                 f"{mode} (sampled ratio {ratio})")
+    return {'compression': mode, 'compression_ratio': ratio}
+
+
+def _throughput_report(effective, compression, ratio):
+    """Progress fields comparing the effective throughput (bytes/s) with the one on the wire
+
+    For ssh compression the bytes on the wire are not visible, so they are
+    estimated from the sampled ratio; tar streams report the measured ratio.
+    """
+    compressed = compression not in (None, 'raw') and ratio
+    return {
+        'throughput': round(effective),
+        'wire_throughput': round(effective / ratio) if compressed else round(effective),
+        'compression_ratio': ratio if compressed else 1.0,
+    }
+
+
+def _throughput_summary(report):
+    """Describe the throughput of a completed compressed transfer, '' if it was not compressed"""
+    if report['compression_ratio'] == 1.0 or not report['throughput']:
+        return ''
+    return (f"{report['throughput'] / 1e6:.1f} MB/s effective, {report['wire_throughput'] / 1e6:.1f} MB/s "
+            f"on the wire ({report['compression_ratio']}x compression)")
+
+
+def _run_stream_transfer(transfer_id, local_port, probe):
+    """Move a directory tree as one tar+gzip stream (see TarStreamTransfer)"""
+    t = active_transfers[transfer_id]
+    job = t['_job']
+    should_stop = lambda: t.get('_cancelled')
+    total = t.get('size')
+    if job['direction'] == 'download':
+        # du -k from the download probe: POSIX, close enough for progress
+        total = probe['total'] if probe else None
+
+    started = time.monotonic()
+    last_update = [0.0]
+
+    def on_progress(raw, wire, total):
+        now = time.monotonic()
+        if now - last_update[0] < 0.5:
+            return
+        last_update[0] = now
+        elapsed = now - started
+        changes = {
+            'speed': f'{raw / elapsed / 1e6:.1f}MB/s' if elapsed else '',
+            'wire_throughput': round(wire / elapsed) if elapsed else 0,
+            'compression_ratio': round(raw / wire, 2) if wire else None,
+            'message': f'Streaming tar.gz… {raw / 1e6:.1f} MB as {wire / 1e6:.1f} MB on the wire',
+        }
+        if total:
+            changes['progress'] = min(99, int(raw * 100 / total))
+        _update_transfer(transfer_id, changes)
+
+    _update_transfer(transfer_id, {
+        'status': 'running',
+        'message': 'Streaming tar.gz…',
+        'progress': 0,
+        'size': total,
+    })
+    try:
+        stats = TarStreamTransfer(
+            job['direction'], job['local_path'], job['remote_path'], local_port,
+            job['remote_user'], job['key_path'],
+            total=total,
+            on_progress=on_progress,
+            should_stop=should_stop,
+            popen_kwargs=launcher.hidden_popen_kwargs(),
+            on_process=t['_processes'].append,
+        ).run()
+        if should_stop():
+            return
+        report = _throughput_report(stats['throughput'], 'stream', stats['compression_ratio'])
+        summary = _throughput_summary(report)
+        _update_transfer(transfer_id, {
+            **report,
+            'status': 'completed',
+            'progress': 100,
+            'message': f'Transfer completed successfully! {summary}.' if summary else 'Transfer completed successfully!',
+            'speed': '',
+            'eta': '',
+        })
+    except Exception as exc:
+        if not should_stop():
+            logging.error(f"Tar stream transfer error [{transfer_id}]: {exc}")
+            _update_transfer(transfer_id, {'status': 'error', 'message': str(exc)})
+    finally:
+        t['_processes'] = []
+
+
+def run_transfer(transfer_id):
+    """Transfer queue worker: tunnel → compression choice → SCP, parallel ranges or tar stream → cleanup."""
+    job = active_transfers[transfer_id]['_job']
+    instance_id = job['instance_id']
+    direction   = job['direction']
+    remote_user = job['remote_user']
+    key_path    = job['key_path']
+    local_path  = job['local_path']
+    remote_path = job['remote_path']
+    profile     = job['profile']
+    region      = job['region']
+
+    if active_transfers[transfer_id].pop('_retry', False):
+        active_transfers[transfer_id].update({'_cancelled': False, '_scp_process': None, '_processes': []})
+    if active_transfers[transfer_id].get('_cancelled'):
+        return
+
+    tunnel_proc = None
+    try:
+        # --- Steps 1-2: take a warm SSM port-forward to port 22, or open one and wait for it ---
+        _update_transfer(transfer_id, {'status': 'starting', 'message': 'Waiting for SSH tunnel…'})
+        tunnel_proc = transfer_tunnels.acquire(
+            instance_id, profile, region, TUNNEL_READY_TIMEOUT,
+            should_stop=lambda: active_transfers[transfer_id].get('_cancelled')
+        )
+        if active_transfers[transfer_id].get('_cancelled'):
+            return
+
+        if tunnel_proc is None:
+            _update_transfer(transfer_id, {
+                'status': 'error',
+                'message': 'SSH tunnel did not become ready. Check SSM connectivity and that SSH (port 22) is open on the instance.',
+            })
+            return
+
+        active_transfers[transfer_id]['_tunnel_process'] = tunnel_proc
+        local_port = tunnel_proc.local_port
+
+        if active_transfers[transfer_id].get('_cancelled'):
+            return
+
+        # --- Sample the data: raw, ssh compression, or a tar+gzip stream ---
+        probe = _download_probe(job, local_port)
+        compression = _choose_compression(job, active_transfers[transfer_id].get('size'), probe)
+        _update_transfer(transfer_id, compression)
+
+        # --- Large single files: parallel ranges over several SSM sessions ---
+        plan = _chunked_plan(job, local_port, probe)
+        if plan:
+            _run_chunked_transfer(transfer_id, tunnel_proc, plan)
+            return
+
+        if compression['compression'] == 'stream':
+            _run_stream_transfer(transfer_id, local_port, probe)
+            return
+
+        # --- Step 3: build SCP command ---
+        scp_cmd = [
+            'scp',
+            '-r',  # directories as well as single files
+            '-P', str(local_port),
+            '-o', 'StrictHostKeyChecking=no',
+            '-o', 'UserKnownHostsFile=/dev/null',
+        ]
+        if key_path:
+            scp_cmd += ['-i', key_path]
+        if compression['compression'] == 'ssh':
+            scp_cmd.append('-C')
+
+        if direction == 'upload':
+            scp_cmd += [local_path, f'{remote_user}@127.0.0.1:{remote_path}']
+        else:
+            scp_cmd += [f'{remote_user}@127.0.0.1:{remote_path}', local_path]
+
+        _update_transfer(transfer_id, {
+            'status': 'running',
+            'message': 'Transferring…',
+            'progress': 0,
+        })
+
+        # --- Step 4: run SCP, parse progress from merged stdout+stderr ---
+        started = time.monotonic()
+        scp_proc = subprocess.Popen(
+            scp_cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,  # merge stderr so we capture progress
+            encoding='utf-8',
+            errors='replace',
+            **launcher.hidden_popen_kwargs()
+        )
+        active_transfers[transfer_id]['_scp_process'] = scp_proc
+
+        # SCP writes progress using \r to overwrite the same terminal line.
+        # When piped, each \r-terminated chunk is a progress update.
+        buf = ''
+        while True:
+            if active_transfers[transfer_id].get('_cancelled'):
+                scp_proc.terminate()
+                return
+            chunk = scp_proc.stdout.read(256)
+            if not chunk:
+                break
+            buf += chunk
+            # Split on both \r and \n to capture each progress line
+            parts = re.split(r'[\r\n]', buf)
+            buf = parts[-1]  # keep partial last line for next iteration
+            for line in parts[:-1]:
+                line = line.strip()
+                if not line:
+                    continue
+                # SCP progress format: "filename  45%  512KB  1.0MB/s  0:01 ETA"
+                m = re.search(
+                    r'(\d+)%\s+([\d.]+\s*\S+)\s+([\d.]+\s*\S+/s)\s*([\d:]+)?\s*(ETA)?',
+                    line
                 )
-                active_transfers[transfer_id]['_tunnel_process'] = tunnel_proc
-
-                # --- Step 2: wait for the tunnel port to become reachable ---
-                active_transfers[transfer_id]['message'] = 'Waiting for SSH tunnel…'
-                tunnel_ready = False
-                for _ in range(15):
-                    if active_transfers[transfer_id].get('_cancelled'):
-                        return
-                    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                    try:
-                        if s.connect_ex(('127.0.0.1', local_port)) == 0:
-                            tunnel_ready = True
-                            break
-                    finally:
-                        s.close()
-                    time.sleep(1)
-
-                if not tunnel_ready:
-                    active_transfers[transfer_id].update({
-                        'status': 'error',
-                        'message': 'SSH tunnel did not become ready. Check SSM connectivity and that SSH (port 22) is open on the instance.',
+                if m:
+                    pct   = int(m.group(1))
+                    speed = (m.group(3) or '').strip()
+                    eta   = (m.group(4) or '').strip()
+                    _update_transfer(transfer_id, {
+                        'progress': pct,
+                        'speed': speed,
+                        'eta': eta,
+                        'message': f'Transferring… {pct}%',
                     })
-                    return
-
-                if active_transfers[transfer_id].get('_cancelled'):
-                    return
-
-                # --- Step 3: build SCP command ---
-                scp_cmd = [
-                    'scp',
-                    '-P', str(local_port),
-                    '-o', 'StrictHostKeyChecking=no',
-                    '-o', 'UserKnownHostsFile=/dev/null',
-                ]
-                if key_path:
-                    scp_cmd += ['-i', key_path]
-
-                if direction == 'upload':
-                    scp_cmd += [local_path, f'{remote_user}@127.0.0.1:{remote_path}']
-                else:
-                    scp_cmd += [f'{remote_user}@127.0.0.1:{remote_path}', local_path]
-
-                active_transfers[transfer_id].update({
-                    'status': 'running',
-                    'message': 'Transferring…',
-                    'progress': 0,
-                })
-
-                # --- Step 4: run SCP, parse progress from merged stdout+stderr ---
-                scp_proc = subprocess.Popen(
-                    scp_cmd,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.STDOUT,  # merge stderr so we capture progress
-                    startupinfo=startupinfo,
-                    encoding='utf-8',
-                    errors='replace',
-                )
 
-                # SCP writes progress using \r to overwrite the same terminal line.
-                # When piped, each \r-terminated chunk is a progress update.
-                buf = ''
-                while True:
-                    if active_transfers[transfer_id].get('_cancelled'):
-                        scp_proc.terminate()
-                        return
-                    chunk = scp_proc.stdout.read(256)
-                    if not chunk:
-                        break
-                    buf += chunk
-                    # Split on both \r and \n to capture each progress line
-                    parts = re.split(r'[\r\n]', buf)
-                    buf = parts[-1]  # keep partial last line for next iteration
-                    for line in parts[:-1]:
-                        line = line.strip()
-                        if not line:
-                            continue
-                        # SCP progress format: "filename  45%  512KB  1.0MB/s  0:01 ETA"
-                        m = re.search(
-                            r'(\d+)%\s+([\d.]+\s*\S+)\s+([\d.]+\s*\S+/s)\s*([\d:]+)?\s*(ETA)?',
-                            line
-                        )
-                        if m:
-                            pct   = int(m.group(1))
-                            speed = (m.group(3) or '').strip()
-                            eta   = (m.group(4) or '').strip()
-                            active_transfers[transfer_id].update({
-                                'progress': pct,
-                                'speed': speed,
-                                'eta': eta,
-                                'message': f'Transferring… {pct}%',
-                            })
-
-                scp_proc.wait()
-
-                if active_transfers[transfer_id].get('_cancelled'):
-                    return
-
-                if scp_proc.returncode == 0:
-                    active_transfers[transfer_id].update({
-                        'status': 'completed',
-                        'progress': 100,
-                        'message': 'Transfer completed successfully!',
-                        'speed': '',
-                        'eta': '',
-                    })
-                else:
-                    active_transfers[transfer_id].update({
-                        'status': 'error',
-                        'message': (
-                            f'SCP exited with code {scp_proc.returncode}. '
-                            'Check SSH key, username, and remote path.'
-                        ),
-                    })
+        scp_proc.wait()
 
-            except Exception as exc:
-                logging.error(f"File transfer error [{transfer_id}]: {exc}")
-                active_transfers[transfer_id].update({
-                    'status': 'error',
-                    'message': str(exc),
-                })
-            finally:
-                if tunnel_proc:
-                    try:
-                        tunnel_proc.terminate()
-                    except Exception:
-                        pass
-                if transfer_id in active_transfers:
-                    active_transfers[transfer_id]['_tunnel_process'] = None
-
-        threading.Thread(target=run_transfer, daemon=True).start()
-        return jsonify({'status': 'success', 'transfer_id': transfer_id})
+        if active_transfers[transfer_id].get('_cancelled'):
+            return
 
-    except Exception as e:
-        logging.error(f"Error starting transfer: {e}")
-        return jsonify({'error': str(e)}), 500
+        if scp_proc.returncode == 0:
+            if direction == 'upload':
+                moved = active_transfers[transfer_id].get('size')
+            else:
+                target = local_path
+                if os.path.isdir(local_path):
+                    target = os.path.join(local_path, os.path.basename(remote_path.rstrip('/')))
+                moved = _local_size(target)
+            elapsed = time.monotonic() - started
+            report = _throughput_report((moved or 0) / elapsed, compression['compression'],
+                                        compression['compression_ratio'])
+            summary = _throughput_summary(report)
+            _update_transfer(transfer_id, {
+                **report,
+                'status': 'completed',
+                'progress': 100,
+                'message': f'Transfer completed successfully! {summary}.' if summary else 'Transfer completed successfully!',
+                'speed': '',
+                'eta': '',
+            })
+        else:
+            _update_transfer(transfer_id, {
+                'status': 'error',
+                'message': (
+                    f'SCP exited with code {scp_proc.returncode}. '
+                    'Check SSH key, username, and remote path.'
+                ),
+            })
+
+    except Exception as exc:
+        logging.error(f"File transfer error [{transfer_id}]: {exc}")
+        _update_transfer(transfer_id, {
+            'status': 'error',
+            'message': str(exc),
+        })
+    finally:
+        if tunnel_proc:
+            transfer_tunnels.release(tunnel_proc)
+        if transfer_id in active_transfers:
+            active_transfers[transfer_id]['_tunnel_process'] = None
+            if tunnel_proc:
+                active_transfers[transfer_id]['_tunnel_log'] = _tunnel_log(tunnel_proc)
+
+
+# Runs queued transfers under the concurrency limits of the preferences
+transfer_queue = TransferQueue(
+    run_transfer,
+    max_concurrent=preferences_handler.get_transfer_settings()['max_concurrent'],
+    per_instance=preferences_handler.get_transfer_settings()['per_instance_concurrent']
+)
 
 
 @app.route('/api/transfer-progress/<transfer_id>')
@@ -1071,34 +1834,114 @@ def get_transfer_progress(transfer_id: str):
     t = active_transfers.get(transfer_id)
     if not t:
         return jsonify({'error': 'Transfer not found'}), 404
-    return jsonify({
+    return jsonify(_transfer_progress(t))
+
+
+def _transfer_progress(t):
+    """Client-visible fields of a transfer (keys starting with '_' stay server-side)"""
+    return {
         'progress': t['progress'],
         'status':   t['status'],
         'message':  t['message'],
         'filename': t.get('filename', ''),
         'speed':    t.get('speed', ''),
         'eta':      t.get('eta', ''),
-    })
-
+        'batch_id': t.get('batch_id'),
+        'size':     t.get('size'),
+        'streams':  t.get('streams'),
+        'throughput': t.get('throughput'),
+        'speedup':  t.get('speedup'),
+        'resumed_from': t.get('resumed_from'),
+        'compression': t.get('compression'),
+        'compression_ratio': t.get('compression_ratio'),
+        'wire_throughput': t.get('wire_throughput'),
+    }
+
+
+def _batch_progress(transfer_ids):
+    """Aggregate the progress of several transfers into one view"""
+    transfers = [active_transfers[tid] for tid in transfer_ids]
+    counts = {status: 0 for status in TRANSFER_STATUSES}
+    for t in transfers:
+        counts[t['status']] = counts.get(t['status'], 0) + 1
+
+    sizes = [t.get('size') for t in transfers]
+    if transfers and all(sizes):
+        progress = sum(t['progress'] * t['size'] for t in transfers) / sum(sizes)
+    else:
+        progress = sum(t['progress'] for t in transfers) / len(transfers) if transfers else 0
+
+    finished = counts['completed'] + counts['error'] + counts['cancelled']
+    if finished < len(transfers):
+        status = 'queued' if counts['queued'] == len(transfers) else 'running'
+    elif counts['completed'] == len(transfers):
+        status = 'completed'
+    elif counts['cancelled'] == len(transfers):
+        status = 'cancelled'
+    else:
+        status = 'error'
+
+    if len(transfers) == 1:
+        message, speed, eta = transfers[0]['message'], transfers[0].get('speed', ''), transfers[0].get('eta', '')
+    else:
+        running = [t for t in transfers if t['status'] == 'running']
+        message = f"{counts['completed']}/{len(transfers)} done"
+        if counts['error']:
+            message += f", {counts['error']} failed"
+        if running:
+            message += f" — {', '.join(t['filename'] for t in running)}"
+        speed, eta = '', ''
+
+    return {
+        'status': status,
+        'progress': int(progress),
+        'message': message,
+        'speed': speed,
+        'eta': eta,
+        'total': len(transfers),
+        'counts': counts,
+    }
+
+
+def _update_transfer(transfer_id, changes):
+    """Apply changes to a transfer and push its new progress and its batch's on the event stream"""
+    t = active_transfers[transfer_id]
+    t.update(changes)
+    event_bus.publish('transfer-progress', {'transfer_id': transfer_id, **_transfer_progress(t)})
+    batch_id = t.get('batch_id')
+    if batch_id in transfer_batches:
+        event_bus.publish('transfer-batch-progress', {
+            'batch_id': batch_id, **_batch_progress(transfer_batches[batch_id])
+        })
 
-@app.route('/api/transfer/<transfer_id>', methods=['DELETE'])
-def cancel_transfer(transfer_id: str):
-    """Cancel an in-progress file transfer.
 
-    Sets the _cancelled flag (checked by the background thread) and terminates
-    the SSM tunnel process immediately.
-    """
+def _cancel_transfer(transfer_id):
+    """Cancel a queued or running transfer; finished transfers are left alone"""
     t = active_transfers.get(transfer_id)
-    if t:
-        t['_cancelled'] = True
-        t['status']  = 'cancelled'
-        t['message'] = 'Transfer cancelled.'
-        proc = t.get('_tunnel_process')
+    if not t or t['status'] in ('completed', 'error', 'cancelled'):
+        return
+    t['_cancelled'] = True
+    t.pop('_retry', None)
+    transfer_queue.cancel(transfer_id)
+    _update_transfer(transfer_id, {'status': 'cancelled', 'message': 'Transfer cancelled.'})
+    for proc in [t.get('_scp_process')] + list(t.get('_processes', [])):
         if proc:
             try:
                 proc.terminate()
             except Exception:
                 pass
+
+
+@app.route('/api/transfer/<transfer_id>', methods=['DELETE'])
+def cancel_transfer(transfer_id: str):
+    """Cancel an in-progress file transfer.
+
+    Sets the _cancelled flag (checked by the background thread) and terminates
+    the SCP process immediately; a transfer still waiting in the queue is
+    dropped from it. The SSM tunnel stays in the transfer tunnel pool for
+    other transfers.
+    """
+    _cancel_transfer(transfer_id)
     return jsonify({'status': 'success'})
 
 
@@ -1106,58 +1949,69 @@ def cancel_transfer(transfer_id: str):
 # Utility functions
 # ---------------------------------------------------------------------------
 
-# Update this function in routes.py
-def find_free_port():
-    """Find a free port using the configured range"""
-    # Get preferences from frontend
-    start_port, end_port = preferences_handler.get_port_range()
-    logging.debug(f"Finding free port between {start_port} and {end_port}")
-    start = start_port
-    end = end_port
-    max_attempts = 20
-    """
-    Find a free port in the given range for AWS SSM port forwarding
-    Safe implementation for Windows systems
-    
-    Args:
-        start (int): Start of port range (default: 60000)
-        end (int): End of port range (default: 60100)
-        max_attempts (int): Maximum number of attempts to find a port
-    
+def open_forward(connection_id, connection_type, instance_id, profile, region,
+                 document, remote_port, remote_host=None):
+    """Start a port forward, or take a reference on an identical live one
+
+    Forwards are identical when instance, document, remote host and port,
+    profile and region all match; they then share one session process and
+    local port. The tunnel is terminated when the last reference is released
+    through /api/terminate-connection.
+
     Returns:
-        int: A free port number or None if no port is found
+        (connection, shared): the connection dict and whether it was reused,
+        or (None, False) if no local port is available.
     """
-    logging.debug(f"Searching for free port between {start} and {end}")
-    
-    used_ports = set()
-    for _ in range(max_attempts):
-        port = random.randint(start, end)
-        
-        if port in used_ports:
-            continue
-            
-        used_ports.add(port)
-        
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        try:
-            # Just try to connect to the port
-            # If connection fails, port is likely free
-            result = sock.connect_ex(('127.0.0.1', port))
-            sock.close()
-            
-            if result != 0:  # Port is available
-                logging.info(f"Found free port: {port}")
-                return port
-            else:
-                logging.debug(f"Port {port} is in use")
-                
-        except Exception as e:
-            logging.debug(f"Error checking port {port}: {str(e)}")
-        finally:
-            sock.close()
-    
-    logging.error(f"No free port found after {max_attempts} attempts")
-    return None
+    forward_key = (instance_id, document, remote_host, str(remote_port), profile, region)
+    with forward_lock:
+        connection = active_connections.retain_forward(forward_key)
+        if connection is not None:
+            logging.info(f"Reusing forward {connection['connection_id']} on port {connection['local_port']} "
+                         f"({connection['refcount']} references)")
+            return connection, True
+
+        local_port = port_allocator.allocate()
+        if local_port is None:
+            return None, False
+
+        parameters = {'portNumber': remote_port, 'localPortNumber': local_port}
+        if remote_host:
+            parameters = {'host': remote_host, **parameters}
+        aws_args = start_session_argv(instance_id, region, profile, document=document, parameters=parameters)
+        tunnel = launch_forward(aws_args, local_port)
+
+        connection = {
+            'connection_id': connection_id,
+            'instance_id': instance_id,
+            'type': connection_type,
+            'local_port': local_port,
+            'remote_port': remote_port,
+            'remote_host': remote_host,
+            'process': tunnel.popen,
+            'tunnel': tunnel,
+            'pid': tunnel.pid,
+            'forward_key': forward_key,
+            'refcount': 1
+        }
+        active_connections.add(connection)
+
+    # Monitor process through the shared supervisor
+    tunnel_supervisor.watch(connection_id, tunnel, on_connection_exit)
+    return connection, False
+
+
+def launch_forward(aws_args, local_port):
+    """Start a port-forward session on a reserved local port
+
+    The port is released again if the session process cannot be started;
+    otherwise it is released by on_connection_exit (or by the caller for
+    tunnels that are not registered as connections).
+    """
+    try:
+        return launcher.launch_hidden(aws_args, local_port)
+    except Exception:
+        port_allocator.release(local_port)
+        raise
 
 # Add route for serving the main page
 @app.route('/')
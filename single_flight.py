@@ -0,0 +1,72 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """An in-flight call that other callers can wait on"""
+
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.waiters = 0
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into a single execution
+
+    The first caller for a key runs the function; callers arriving while it
+    is still running wait for and share its result (or exception) instead of
+    starting their own.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        """Run fn() for key, or wait for the run already in progress"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.executed += 1
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+
+        if not leader:
+            logger.debug(f"Coalesced call for {key} onto the one in flight")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+            if call.waiters:
+                logger.info(f"Call for {key} was shared with {call.waiters} coalesced caller(s)")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'executed': self.executed,
+                'coalesced': self.coalesced,
+                'in_flight': len(self._calls),
+            }
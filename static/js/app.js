@@ -7,17 +7,25 @@ const app = {
     refreshCountdown: 30,
     currentProfile: '',
     currentRegion: '',
-    instances: [],
+    instances: [],          // Current page of instances, as returned by /api/instances
+    instanceTotal: 0,       // Number of instances matching the current filter/search
+    instanceCounts: { total: 0, linux: 0, windows: 0, ssm: 0 },  // Fleet-wide counters
+    instanceNames: {},      // Instance ID -> name for every instance seen, used by connection toasts
+    snapshotAge: null,  // Seconds since the server-side inventory snapshot was fetched
     connections: [],
+    readyConnectionIds: new Set(),  // Forwards reported ready before their start request returned
     instanceFilter: null,
     instanceSearch: '',
     currentPage: 1,
+    PAGE_SIZE: 20,
     expandedInstances: new Set(),
     // File transfer state
     currentTransferInstanceId: null,
     currentTransferInstanceName: null,
     transferDirection: 'upload',
-    activeTransferId: null,
+    activeBatchId: null,
+    resumableBatchId: null,  // last failed or cancelled batch, for the Resume button
+    transferLocalPaths: null,
     transferPollTimer: null,
     awsAccountId: null,  // Add AWS account ID state 
     // Cached DOM elements
@@ -202,7 +210,7 @@ const app = {
     setupEventListeners() {
         console.log('Setting up event listeners...');
         this.elements.connectBtn.onclick = () => this.toggleConnection();
-        this.elements.refreshBtn.onclick = () => this.refreshData();
+        this.elements.refreshBtn.onclick = () => this.refreshData(true);
         this.elements.autoRefreshSwitch.onchange = (e) => this.toggleAutoRefresh(e);
     },
 
@@ -319,7 +327,16 @@ const app = {
                     headers: { 'Content-Type': 'application/json' },
                     body: JSON.stringify({ last_profile: profile, last_region: region })
                 }).catch(err => console.error('Failed to save profile/region to preferences:', err));
-            
+
+                // The inventory is still being fetched server-side: unlock the UI and
+                // show an inline spinner while /api/instances waits for it
+                this.hideLoading();
+                this.elements.instancesList.innerHTML = `
+                    <div class="d-flex justify-content-center align-items-center py-5">
+                        <div class="spinner-border text-primary" role="status">
+                            <span class="visually-hidden">Loading...</span>
+                        </div>
+                    </div>`;
                 await this.loadInstances();
                 this.showSuccess('Connected successfully');
             } else {
@@ -357,6 +374,8 @@ const app = {
         this.currentRegion = '';
         this.awsAccountId = null; // Clear account ID
         this.instances = [];
+        this.instanceTotal = 0;
+        this.instanceCounts = { total: 0, linux: 0, windows: 0, ssm: 0 };
         this.connections = [];
         
         this.updateAwsAccountDisplay();
@@ -383,54 +402,71 @@ const app = {
 
     
     
-    // Load instances
-    async loadInstances() {
+    // Build the /api/instances query for the current filter, search and page
+    buildInstancesQuery(force = false) {
+        const params = new URLSearchParams();
+        const f = this.instanceFilter;
+        if (f === 'linux' || f === 'windows') params.set('os', f);
+        if (f === 'ssm')    params.set('has_ssm', 'true');
+        if (f === 'active') params.set('active', 'true');
+        if (this.instanceSearch) params.set('search', this.instanceSearch);
+        params.set('cursor', (this.currentPage - 1) * this.PAGE_SIZE);
+        params.set('limit', this.PAGE_SIZE);
+        if (force) params.set('force', 'true');
+        return `/api/instances?${params.toString()}`;
+    },
+
+    // Load the current page of instances; filtering, search and paging happen server-side
+    async loadInstances(force = false) {
         if (!this.isConnected) return;
         
         try {
-            const response = await fetch('/api/instances');
+            const response = await fetch(this.buildInstancesQuery(force));
             if (!response.ok) throw new Error('Failed to load instances');
             
-            this.instances = await response.json();
-            this.renderInstances();
-            this.updateCounters();
+            this.applyInstancesResult(await response.json());
         } catch (error) {
             this.showError('Failed to load instances: ' + error.message);
         }
     },
 
-    // Render instances list applying type filter, search filter and pagination
-    renderInstances() {
-        this.elements.instancesList.innerHTML = '';
+    // Store a page returned by /api/instances and re-render the list and counters
+    applyInstancesResult(result) {
+        this.instances = result.instances;
+        this.instanceTotal = result.total;
+        if (result.counts) this.instanceCounts = result.counts;
+        this.instances.forEach(i => { this.instanceNames[i.id] = i.name; });
+
+        // The page may have shrunk below the current one after a refresh
+        const totalPages = Math.max(1, Math.ceil(this.instanceTotal / this.PAGE_SIZE));
+        if (this.currentPage > totalPages) {
+            this.currentPage = totalPages;
+            this.loadInstances();
+            return;
+        }
 
-        // 1. Type filter
-        const f = this.instanceFilter;
-        let filtered = this.instances.filter(i => {
-            if (!f || f === 'all') return true;
-            const os = (i.os || '').toLowerCase();
-            if (f === 'linux')   return os.includes('linux') || os.includes('unix');
-            if (f === 'windows') return os.includes('windows');
-            if (f === 'ssm')     return i.has_ssm;
-            if (f === 'active')  return this.connections.some(c => c.instanceId === i.id);
-            return true;
-        });
+        this.updateSnapshotAge(result.snapshot_age);
+        this.renderInstances();
+        this.updateCounters();
+    },
 
-        // 2. Search filter (instance ID or name)
-        if (this.instanceSearch) {
-            filtered = filtered.filter(i =>
-                i.id.toLowerCase().includes(this.instanceSearch) ||
-                (i.name || '').toLowerCase().includes(this.instanceSearch)
-            );
-        }
+    // Show how fresh the server-side inventory snapshot is in the refresh button tooltip
+    updateSnapshotAge(age) {
+        this.snapshotAge = age;
+        const label = (age === null || age === undefined)
+            ? 'Refresh instances'
+            : `Refresh instances (data fetched ${Math.round(age)}s ago)`;
+        this.elements.refreshBtn.setAttribute('title', label);
+        this.elements.refreshBtn.setAttribute('data-bs-original-title', label);
+    },
 
-        // 3. Pagination
-        const PAGE_SIZE = 20;
-        const totalPages = Math.max(1, Math.ceil(filtered.length / PAGE_SIZE));
-        if (this.currentPage > totalPages) this.currentPage = totalPages;
-        const start = (this.currentPage - 1) * PAGE_SIZE;
-        const paged  = filtered.slice(start, start + PAGE_SIZE);
+    // Render the current page of instances (already filtered and paged by the server)
+    renderInstances() {
+        this.elements.instancesList.innerHTML = '';
 
-        paged.forEach(instance => {
+        const totalPages = Math.max(1, Math.ceil(this.instanceTotal / this.PAGE_SIZE));
+
+        this.instances.forEach(instance => {
             const card = this.createInstanceCard(instance);
             this.elements.instancesList.appendChild(card);
         });
@@ -443,14 +479,14 @@ const app = {
             if (chev) chev.className = 'bi bi-chevron-down instance-chevron';
         });
         this.renderConnections();
-        this.renderPagination(filtered.length, totalPages);
+        this.renderPagination(this.instanceTotal, totalPages);
     },
 
     // Render pagination controls; hidden when total <= 20
     renderPagination(total, totalPages) {
         const container = document.getElementById('instancesPagination');
         if (!container) return;
-        if (total <= 20) { container.innerHTML = ''; return; }
+        if (total <= this.PAGE_SIZE) { container.innerHTML = ''; return; }
 
         const cur = this.currentPage;
         // Show up to 5 page buttons centred around current page
@@ -459,8 +495,8 @@ const app = {
         if (pe - ps < 4) ps = Math.max(1, pe - 4);
         const pages = Array.from({ length: pe - ps + 1 }, (_, i) => ps + i);
 
-        const from = (cur - 1) * 20 + 1;
-        const to   = Math.min(cur * 20, total);
+        const from = (cur - 1) * this.PAGE_SIZE + 1;
+        const to   = Math.min(cur * this.PAGE_SIZE, total);
 
         container.innerHTML = `
             <nav class="d-flex justify-content-between align-items-center mt-2 pt-2 border-top px-1">
@@ -482,7 +518,7 @@ const app = {
 
     setPage(page) {
         this.currentPage = page;
-        this.renderInstances();
+        this.loadInstances();
     },
 
     onSearchInput(value) {
@@ -490,7 +526,11 @@ const app = {
         this.currentPage = 1;
         const clearBtn = document.getElementById('instanceSearchClear');
         if (clearBtn) clearBtn.style.display = this.instanceSearch ? '' : 'none';
-        this.renderInstances();
+        // Debounced so typing does not fire one request per keystroke
+        if (!this.debouncedLoadInstances) {
+            this.debouncedLoadInstances = this.debounce(() => this.loadInstances(), 200);
+        }
+        this.debouncedLoadInstances();
     },
 
     clearSearch() {
@@ -500,7 +540,7 @@ const app = {
         if (input) input.value = '';
         const clearBtn = document.getElementById('instanceSearchClear');
         if (clearBtn) clearBtn.style.display = 'none';
-        this.renderInstances();
+        this.loadInstances();
     },
 
     // Toggle instance filter; clicking the active filter resets it
@@ -512,7 +552,7 @@ const app = {
             const el = document.getElementById(id);
             if (el) el.classList.toggle('ssm-counter-active', this.instanceFilter === key);
         });
-        this.renderInstances();
+        this.loadInstances();
     },
 
     // Create compact instance card with expandable detail section
@@ -687,22 +727,16 @@ const app = {
 
     /**
      * Updates all counters in the UI: total, Linux, Windows, SSM-enabled instances
-     * and active connections. Reads from this.instances and this.connections arrays.
+     * and active connections. Reads from the fleet-wide this.instanceCounts sent by the
+     * server and from the this.connections array.
      */
     updateCounters() {
-        const total = this.instances.length;
-        const linux = this.instances.filter(i =>
-            i.os && (i.os.toLowerCase().includes('linux') || i.os.toLowerCase().includes('unix'))
-        ).length;
-        const windows = this.instances.filter(i =>
-            i.os && i.os.toLowerCase().includes('windows')
-        ).length;
-        const ssm = this.instances.filter(i => i.has_ssm).length;
-
-        document.getElementById('countTotal').textContent = total;
-        document.getElementById('countLinux').textContent = linux;
-        document.getElementById('countWindows').textContent = windows;
-        document.getElementById('countSsm').textContent = ssm;
+        const counts = this.instanceCounts;
+
+        document.getElementById('countTotal').textContent = counts.total;
+        document.getElementById('countLinux').textContent = counts.linux;
+        document.getElementById('countWindows').textContent = counts.windows;
+        document.getElementById('countSsm').textContent = counts.ssm;
 
         const activeEl = document.getElementById('countActive');
         if (activeEl) activeEl.textContent = this.connections.length;
@@ -761,16 +795,14 @@ const app = {
             const result = await response.json();
             
             if (result.status === 'success') {
-                this.addConnection({
+                this.addForward({
                     id: result.connection_id,  // Cambiato da this.generateConnectionId()
                     instanceId: instanceId,
                     type: 'RDP',
                     localPort: result.local_port,  // Rinominato da port a local_port
                     remotePort: "3389",  // Aggiunto il remote port esplicito per RDP
-                    timestamp: new Date(),
-                    status: 'active'
-                });
-                this.showSuccess(`RDP session started on port ${result.local_port}`);
+                    timestamp: new Date()
+                }, result.ready, `RDP session started on port ${result.local_port}`);
             } else {
                 throw new Error(result.error || 'Failed to start RDP session');
             }
@@ -974,16 +1006,14 @@ const app = {
             const result = await response.json();
             
             if (result.status === 'success') {
-                this.addConnection({
+                this.addForward({
                     id: result.connection_id,  // Usa l'ID generato dal backend
                     instanceId: instanceId,
                     type: 'Custom Port',
                     localPort: result.local_port,
                     remotePort: result.remote_port,
-                    timestamp: new Date(),
-                    status: 'active'
-                });
-                this.showSuccess(`Port forwarding started (Local: ${result.local_port}, Remote: ${result.remote_port})`);
+                    timestamp: new Date()
+                }, result.ready, `Port forwarding started (Local: ${result.local_port}, Remote: ${result.remote_port})`);
                 this.modals.customPort.hide();
             } else {
                 throw new Error(result.error || 'Failed to start port forwarding');
@@ -996,12 +1026,47 @@ const app = {
     },
 
     // Connection Management
+    // A shared forward comes back with the ID of a connection we may already
+    // show: count the extra reference instead of adding a second entry
     addConnection(connection) {
+        const existing = this.connections.find(c => c.id === connection.id);
+        if (existing) {
+            existing.refs = (existing.refs || 1) + 1;
+            return;
+        }
+        connection.refs = 1;
         this.connections.push(connection);
         this.renderConnections();
         this.updateCounters();
     },
 
+    // A port forward is listed as starting until the server reports its local
+    // port accepting connections (connection-ready); the success toast waits for it
+    addForward(connection, ready, successMessage) {
+        const readyEarly = this.readyConnectionIds.delete(connection.id);
+        connection.status = ready || readyEarly ? 'active' : 'starting';
+        connection.readyMessage = successMessage;
+        this.addConnection(connection);
+        if (connection.status === 'active') {
+            this.showSuccess(successMessage);
+        } else {
+            this.showToast(`Opening tunnel on local port ${connection.localPort}…`, 'info');
+        }
+    },
+
+    markConnectionReady(connectionId) {
+        const conn = this.connections.find(c => c.id === connectionId);
+        if (!conn) {
+            // The start request has not returned yet
+            this.readyConnectionIds.add(connectionId);
+            return;
+        }
+        if (conn.status !== 'starting') return;
+        conn.status = 'active';
+        this.renderConnections();
+        this.showSuccess(conn.readyMessage);
+    },
+
     async terminateConnection(connectionId) {
         try {
             this.showLoading();
@@ -1013,11 +1078,22 @@ const app = {
                 const errorData = await response.json();
                 throw new Error(errorData.error || 'Failed to terminate connection');
             }
+            const result = await response.json();
+
+            // A shared forward stays up while other references remain
+            const conn = this.connections.find(c => c.id === connectionId);
+            if (conn && result.refcount > 0 && conn.refs > 1) {
+                conn.refs--;
+                this.showSuccess(`Connection released (${result.refcount} references left)`);
+                return;
+            }
             
             this.connections = this.connections.filter(c => c.id !== connectionId);
             this.renderConnections();
             this.updateCounters();
-            this.showSuccess('Connection terminated successfully');
+            this.showSuccess(result.refcount > 0
+                ? 'Connection released; the tunnel is still used elsewhere'
+                : 'Connection terminated successfully');
         } catch (error) {
             this.showError('Failed to terminate connection: ' + error.message);
         } finally {
@@ -1117,49 +1193,13 @@ const app = {
     },
 
     getInstanceName(instanceId) {
-        const instance = this.instances.find(i => i.id === instanceId);
-        return instance ? instance.name : instanceId;
+        return this.instanceNames[instanceId] || instanceId;
     },
 
     generateConnectionId() {
         return 'conn_' + Math.random().toString(36).substring(2, 11);
     },
 
-    // Connection monitoring
-    startConnectionMonitoring() {
-        setInterval(() => this.checkConnections(), 5000);
-    },
-
-    async checkConnections() {
-        if (!this.isConnected || this.connections.length === 0) return;
-    
-        try {
-            const response = await fetch('/api/active-connections');
-            if (!response.ok) throw new Error('Failed to check connections');
-            
-            const activeConnections = await response.json();
-            const activeIds = new Set(activeConnections.map(c => c.connection_id));
-            
-            // Rimuovi le connessioni che non sono più attive
-            const previousCount = this.connections.length;
-            this.connections = this.connections.filter(conn => {
-                const isActive = activeIds.has(conn.id);
-                if (!isActive) {
-                    console.log(`Connection ${conn.id} is no longer active`);
-                    this.showToast(`Connection to ${this.getInstanceName(conn.instanceId)} was terminated`, 'warning');
-                }
-                return isActive;
-            });
-    
-            if (previousCount !== this.connections.length) {
-                this.renderConnections();
-                this.updateCounters();
-            }
-        } catch (error) {
-            console.error('Error checking connections:', error);
-        }
-    },
-
     // Stubs declared here so the IDE type system recognises these properties;
     // the real implementations are assigned below via app.xxx = function() after the literal.
     showPreferences: async function() {},
@@ -1172,7 +1212,8 @@ const app = {
 
 
 
-    app.refreshData = async function() {
+    // force=true (manual refresh button) bypasses the server-side inventory cache
+    app.refreshData = async function(force = false) {
         if (!this.isConnected) return;
 
         // Show inline spinner in the instances list only — do not cover the whole UI
@@ -1184,15 +1225,10 @@ const app = {
             </div>`;
 
         try {
-            const response = await fetch('/api/refresh', { method: 'POST' });
+            const response = await fetch(this.buildInstancesQuery(force));
             if (!response.ok) throw new Error('Refresh failed');
 
-            const result = await response.json();
-            if (result.status === 'success') {
-                this.instances = result.instances;
-                this.renderInstances();
-                this.updateCounters();
-            }
+            this.applyInstancesResult(await response.json());
         } catch (error) {
             this.showError('Failed to refresh data: ' + error.message);
             this.toggleAutoRefresh(false);
@@ -1253,7 +1289,7 @@ const app = {
     app.setupEventListeners = function() {
         console.log('Setting up event listeners...');
         this.elements.connectBtn.onclick = () => this.toggleConnection();
-        this.elements.refreshBtn.onclick = () => this.refreshData();
+        this.elements.refreshBtn.onclick = () => this.refreshData(true);
 
         // Auto refresh toggle
         this.elements.autoRefreshSwitch.onchange = (e) => {
@@ -1476,18 +1512,15 @@ const app = {
                     localPort: result.local_port,
                     remotePort: result.remote_port,
                     remoteHost: result.remote_host,
-                    timestamp: new Date(),
-                    status: 'active'
+                    timestamp: new Date()
                 };
-    
-                this.addConnection(connectionData);
                 
-                // Show appropriate success message
+                // Shown once the tunnel accepts connections
                 const successMessage = mode === 'local' 
                     ? `Port forwarding started (Local: ${result.local_port}, Remote: ${result.remote_port})`
                     : `Remote host port forwarding started (Local: ${result.local_port}, Remote: ${result.remote_host}:${result.remote_port})`;
                 
-                this.showSuccess(successMessage);
+                this.addForward(connectionData, result.ready, successMessage);
                 this.modals.customPort.hide();
             }
         } catch (error) {
@@ -1564,6 +1597,7 @@ const app = {
                                 <i class="bi bi-clock" style="font-size:0.7rem"></i>${ts}
                             </small>
                             ${portInfo}
+                            ${conn.status === 'starting' ? '<small class="text-warning">starting…</small>' : ''}
                         </div>
                         <button class="btn btn-sm btn-outline-danger py-0 px-1 ms-1 flex-shrink-0"
                                 onclick="app.terminateConnection('${conn.id}')">
@@ -1586,14 +1620,46 @@ const app = {
         return colors[type] || 'secondary';
     };
 
+    // Connection, transfer and inventory updates are pushed by the server over
+    // /api/events; the browser reconnects on its own if the stream drops
     app.startConnectionMonitoring = function() {
         console.log('Starting connection monitoring');
-        // Esegui il check ogni 2 secondi
-        if (this.monitoringInterval) {
-            clearInterval(this.monitoringInterval);
+        if (this.eventSource) {
+            this.eventSource.close();
         }
-        this.monitoringInterval = setInterval(() => this.checkConnections(), 2000);
-    },
+        this.eventSource = new EventSource('/api/events');
+
+        // Events may have been missed while the stream was down: resync once
+        this.eventSource.onopen = () => {
+            this.checkConnections();
+            if (this.activeBatchId) this.pollTransferProgress();
+        };
+
+        this.eventSource.addEventListener('connection-ready', (e) => {
+            const data = JSON.parse(e.data);
+            this.markConnectionReady(data.connection_id);
+        });
+
+        this.eventSource.addEventListener('connection-closed', (e) => {
+            const data = JSON.parse(e.data);
+            this.readyConnectionIds.delete(data.connection_id);
+            this.removeClosedConnections(new Set([data.connection_id]));
+        });
+
+        this.eventSource.addEventListener('transfer-batch-progress', (e) => {
+            const data = JSON.parse(e.data);
+            if (data.batch_id === this.activeBatchId) {
+                this.applyTransferProgress(data);
+            }
+        });
+
+        this.eventSource.addEventListener('inventory-changed', (e) => {
+            const data = JSON.parse(e.data);
+            if (this.isConnected && data.profile === this.currentProfile && data.region === this.currentRegion) {
+                this.loadInstances();
+            }
+        });
+    };
     
     app.checkConnections = async function() {
         if (!this.isConnected || this.connections.length === 0) return;
@@ -1604,27 +1670,35 @@ const app = {
             
             const activeConnections = await response.json();
             const activeIds = new Set(activeConnections.map(c => c.connection_id));
-            
-            // Rimuovi le connessioni che non sono più attive
-            const previousCount = this.connections.length;
-            this.connections = this.connections.filter(conn => {
-                const isActive = activeIds.has(conn.id);
-                if (!isActive) {
-                    console.log(`Connection ${conn.id} is no longer active`);
-                    this.showToast(`Connection to ${this.getInstanceName(conn.instanceId)} was terminated`, 'warning');
-                }
-                return isActive;
-            });
-    
-            // Se il numero di connessioni è cambiato, aggiorna l'UI
-            if (previousCount !== this.connections.length) {
-                this.renderConnections();
-                this.updateCounters();
-            }
+            const closedIds = new Set(this.connections.filter(c => !activeIds.has(c.id)).map(c => c.id));
+            this.removeClosedConnections(closedIds);
+            activeConnections
+                .filter(c => c.ready && this.connections.some(conn => conn.id === c.connection_id))
+                .forEach(c => this.markConnectionReady(c.connection_id));
         } catch (error) {
             console.error('Error checking connections:', error);
         }
-    },
+    };
+
+    // Drop connections the server reported as closed
+    app.removeClosedConnections = function(closedIds) {
+        // Rimuovi le connessioni che non sono più attive
+        const previousCount = this.connections.length;
+        this.connections = this.connections.filter(conn => {
+            if (closedIds.has(conn.id)) {
+                console.log(`Connection ${conn.id} is no longer active`);
+                this.showToast(`Connection to ${this.getInstanceName(conn.instanceId)} was terminated`, 'warning');
+                return false;
+            }
+            return true;
+        });
+
+        // Se il numero di connessioni è cambiato, aggiorna l'UI
+        if (previousCount !== this.connections.length) {
+            this.renderConnections();
+            this.updateCounters();
+        }
+    };
 
     /**
      * Shows the About modal and fetches the current app version from the backend.
@@ -1753,7 +1827,10 @@ app.browseFile = async function(inputId, type) {
         });
         const data = await res.json();
         if (data.path) {
-            document.getElementById(inputId).value = data.path;
+            // Several files may be picked for upload; the input shows them joined by '; '
+            const paths = data.paths && data.paths.length ? data.paths : [data.path];
+            document.getElementById(inputId).value = paths.join('; ');
+            if (inputId === 'ftLocalFile') this.transferLocalPaths = paths;
         }
     } catch (e) {
         console.error('File dialog error:', e);
@@ -1772,19 +1849,25 @@ app.startTransfer = async function() {
     const remoteUser = (document.getElementById('ftRemoteUser').value || '').trim();
     const keyPath    = (document.getElementById('ftKeyPath').value || '').trim();
 
-    let localPath, remotePath;
+    const priority   = parseInt(document.getElementById('ftPriority').value, 10) || 0;
+    const compression = document.getElementById('ftCompression').value;
+    const splitPaths = value => (value || '').split(';').map(p => p.trim()).filter(p => p);
+
+    // Several sources are queued as one batch; the destination is shared
+    let localPaths, remotePaths;
     if (direction === 'upload') {
-        localPath  = (document.getElementById('ftLocalFile').value || '').trim();
-        remotePath = (document.getElementById('ftRemoteDestPath').value || '').trim();
+        localPaths  = this.transferLocalPaths || splitPaths(document.getElementById('ftLocalFile').value);
+        remotePaths = splitPaths(document.getElementById('ftRemoteDestPath').value).slice(0, 1);
     } else {
-        remotePath = (document.getElementById('ftRemoteFilePath').value || '').trim();
-        localPath  = (document.getElementById('ftLocalDestFolder').value || '').trim();
+        remotePaths = splitPaths(document.getElementById('ftRemoteFilePath').value);
+        localPaths  = splitPaths(document.getElementById('ftLocalDestFolder').value).slice(0, 1);
     }
 
-    if (!remoteUser || !localPath || !remotePath) {
+    if (!remoteUser || !localPaths.length || !remotePaths.length) {
         this.showError('Please fill in all required fields.');
         return;
     }
+    const sources = direction === 'upload' ? localPaths : remotePaths;
 
     // Reveal progress section and lock the form for the duration of the transfer
     const pbEl = document.getElementById('ftProgressBar');
@@ -1798,10 +1881,9 @@ app.startTransfer = async function() {
     document.getElementById('ftProgressMsg').textContent = 'Starting…';
     document.getElementById('ftProgressSpeed').textContent = '';
     document.getElementById('ftProgressEta').textContent = '';
-    document.getElementById('ftProgressFile').textContent =
-        direction === 'upload'
-            ? localPath.split(/[\\/]/).pop()
-            : remotePath.split('/').pop();
+    document.getElementById('ftProgressFile').textContent = sources.length === 1
+        ? sources[0].split(/[\\/]/).filter(p => p).pop()
+        : `${sources.length} items`;
 
     try {
         const res  = await fetch(`/api/transfer/${instanceId}`, {
@@ -1811,8 +1893,10 @@ app.startTransfer = async function() {
                 direction,
                 remote_user: remoteUser,
                 key_path:    keyPath,
-                local_path:  localPath,
-                remote_path: remotePath,
+                local_paths:  localPaths,
+                remote_paths: remotePaths,
+                priority,
+                compression,
                 profile:     this.currentProfile,
                 region:      this.currentRegion,
             }),
@@ -1820,7 +1904,7 @@ app.startTransfer = async function() {
         const data = await res.json();
         if (!res.ok || data.error) throw new Error(data.error || 'Failed to start transfer');
 
-        this.activeTransferId = data.transfer_id;
+        this.activeBatchId = data.batch_id;
         this.pollTransferProgress();
     } catch (e) {
         this.showError('Transfer error: ' + e.message);
@@ -1829,56 +1913,22 @@ app.startTransfer = async function() {
 };
 
 /**
- * Polls /api/transfer-progress every 500 ms and updates the progress bar.
- * Stops automatically when status is 'completed', 'error', or 'cancelled'.
+ * Fetches the aggregated state of the active transfer batch. Further updates
+ * arrive as 'transfer-batch-progress' events; while the event stream is down
+ * it falls back to polling /api/transfers every 500 ms.
  */
 app.pollTransferProgress = function() {
     if (this.transferPollTimer) clearTimeout(this.transferPollTimer);
 
     const poll = async () => {
-        if (!this.activeTransferId) return;
+        if (!this.activeBatchId) return;
         try {
-            const res  = await fetch(`/api/transfer-progress/${this.activeTransferId}`);
+            const res  = await fetch(`/api/transfers?batch_id=${encodeURIComponent(this.activeBatchId)}`);
             const data = await res.json();
+            if (this.applyTransferProgress(data)) return;
 
-            const pbEl = document.getElementById('ftProgressBar');
-            const pct  = data.progress || 0;
-            pbEl.style.width = `${pct}%`;
-            pbEl.textContent = `${pct}%`;
-            document.getElementById('ftProgressMsg').textContent   = data.message || '';
-            document.getElementById('ftProgressSpeed').textContent = data.speed   || '';
-            document.getElementById('ftProgressEta').textContent   = data.eta ? `ETA ${data.eta}` : '';
-
-            if (data.status === 'completed') {
-                pbEl.className = 'progress-bar bg-success';
-                pbEl.style.width = '100%';
-                pbEl.textContent = '100%';
-                document.getElementById('ftCancelBtn').style.display = 'none';
-                const transferBtn = document.getElementById('ftTransferBtn');
-                transferBtn.style.display = 'inline-block';
-                transferBtn.innerHTML = '<i class="bi bi-check-circle me-1"></i>Done';
-                transferBtn.disabled = true;
-                this.showSuccess('File transfer completed successfully!');
-                this.activeTransferId = null;
-                return;
-            }
-
-            if (data.status === 'error') {
-                pbEl.className = 'progress-bar bg-danger';
-                document.getElementById('ftProgressMsg').textContent = data.message || 'Transfer failed.';
-                this.showError('Transfer failed: ' + data.message);
-                this._resetTransferProgressUI();
-                this.activeTransferId = null;
-                return;
-            }
-
-            if (data.status === 'cancelled') {
-                this.activeTransferId = null;
-                return;
-            }
-
-            // Still in progress — schedule next poll
-            this.transferPollTimer = setTimeout(poll, 500);
+            const streaming = this.eventSource && this.eventSource.readyState === EventSource.OPEN;
+            if (!streaming) this.transferPollTimer = setTimeout(poll, 500);
         } catch (e) {
             console.error('Progress poll error:', e);
             this.transferPollTimer = setTimeout(poll, 1000);
@@ -1889,16 +1939,104 @@ app.pollTransferProgress = function() {
 };
 
 /**
- * Cancels the active transfer (if any) by calling DELETE /api/transfer/<id>.
+ * Updates the progress bar from an aggregated batch progress payload.
+ * Returns true once the batch is 'completed', 'error' or 'cancelled'.
+ */
+app.applyTransferProgress = function(data) {
+    if (!this.activeBatchId) return true;
+
+    const pbEl = document.getElementById('ftProgressBar');
+    const pct  = data.progress || 0;
+    pbEl.style.width = `${pct}%`;
+    pbEl.textContent = `${pct}%`;
+    document.getElementById('ftProgressMsg').textContent   = data.message || '';
+    document.getElementById('ftProgressSpeed').textContent = data.speed   || '';
+    document.getElementById('ftProgressEta').textContent   = data.eta ? `ETA ${data.eta}` : '';
+
+    if (data.status === 'completed') {
+        pbEl.className = 'progress-bar bg-success';
+        pbEl.style.width = '100%';
+        pbEl.textContent = '100%';
+        document.getElementById('ftCancelBtn').style.display = 'none';
+        const transferBtn = document.getElementById('ftTransferBtn');
+        transferBtn.style.display = 'inline-block';
+        transferBtn.innerHTML = '<i class="bi bi-check-circle me-1"></i>Done';
+        transferBtn.disabled = true;
+        this.showSuccess('File transfer completed successfully!');
+        this.activeBatchId = null;
+        return true;
+    }
+
+    if (data.status === 'error') {
+        pbEl.className = 'progress-bar bg-danger';
+        document.getElementById('ftProgressMsg').textContent = data.message || 'Transfer failed.';
+        this.showError('Transfer failed: ' + data.message);
+        this._resetTransferProgressUI();
+        this._offerResume(this.activeBatchId);
+        this.activeBatchId = null;
+        return true;
+    }
+
+    if (data.status === 'cancelled') {
+        this.activeBatchId = null;
+        return true;
+    }
+
+    return false;
+};
+
+/**
+ * Cancels the active transfer batch (if any) by calling DELETE /api/transfers/<batch_id>.
  */
 app.cancelTransfer = async function() {
-    if (!this.activeTransferId) return;
+    if (!this.activeBatchId) return;
     if (this.transferPollTimer) clearTimeout(this.transferPollTimer);
     try {
-        await fetch(`/api/transfer/${this.activeTransferId}`, { method: 'DELETE' });
+        await fetch(`/api/transfers/${encodeURIComponent(this.activeBatchId)}`, { method: 'DELETE' });
     } catch (e) { /* best-effort */ }
-    this.activeTransferId = null;
+    const batchId = this.activeBatchId;
+    this.activeBatchId = null;
     this._resetTransferProgressUI();
+    this._offerResume(batchId);
+};
+
+/**
+ * Queues the failed and cancelled items of the last batch again through
+ * POST /api/transfers/<batch_id>/retry; single files continue from the
+ * last verified offset instead of starting over.
+ */
+app.resumeTransfer = async function() {
+    const batchId = this.resumableBatchId;
+    if (!batchId) return;
+    try {
+        const res  = await fetch(`/api/transfers/${encodeURIComponent(batchId)}/retry`, { method: 'POST' });
+        const data = await res.json();
+        if (!res.ok || data.error) throw new Error(data.error || 'Failed to resume transfer');
+
+        const pbEl = document.getElementById('ftProgressBar');
+        pbEl.className = 'progress-bar progress-bar-striped progress-bar-animated bg-primary';
+        document.getElementById('ftProgress').style.display = 'block';
+        document.getElementById('ftTransferBtn').style.display = 'none';
+        document.getElementById('ftResumeBtn').style.display = 'none';
+        document.getElementById('ftCancelBtn').style.display = 'inline-block';
+        document.getElementById('ftProgressMsg').textContent = 'Resuming…';
+
+        this.resumableBatchId = null;
+        this.activeBatchId = batchId;
+        this.pollTransferProgress();
+    } catch (e) {
+        this.showError('Transfer error: ' + e.message);
+    }
+};
+
+/**
+ * Shows the Resume button for a batch that stopped before completing.
+ * @private
+ */
+app._offerResume = function(batchId) {
+    if (!batchId) return;
+    this.resumableBatchId = batchId;
+    document.getElementById('ftResumeBtn').style.display = 'inline-block';
 };
 
 /**
@@ -1922,7 +2060,11 @@ app.resetTransferModal = function() {
             if (el) el.value = '';
         });
     document.getElementById('ftRemoteUser').value = 'ec2-user';
+    document.getElementById('ftPriority').value = '0';
+    document.getElementById('ftCompression').value = 'auto';
     document.getElementById('ftScpWarning').style.display = 'none';
+    this.transferLocalPaths = null;
+    this.resumableBatchId = null;
 
     this._resetTransferProgressUI();
 };
@@ -1938,6 +2080,7 @@ app._resetTransferProgressUI = function() {
     btn.innerHTML = '<i class="bi bi-send me-1"></i>Transfer';
     btn.disabled = false;
     document.getElementById('ftCancelBtn').style.display = 'none';
+    document.getElementById('ftResumeBtn').style.display = 'none';
 };
 
 // Initialize app when document is ready
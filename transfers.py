@@ -0,0 +1,864 @@
+import hashlib
+import heapq
+import itertools
+import logging
+import os
+import shlex
+import subprocess
+import tarfile
+import threading
+import time
+import zlib
+from launchers import start_session_argv
+
+logger = logging.getLogger(__name__)
+
+# Seconds an unused transfer tunnel is kept open
+DEFAULT_TUNNEL_IDLE_TIMEOUT = 300
+
+# Seconds between two sweeps of the idle tunnel reaper
+REAP_INTERVAL = 5
+
+# Transfers run at once, in total and per instance
+DEFAULT_MAX_CONCURRENT = 4
+DEFAULT_PER_INSTANCE_CONCURRENT = 2
+
+# Compressibility sampling: SAMPLE_COUNT blocks of SAMPLE_SIZE bytes per file,
+# at most SAMPLE_BUDGET bytes per transfer, compressed at gzip's default level
+SAMPLE_SIZE = 64 * 1024
+SAMPLE_COUNT = 4
+SAMPLE_BUDGET = 1024 * 1024
+SAMPLE_LEVEL = 6
+# Data smaller than this is not worth a sample: it goes raw unless compression is 'on'
+COMPRESSION_MIN_SIZE = SAMPLE_BUDGET
+
+
+class TransferTunnelPool:
+    """Warm SSM port forwards to port 22, shared by all transfers to an instance
+
+    The first transfer to an instance opens the tunnel and waits for it to be
+    ready; later transfers, including concurrent ones, reuse it and start
+    immediately. Every acquire() must be paired with a release(); a tunnel
+    nobody has used for idle_timeout seconds is terminated by a background
+    reaper and its local port handed back to the allocator.
+
+    Each SSM session has its own throughput ceiling, so chunked transfers ask
+    for several slots of the same instance: every slot is a separate session.
+    """
+
+    def __init__(self, launcher, port_allocator, idle_timeout=DEFAULT_TUNNEL_IDLE_TIMEOUT):
+        self.launcher = launcher
+        self.port_allocator = port_allocator
+        self.idle_timeout = idle_timeout
+        # (instance_id, profile, region) -> {'tunnel', 'users', 'last_used'}
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._reaper = None
+        self.hits = 0
+        self.misses = 0
+
+    def acquire(self, instance_id, profile, region, timeout, should_stop=None, slot=0):
+        """Return a ready tunnel to port 22 of the instance
+
+        Returns None if the tunnel did not become ready within timeout seconds
+        (the tunnel is then closed) or should_stop() returned True first.
+        Raises RuntimeError when no local port is free.
+        """
+        key = (instance_id, profile, region, slot)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not entry['tunnel'].is_running():
+                self._discard(key)
+                entry = None
+
+            if entry is None:
+                local_port = self.port_allocator.allocate()
+                if local_port is None:
+                    raise RuntimeError('No free port available for SSH tunnel.')
+                aws_args = start_session_argv(
+                    instance_id, region, profile,
+                    document='AWS-StartPortForwardingSession',
+                    parameters={'portNumber': 22, 'localPortNumber': local_port}
+                )
+                try:
+                    tunnel = self.launcher.launch_hidden(aws_args, local_port)
+                except Exception:
+                    self.port_allocator.release(local_port)
+                    raise
+                entry = {'tunnel': tunnel, 'users': 0, 'last_used': time.monotonic()}
+                self._entries[key] = entry
+                self.misses += 1
+                logger.info(f"Opened transfer tunnel to {instance_id} on port {local_port}")
+            else:
+                self.hits += 1
+                logger.debug(f"Reusing transfer tunnel to {instance_id} on port {entry['tunnel'].local_port}")
+
+            entry['users'] += 1
+            self._start_reaper()
+
+        tunnel = entry['tunnel']
+        if tunnel.wait_ready(timeout, should_stop=should_stop):
+            return tunnel
+
+        if should_stop is not None and should_stop():
+            self.release(tunnel)
+            return None
+        # A session that never came up is not worth waiting on again: close it
+        # so the next transfer opens a fresh one
+        with self._lock:
+            if self._entries.get(key, {}).get('tunnel') is tunnel:
+                self._discard(key)
+        return None
+
+    def release(self, tunnel):
+        """Give back a tunnel obtained from acquire(); it stays warm until idle_timeout"""
+        with self._lock:
+            for key, entry in self._entries.items():
+                if entry['tunnel'] is tunnel:
+                    entry['users'] = max(0, entry['users'] - 1)
+                    entry['last_used'] = time.monotonic()
+                    if not tunnel.is_running():
+                        self._discard(key)
+                    return
+
+    def close_all(self):
+        """Terminate every pooled tunnel"""
+        with self._lock:
+            for key in list(self._entries):
+                self._discard(key)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'tunnels': len(self._entries),
+                'in_use': sum(1 for entry in self._entries.values() if entry['users']),
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+    def _discard(self, key):
+        """Terminate and forget a pooled tunnel; lock must be held"""
+        tunnel = self._entries.pop(key)['tunnel']
+        try:
+            tunnel.terminate()
+        except Exception as e:
+            logger.error(f"Error terminating transfer tunnel {tunnel.pid}: {str(e)}")
+        self.port_allocator.release(tunnel.local_port)
+        logger.info(f"Closed transfer tunnel to {key[0]} on port {tunnel.local_port}")
+
+    def _start_reaper(self):
+        """Start the idle tunnel reaper if it is not running yet; lock must be held"""
+        if self._reaper is None:
+            self._reaper = threading.Thread(target=self._reap, name='transfer-tunnel-reaper', daemon=True)
+            self._reaper.start()
+
+    def _reap(self):
+        while True:
+            time.sleep(REAP_INTERVAL)
+            now = time.monotonic()
+            with self._lock:
+                for key, entry in list(self._entries.items()):
+                    idle = not entry['users'] and now - entry['last_used'] >= self.idle_timeout
+                    if idle or not entry['tunnel'].is_running():
+                        self._discard(key)
+
+
+class TransferQueue:
+    """Priority queue of transfers run under global and per-instance concurrency limits
+
+    submit() only queues a transfer; whenever a slot is free the queue starts
+    the highest-priority transfer (oldest first on ties) whose instance is
+    below its own limit, calling runner(transfer_id) on a worker thread.
+    Transfers blocked by the per-instance limit do not hold up those to other
+    instances.
+    """
+
+    def __init__(self, runner, max_concurrent=DEFAULT_MAX_CONCURRENT,
+                 per_instance=DEFAULT_PER_INSTANCE_CONCURRENT):
+        self.runner = runner
+        self.max_concurrent = max_concurrent
+        self.per_instance = per_instance
+        # Heap of (-priority, sequence, transfer_id, instance_id)
+        self._heap = []
+        self._sequence = itertools.count()
+        self._queued = set()
+        self._running = {}
+        self._lock = threading.Lock()
+
+    def configure(self, max_concurrent=None, per_instance=None):
+        """Update the limits; raising them starts waiting transfers right away"""
+        with self._lock:
+            if max_concurrent is not None:
+                self.max_concurrent = max_concurrent
+            if per_instance is not None:
+                self.per_instance = per_instance
+            self._dispatch()
+
+    def submit(self, transfer_id, instance_id, priority=0):
+        """Queue a transfer; higher priorities start first
+
+        A transfer submitted again while its previous run is still winding
+        down (e.g. a retry right after a cancel) starts once that run returns.
+        """
+        with self._lock:
+            heapq.heappush(self._heap, (-priority, next(self._sequence), transfer_id, instance_id))
+            self._queued.add(transfer_id)
+            self._dispatch()
+
+    def cancel(self, transfer_id):
+        """Drop a transfer that has not started yet; returns False if it is not queued"""
+        with self._lock:
+            if transfer_id not in self._queued:
+                return False
+            self._queued.discard(transfer_id)
+            # The heap entry is skipped when it comes up
+            return True
+
+    def stats(self):
+        with self._lock:
+            running = {}
+            for instance_id in self._running.values():
+                running[instance_id] = running.get(instance_id, 0) + 1
+            return {
+                'queued': len(self._queued),
+                'running': len(self._running),
+                'running_per_instance': running,
+                'max_concurrent': self.max_concurrent,
+                'per_instance': self.per_instance,
+            }
+
+    def _dispatch(self):
+        """Start as many queued transfers as the limits allow; lock must be held"""
+        running_per_instance = {}
+        for instance_id in self._running.values():
+            running_per_instance[instance_id] = running_per_instance.get(instance_id, 0) + 1
+
+        blocked = []
+        while self._heap and len(self._running) < self.max_concurrent:
+            item = heapq.heappop(self._heap)
+            _, _, transfer_id, instance_id = item
+            if transfer_id not in self._queued:
+                continue
+            if transfer_id in self._running or running_per_instance.get(instance_id, 0) >= self.per_instance:
+                blocked.append(item)
+                continue
+            self._queued.discard(transfer_id)
+            self._running[transfer_id] = instance_id
+            running_per_instance[instance_id] = running_per_instance.get(instance_id, 0) + 1
+            threading.Thread(target=self._run, args=(transfer_id,), name=f'transfer-{transfer_id}',
+                             daemon=True).start()
+
+        for item in blocked:
+            heapq.heappush(self._heap, item)
+
+    def _run(self, transfer_id):
+        try:
+            self.runner(transfer_id)
+        except Exception as e:
+            logger.error(f"Transfer {transfer_id} failed: {str(e)}")
+        finally:
+            with self._lock:
+                self._running.pop(transfer_id, None)
+                self._dispatch()
+
+
+def remote_quote(path):
+    """Quote a remote path for the instance's shell, expanding a leading ~ the way scp does"""
+    if path == '~':
+        return '"$HOME"'
+    if path.startswith('~/'):
+        return '"$HOME"/' + (shlex.quote(path[2:]) if path[2:] else '')
+    return shlex.quote(path)
+
+
+def ssh_argv(local_port, remote_user, key_path, command, compress=False):
+    """Build the argv of an ssh call running command on the instance behind a tunnel
+
+    compress turns on ssh's own zlib compression of the channel (-C).
+    """
+    argv = [
+        'ssh',
+        '-p', str(local_port),
+        '-o', 'StrictHostKeyChecking=no',
+        '-o', 'UserKnownHostsFile=/dev/null',
+        '-o', 'BatchMode=yes',
+        '-o', 'LogLevel=ERROR',
+    ]
+    if key_path:
+        argv += ['-i', key_path]
+    if compress:
+        argv.append('-C')
+    return argv + [f'{remote_user}@127.0.0.1', command]
+
+
+class ChunkedTransfer:
+    """Moves one large file as byte ranges over several SSH streams in parallel
+
+    The file is cut into chunk_size ranges, aligned to CHUNK_ALIGN so the
+    remote side only needs a plain 'dd' with block offsets. Every stream is
+    bound to its own tunnel port (ideally its own SSM session) and takes the
+    next pending range until none are left, so a slow stream never holds up
+    the rest. Each range is retried once. The result is verified end to end
+    by comparing the SHA-256 of the local and remote copies.
+
+    A transfer can resume from start_offset: the bytes before it are taken
+    as already in place (the caller checks them) and only the rest is sent.
+    on_checkpoint(offset) reports the offset below which every range has
+    landed, so an interrupted transfer knows where to pick up again.
+
+    run() returns the transfer statistics, including the throughput of the
+    whole transfer and the speedup over the average single stream.
+    """
+
+    CHUNK_ALIGN = 1024 * 1024
+    READ_SIZE = 256 * 1024
+    ATTEMPTS = 2
+
+    def __init__(self, direction, local_path, remote_path, size, ports, remote_user, key_path,
+                 chunk_size, on_progress=None, should_stop=None, popen_kwargs=None,
+                 on_process=None, start_offset=0, on_checkpoint=None, compress=False):
+        """
+        Args:
+            direction: 'upload' or 'download'.
+            local_path: local file (read for uploads, written for downloads).
+            remote_path: remote file (written for uploads, read for downloads).
+            size: file size in bytes.
+            ports: local ports of the tunnels, one stream per port.
+            chunk_size: bytes per range, rounded up to CHUNK_ALIGN.
+            on_progress: called with (bytes_done, size) as data moves.
+            should_stop: returns True to abort the transfer.
+            popen_kwargs: extra Popen arguments (e.g. a hidden window on Windows).
+            on_process: called with every ssh Popen, so the caller can kill it on cancel.
+            start_offset: bytes already at the destination; rounded down to CHUNK_ALIGN
+                unless it covers the whole file.
+            on_checkpoint: called with the new contiguous offset each time it advances.
+            compress: turn on ssh compression for the range streams.
+        """
+        self.direction = direction
+        self.local_path = local_path
+        self.remote_path = remote_path
+        self.size = size
+        self.ports = list(ports)
+        self.remote_user = remote_user
+        self.key_path = key_path
+        self.chunk_size = max(self.CHUNK_ALIGN, -(-chunk_size // self.CHUNK_ALIGN) * self.CHUNK_ALIGN)
+        self.on_progress = on_progress
+        self.should_stop = should_stop or (lambda: False)
+        self.popen_kwargs = popen_kwargs or {}
+        self.on_process = on_process
+        self.on_checkpoint = on_checkpoint
+        self.compress = compress
+        self.start_offset = start_offset if start_offset >= size else start_offset - start_offset % self.CHUNK_ALIGN
+
+        self._lock = threading.Lock()
+        self._pending = [(offset, min(self.chunk_size, size - offset))
+                         for offset in range(self.start_offset, size, self.chunk_size)]
+        self._done = self.start_offset
+        # Offsets of the ranges that have landed beyond the contiguous checkpoint
+        self._landed = {}
+        self._checkpoint = self.start_offset
+        self._error = None
+        # Per stream: [bytes moved, seconds busy]
+        self._stream_stats = [[0, 0.0] for _ in self.ports]
+
+    def run(self):
+        """Transfer and verify the file; raises RuntimeError on failure"""
+        started = time.monotonic()
+        self._prepare()
+
+        workers = [threading.Thread(target=self._worker, args=(i, port), daemon=True)
+                   for i, port in enumerate(self.ports)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        if self._error:
+            raise RuntimeError(self._error)
+        if self.should_stop():
+            raise RuntimeError('Transfer cancelled.')
+        elapsed = time.monotonic() - started
+
+        local_digest = local_sha256(self.local_path)
+        remote_digest = remote_sha256(self.ports[0], self.remote_user, self.key_path, self.remote_path,
+                                      popen_kwargs=self.popen_kwargs)
+        if local_digest != remote_digest:
+            raise RuntimeError(f'Checksum mismatch after transfer (local {local_digest}, remote {remote_digest})')
+
+        stream_rates = [moved / busy for moved, busy in self._stream_stats if moved and busy]
+        single_stream = sum(stream_rates) / len(stream_rates) if stream_rates else 0
+        moved = self.size - self.start_offset
+        throughput = moved / elapsed if elapsed else 0
+        stats = {
+            'bytes': moved,
+            'resumed_from': self.start_offset,
+            'elapsed': round(elapsed, 2),
+            'streams': len(self.ports),
+            'chunks': -(-moved // self.chunk_size),
+            'throughput': throughput,
+            'single_stream_throughput': single_stream,
+            'speedup': round(throughput / single_stream, 2) if single_stream else None,
+            'sha256': local_digest,
+        }
+        if moved:
+            logger.info(f"Chunked {self.direction} of {moved} bytes over {len(self.ports)} streams: "
+                        f"{throughput / 1e6:.1f} MB/s ({stats['speedup']}x a single stream)")
+        return stats
+
+    def _prepare(self):
+        """Create the destination file so every stream can write its ranges in place"""
+        if self.direction == 'download':
+            mode = 'r+b' if self.start_offset and os.path.exists(self.local_path) else 'wb'
+            with open(self.local_path, mode) as f:
+                f.truncate(self.size)
+        elif not self.start_offset:
+            self._remote(f": > {remote_quote(self.remote_path)}")
+
+    def _worker(self, index, port):
+        while True:
+            with self._lock:
+                if not self._pending or self._error:
+                    return
+                offset, length = self._pending.pop(0)
+            if self.should_stop():
+                return
+
+            for attempt in range(1, self.ATTEMPTS + 1):
+                started = time.monotonic()
+                try:
+                    if self.direction == 'download':
+                        self._download_range(index, port, offset, length)
+                    else:
+                        self._upload_range(index, port, offset, length)
+                    self._land(offset, length)
+                    break
+                except Exception as e:
+                    if self.should_stop():
+                        return
+                    if attempt == self.ATTEMPTS:
+                        with self._lock:
+                            self._error = f'Range {offset}+{length} failed: {str(e)}'
+                        return
+                    logger.warning(f"Retrying range {offset}+{length} of {self.remote_path}: {str(e)}")
+                finally:
+                    self._stream_stats[index][1] += time.monotonic() - started
+
+    def _download_range(self, index, port, offset, length):
+        blocks = -(-length // self.CHUNK_ALIGN)
+        command = (f"dd if={remote_quote(self.remote_path)} bs={self.CHUNK_ALIGN} "
+                   f"skip={offset // self.CHUNK_ALIGN} count={blocks} 2>/dev/null")
+        proc = self._popen(port, command, stdout=subprocess.PIPE)
+        received = 0
+        try:
+            with open(self.local_path, 'r+b') as f:
+                f.seek(offset)
+                while received < length:
+                    data = proc.stdout.read(min(self.READ_SIZE, length - received))
+                    if not data:
+                        break
+                    f.write(data)
+                    received += len(data)
+                    self._add_progress(index, len(data))
+        finally:
+            proc.stdout.close()
+            proc.wait()
+        if received != length:
+            self._add_progress(index, -received)
+            raise RuntimeError(f'received {received} of {length} bytes (ssh exit code {proc.returncode})')
+
+    def _upload_range(self, index, port, offset, length):
+        command = (f"dd of={remote_quote(self.remote_path)} bs={self.CHUNK_ALIGN} "
+                   f"seek={offset // self.CHUNK_ALIGN} conv=notrunc 2>/dev/null")
+        proc = self._popen(port, command, stdin=subprocess.PIPE)
+        sent = 0
+        try:
+            with open(self.local_path, 'rb') as f:
+                f.seek(offset)
+                while sent < length:
+                    data = f.read(min(self.READ_SIZE, length - sent))
+                    if not data:
+                        break
+                    proc.stdin.write(data)
+                    sent += len(data)
+                    self._add_progress(index, len(data))
+        except OSError:
+            pass  # broken pipe: reported through the exit code below
+        finally:
+            try:
+                proc.stdin.close()
+            except OSError:
+                pass
+            proc.wait()
+        if proc.returncode != 0 or sent != length:
+            self._add_progress(index, -sent)
+            raise RuntimeError(f'sent {sent} of {length} bytes (ssh exit code {proc.returncode})')
+
+    def _land(self, offset, length):
+        """Record a finished range and advance the contiguous checkpoint"""
+        with self._lock:
+            self._landed[offset] = length
+            checkpoint = self._checkpoint
+            while checkpoint in self._landed:
+                checkpoint += self._landed.pop(checkpoint)
+            advanced = checkpoint != self._checkpoint
+            self._checkpoint = checkpoint
+        if advanced and self.on_checkpoint:
+            self.on_checkpoint(checkpoint)
+
+    def _add_progress(self, index, moved):
+        """Count moved bytes (negative to roll back a failed range) and report progress"""
+        with self._lock:
+            self._done += moved
+            self._stream_stats[index][0] += moved
+            done = self._done
+        if self.on_progress:
+            self.on_progress(done, self.size)
+
+    def _popen(self, port, command, **kwargs):
+        proc = subprocess.Popen(
+            ssh_argv(port, self.remote_user, self.key_path, command, self.compress),
+            stderr=subprocess.DEVNULL,
+            **kwargs,
+            **self.popen_kwargs
+        )
+        if self.on_process:
+            self.on_process(proc)
+        return proc
+
+    def _remote(self, command):
+        """Run a short command over the first stream and return its output"""
+        result = subprocess.run(
+            ssh_argv(self.ports[0], self.remote_user, self.key_path, command),
+            capture_output=True, text=True, timeout=600, **self.popen_kwargs
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"'{command}' failed: {result.stderr.strip() or result.returncode}")
+        return result.stdout
+
+
+def local_sha256(path, length=None):
+    """SHA-256 of a local file, or of its first length bytes"""
+    digest = hashlib.sha256()
+    remaining = length
+    with open(path, 'rb') as f:
+        while remaining is None or remaining > 0:
+            block = f.read(ChunkedTransfer.CHUNK_ALIGN if remaining is None
+                           else min(ChunkedTransfer.CHUNK_ALIGN, remaining))
+            if not block:
+                break
+            digest.update(block)
+            if remaining is not None:
+                remaining -= len(block)
+    return digest.hexdigest()
+
+
+def remote_sha256(local_port, remote_user, key_path, remote_path, length=None, popen_kwargs=None):
+    """SHA-256 of a remote file, or of its first length bytes; None if it cannot be read"""
+    quoted = remote_quote(remote_path)
+    command = f"sha256sum < {quoted}" if length is None else f"test -f {quoted} && head -c {int(length)} {quoted} | sha256sum"
+    result = subprocess.run(
+        ssh_argv(local_port, remote_user, key_path, command),
+        capture_output=True, text=True, timeout=600, **(popen_kwargs or {})
+    )
+    output = result.stdout.split()
+    return output[0] if result.returncode == 0 and output else None
+
+
+def remote_stat(local_port, remote_user, key_path, remote_path, child=None, popen_kwargs=None, sample=False):
+    """Look up a remote path with a single ssh call
+
+    Args:
+        child: for a directory, also report the size of its file of this name
+            (the target of an upload into the directory).
+        sample: also report the total size of a directory (du -k) and, for
+            data of at least COMPRESSION_MIN_SIZE, how well SAMPLE_BUDGET
+            bytes of it compress with gzip on the instance: SAMPLE_COUNT
+            windows spread evenly over a file, or the start of a
+            directory's tar stream (which cannot be skipped through).
+
+    Returns:
+        dict with 'kind' ('dir', 'file', or None if missing or unreachable);
+        'size': the size of a file, or of the directory's child file, None
+        when there is no such file; 'total': the size of a sampled directory;
+        'ratio': raw size / compressed size of the sample, None if not sampled.
+        Everything is None when the lookup fails or times out.
+    """
+    quoted = remote_quote(remote_path)
+    parent, name = os.path.split(remote_path.rstrip('/'))
+    # Sampled data is at least SAMPLE_BUDGET bytes, so every sample is exactly
+    # that long and only the gzipped side needs counting
+    gzipped = f"head -c {SAMPLE_BUDGET} | gzip -{SAMPLE_LEVEL} | wc -c"
+    window = SAMPLE_BUDGET // SAMPLE_COUNT
+    windows = (f"for i in {' '.join(str(i) for i in range(SAMPLE_COUNT))}; do "
+               f"dd if={quoted} bs={window} skip=$((n / {window} * i / {SAMPLE_COUNT})) count=1 2>/dev/null; done")
+    archive = f"tar cf - -C {remote_quote(parent or '/')} {shlex.quote(name)} 2>/dev/null"
+    command = f"if test -d {quoted}; then echo dir; "
+    if child:
+        target = remote_quote(remote_path.rstrip('/') + '/' + child)
+        command += f"test -f {target} && echo size $(wc -c < {target}); "
+    if sample:
+        command += (f"kb=$(du -sk {quoted} | cut -f1); echo total $kb; "
+                    f"test \"$kb\" -ge {COMPRESSION_MIN_SIZE // 1024} && echo gzip "
+                    f"$({archive} | {gzipped}); ")
+    command += f"elif test -f {quoted}; then echo file; n=$(wc -c < {quoted}); echo size $n; "
+    if sample:
+        command += f"test \"$n\" -ge {COMPRESSION_MIN_SIZE} && echo gzip $({windows} | {gzipped}); "
+    command += "fi"
+    try:
+        result = subprocess.run(
+            ssh_argv(local_port, remote_user, key_path, command),
+            capture_output=True, text=True, timeout=120 if sample else 60, **(popen_kwargs or {})
+        )
+    except (subprocess.SubprocessError, OSError) as e:
+        logger.warning(f"Could not look up {remote_path} on the instance: {str(e)}")
+        return {'kind': None, 'size': None, 'total': None, 'ratio': None}
+
+    lines = result.stdout.splitlines()
+    kind = lines[0].strip() if lines and lines[0].strip() in ('dir', 'file') else None
+    fields = {}
+    for line in lines[1:] if kind else []:
+        label, _, value = line.partition(' ')
+        if value.strip().isdigit():
+            fields[label] = int(value)
+    total = fields['total'] * 1024 if 'total' in fields else None
+    ratio = SAMPLE_BUDGET / fields['gzip'] if fields.get('gzip') else None
+    return {'kind': kind, 'size': fields.get('size'), 'total': total, 'ratio': ratio}
+
+
+class TransferCheckpoints:
+    """How far each interrupted file transfer got, so a retry can resume it
+
+    Keyed by (instance_id, direction, local_path, remote_path) as given in
+    the transfer request, so a retry finds its entry without asking the
+    instance first. An entry records the file size and the offset below
+    which the destination is known to be complete; it only counts while the
+    size still matches.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._offsets = {}
+
+    def record(self, key, size, offset):
+        with self._lock:
+            self._offsets[key] = (size, offset)
+
+    def get(self, key, size):
+        """Return the recorded offset for a file of this size, or None"""
+        with self._lock:
+            recorded = self._offsets.get(key)
+        if recorded is None or recorded[0] != size:
+            return None
+        return recorded[1]
+
+    def clear(self, key):
+        with self._lock:
+            self._offsets.pop(key, None)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._offsets
+
+
+def _sample_file(path, budget):
+    """Read up to SAMPLE_COUNT blocks spread evenly over a local file"""
+    size = os.path.getsize(path)
+    count = max(1, min(SAMPLE_COUNT, budget // SAMPLE_SIZE))
+    blocks = []
+    with open(path, 'rb') as f:
+        for i in range(count):
+            f.seek(size * i // count)
+            blocks.append(f.read(SAMPLE_SIZE))
+    return b''.join(blocks)
+
+
+def local_compression_ratio(path):
+    """Estimate how well a local file or directory tree compresses
+
+    Samples blocks from the start, middle and end of each file (walking a
+    directory until SAMPLE_BUDGET bytes are collected) and compresses them
+    the way gzip and ssh -C would. Returns raw size / compressed size, or
+    None if nothing could be read.
+    """
+    if os.path.isdir(path):
+        files = (os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+    else:
+        files = iter([path])
+
+    sample = b''
+    try:
+        for name in files:
+            if len(sample) >= SAMPLE_BUDGET:
+                break
+            if os.path.isfile(name) and not os.path.islink(name):
+                sample += _sample_file(name, SAMPLE_BUDGET - len(sample))
+    except OSError as e:
+        logger.debug(f"Could not sample {path}: {str(e)}")
+    if not sample:
+        return None
+    return len(sample) / len(zlib.compress(sample, SAMPLE_LEVEL))
+
+
+class _CountingStream:
+    """File object wrapper that counts the bytes read or written through it"""
+
+    def __init__(self, stream, on_count=None):
+        self.stream = stream
+        self.count = 0
+        self.on_count = on_count
+
+    def _add(self, n):
+        self.count += n
+        if self.on_count:
+            self.on_count(n)
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        self._add(len(data))
+        return data
+
+    def write(self, data):
+        written = self.stream.write(data)
+        self._add(len(data))
+        return written
+
+    def close(self):
+        self.stream.close()
+
+
+class TarStreamTransfer:
+    """Moves a file or directory tree as one gzip-compressed tar stream over ssh
+
+    For uploads the tar stream is built locally with tarfile and unpacked by
+    'tar xzf -' on the instance; for downloads 'tar czf -' runs on the
+    instance and the stream is unpacked locally. One stream instead of one
+    scp round trip per file suits trees of many small, compressible files.
+    Bytes are counted on both sides of the compressor, so run() reports the
+    effective (uncompressed) throughput next to the one on the wire.
+    """
+
+    def __init__(self, direction, local_path, remote_path, local_port, remote_user, key_path,
+                 total=None, on_progress=None, should_stop=None, popen_kwargs=None, on_process=None):
+        """
+        Args:
+            direction: 'upload' or 'download'.
+            local_path: file or directory to send (upload), or the directory to unpack into (download).
+            remote_path: directory to unpack into (upload), or file or directory to fetch (download).
+            total: uncompressed size in bytes, if known, for progress.
+            on_progress: called with (raw_bytes, wire_bytes, total).
+            should_stop, popen_kwargs, on_process: as for ChunkedTransfer.
+        """
+        self.direction = direction
+        self.local_path = local_path
+        self.remote_path = remote_path
+        self.local_port = local_port
+        self.remote_user = remote_user
+        self.key_path = key_path
+        self.total = total
+        self.on_progress = on_progress
+        self.should_stop = should_stop or (lambda: False)
+        self.popen_kwargs = popen_kwargs or {}
+        self.on_process = on_process
+        self._raw = 0
+        self._wire = None
+
+    def run(self):
+        """Transfer the tree; raises RuntimeError on failure"""
+        started = time.monotonic()
+        if self.direction == 'upload':
+            self._upload()
+        else:
+            self._download()
+        elapsed = time.monotonic() - started
+
+        wire = self._wire.count
+        stats = {
+            'bytes': self._raw,
+            'wire_bytes': wire,
+            'elapsed': round(elapsed, 2),
+            'compression_ratio': round(self._raw / wire, 2) if wire else None,
+            'throughput': self._raw / elapsed if elapsed else 0,
+            'wire_throughput': wire / elapsed if elapsed else 0,
+        }
+        logger.info(f"Tar stream {self.direction} of {self._raw} bytes as {wire} on the wire "
+                    f"({stats['compression_ratio']}x) in {stats['elapsed']}s")
+        return stats
+
+    def _popen(self, command, **kwargs):
+        proc = subprocess.Popen(
+            ssh_argv(self.local_port, self.remote_user, self.key_path, command),
+            stderr=subprocess.PIPE,
+            **kwargs,
+            **self.popen_kwargs
+        )
+        if self.on_process:
+            self.on_process(proc)
+        return proc
+
+    def _report(self, raw):
+        self._raw += raw
+        if self.on_progress:
+            self.on_progress(self._raw, self._wire.count, self.total)
+
+    def _upload(self):
+        local = self.local_path.rstrip('/\\')
+        proc = self._popen(f"tar xzf - -C {remote_quote(self.remote_path)}", stdin=subprocess.PIPE)
+        self._wire = _CountingStream(proc.stdin)
+        try:
+            with tarfile.open(fileobj=self._wire, mode='w|gz') as tar:
+                for path, arcname in self._walk(local, os.path.basename(local)):
+                    if self.should_stop():
+                        raise RuntimeError('Transfer cancelled.')
+                    info = tar.gettarinfo(path, arcname)
+                    if info.isreg():
+                        with open(path, 'rb') as f:
+                            tar.addfile(info, _CountingStream(f, self._report))
+                    else:
+                        tar.addfile(info)
+        except (OSError, ValueError) as e:
+            # Broken pipe: the remote tar is gone, its exit code says why
+            logger.debug(f"Tar stream to {self.remote_path} interrupted: {str(e)}")
+        finally:
+            try:
+                proc.stdin.close()
+            except OSError:
+                pass
+            error = proc.stderr.read().decode('utf-8', errors='replace').strip()
+            proc.wait()
+        if proc.returncode != 0:
+            raise RuntimeError(f"Remote tar exited with code {proc.returncode}: {error}")
+
+    def _download(self):
+        parent, name = os.path.split(self.remote_path.rstrip('/'))
+        proc = self._popen(
+            f"tar czf - -C {remote_quote(parent or '/')} {shlex.quote(name)}",
+            stdout=subprocess.PIPE
+        )
+        self._wire = _CountingStream(proc.stdout)
+        extract = {'filter': 'data'} if hasattr(tarfile, 'data_filter') else {}
+        try:
+            with tarfile.open(fileobj=self._wire, mode='r|gz') as tar:
+                for member in tar:
+                    if self.should_stop():
+                        raise RuntimeError('Transfer cancelled.')
+                    if not extract and (member.name.startswith(('/', '..')) or '/../' in member.name):
+                        raise RuntimeError(f"Refusing unsafe path in archive: {member.name}")
+                    tar.extract(member, self.local_path, **extract)
+                    self._report(member.size if member.isreg() else 0)
+        finally:
+            proc.stdout.close()
+            error = proc.stderr.read().decode('utf-8', errors='replace').strip()
+            proc.wait()
+        if proc.returncode != 0:
+            raise RuntimeError(f"Remote tar exited with code {proc.returncode}: {error}")
+
+    @staticmethod
+    def _walk(path, arcname):
+        """Yield (path, arcname) for path and, for a directory, everything below it"""
+        yield path, arcname
+        if os.path.isdir(path) and not os.path.islink(path):
+            for root, dirs, names in os.walk(path):
+                rel = os.path.relpath(root, path)
+                base = arcname if rel == '.' else f"{arcname}/{rel.replace(os.sep, '/')}"
+                for name in sorted(dirs) + sorted(names):
+                    yield os.path.join(root, name), f"{base}/{name}"
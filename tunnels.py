@@ -0,0 +1,330 @@
+from collections import deque
+import psutil
+import logging
+import os
+import re
+import selectors
+import socket
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# session-manager-plugin output that means the local port is accepting connections
+READY_MARKERS = ('Waiting for connections', 'opened for sessionId')
+
+# "Starting session with SessionId: user-0a1b2c3d4e5f"
+SESSION_ID_PATTERN = re.compile(r'SessionId:?\s+([A-Za-z0-9-]+)', re.IGNORECASE)
+
+# wait_ready checks the ready event every READY_POLL_INTERVAL seconds and falls
+# back to a TCP probe of the local port every PROBE_INTERVAL seconds
+READY_POLL_INTERVAL = 0.1
+PROBE_INTERVAL = 0.5
+
+# Lines of output kept per session process
+OUTPUT_BUFFER_LINES = 200
+
+# Bytes read from a session's output pipe at a time
+READ_SIZE = 64 * 1024
+
+
+def probe_port(port, host='127.0.0.1', timeout=0.2):
+    """Return True if something accepts TCP connections on host:port"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        return sock.connect_ex((host, port)) == 0
+    except OSError:
+        return False
+    finally:
+        sock.close()
+
+
+class TunnelProcess:
+    """Process tree of one session, tracked from the Popen handle that started it
+
+    The Popen handle is the root of the tree (the launcher's wrapper host such
+    as powershell.exe, or the aws CLI itself); session-manager-plugin runs as
+    one of its descendants. Descendants
+    seen once are remembered so they can still be terminated if the root
+    exits first and they get re-parented.
+
+    For port forwards the 'ready' event is set as soon as the plugin reports
+    that the local port is listening (see READY_MARKERS). The captured output
+    (the launchers merge stderr into stdout) is drained continuously by the
+    supervisor into a bounded ring buffer so a chatty session can never fill
+    the OS pipe buffer and stall.
+    """
+
+    def __init__(self, popen, local_port=None, supervisor=None):
+        self.popen = popen
+        self.pid = popen.pid
+        self.local_port = local_port
+        self.session_id = None
+        self.ready = threading.Event()
+        self.output = deque(maxlen=OUTPUT_BUFFER_LINES)
+        self._descendants = {}
+        self._ready_lock = threading.Lock()
+        self._ready_callbacks = []
+
+        if popen.stdout is not None:
+            (supervisor or shared_supervisor()).drain(self)
+
+    def feed(self, raw):
+        """Add one line of output to the ring buffer, watching for the session ID and readiness"""
+        line = raw.decode('utf-8', errors='replace').strip()
+        if not line:
+            return
+        self.output.append((time.time(), 'output', line))
+        if self.session_id is None:
+            match = SESSION_ID_PATTERN.search(line)
+            if match:
+                self.session_id = match.group(1)
+        if not self.ready.is_set() and any(marker in line for marker in READY_MARKERS):
+            logger.debug(f"Session process {self.pid} ready: {line}")
+            self._set_ready()
+
+    def on_ready(self, callback):
+        """Call callback(tunnel) once the tunnel is ready, right away if it already is"""
+        with self._ready_lock:
+            if not self.ready.is_set():
+                self._ready_callbacks.append(callback)
+                return
+        callback(self)
+
+    def _set_ready(self):
+        with self._ready_lock:
+            if self.ready.is_set():
+                return
+            self.ready.set()
+            callbacks, self._ready_callbacks = self._ready_callbacks, []
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception as e:
+                logger.error(f"Error in ready callback of session process {self.pid}: {str(e)}")
+
+    def probe(self):
+        """TCP probe of local_port (fallback when the output does not show the marker); True if ready"""
+        if not self.ready.is_set() and self.local_port and probe_port(self.local_port):
+            self._set_ready()
+        return self.ready.is_set()
+
+    def wait_ready(self, timeout, should_stop=None):
+        """Wait until the tunnel accepts connections
+
+        Returns as soon as the ready event is set from the plugin output, or a
+        TCP probe of local_port succeeds (fallback when the output does not
+        show the marker). Returns False on timeout, when the process exits, or
+        when should_stop() returns True.
+        """
+        deadline = time.monotonic() + timeout
+        next_probe = time.monotonic() + PROBE_INTERVAL
+        while time.monotonic() < deadline:
+            if self.ready.wait(READY_POLL_INTERVAL):
+                return True
+            if not self.is_running():
+                return False
+            if should_stop is not None and should_stop():
+                return False
+            if self.local_port and time.monotonic() >= next_probe:
+                next_probe = time.monotonic() + PROBE_INTERVAL
+                if self.probe():
+                    return True
+        return self.ready.is_set()
+
+    def get_output(self):
+        """Return the buffered output lines, oldest first"""
+        return [
+            {
+                'time': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(ts)),
+                'stream': name,
+                'line': line,
+            }
+            for ts, name, line in list(self.output)
+        ]
+
+    def is_running(self):
+        """True while the root process has not exited"""
+        return self.popen.poll() is None
+
+    def children(self):
+        """Return the live descendants of the root process"""
+        if self.is_running():
+            try:
+                for child in psutil.Process(self.pid).children(recursive=True):
+                    self._descendants.setdefault(child.pid, child)
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                pass
+        return [p for p in self._descendants.values() if p.is_running()]
+
+    def terminate(self, timeout=3):
+        """Terminate the whole tree, killing whatever survives timeout seconds"""
+        procs = self.children()
+        if self.is_running():
+            try:
+                procs.append(psutil.Process(self.pid))
+            except psutil.NoSuchProcess:
+                pass
+
+        for proc in procs:
+            try:
+                proc.terminate()
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                pass
+
+        gone, alive = psutil.wait_procs(procs, timeout=timeout)
+        for proc in alive:
+            try:
+                proc.kill()
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                pass
+
+    def wait(self, timeout=None):
+        """Wait for the root process to exit and return its exit code"""
+        return self.popen.wait(timeout=timeout)
+
+
+class TunnelSupervisor:
+    """Single thread that watches every tracked session process
+
+    Replaces one blocking monitor thread per connection: the supervisor
+    polls the Popen handle of each watched tunnel every poll_interval
+    seconds and calls its on_exit(key, tunnel) callback once the root
+    process exits, and probes the local port of watched tunnels that are
+    not ready yet every PROBE_INTERVAL seconds. The same thread drains the output pipe of every session
+    process through a selector (non-blocking reads), so the thread count
+    does not grow with the number of tunnels. Windows cannot select on
+    pipes; there each session gets one reader thread instead. The thread
+    starts with the first watched tunnel or drained pipe and sleeps while
+    there is neither.
+    """
+
+    def __init__(self, poll_interval=0.2):
+        self.poll_interval = poll_interval
+        self._watched = {}
+        self._pending = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._selector = selectors.DefaultSelector() if os.name == 'posix' else None
+        self._next_probe = 0
+
+    def watch(self, key, tunnel, on_exit):
+        """Start watching tunnel; on_exit(key, tunnel) runs on the supervisor thread"""
+        with self._lock:
+            self._watched[key] = (tunnel, on_exit)
+            self._start()
+        self._wakeup.set()
+
+    def unwatch(self, key):
+        """Stop watching key without calling its callback"""
+        with self._lock:
+            self._watched.pop(key, None)
+
+    def watched_count(self):
+        with self._lock:
+            return len(self._watched)
+
+    def drain(self, tunnel):
+        """Feed the output pipe of tunnel into tunnel.feed() until it closes"""
+        stream = tunnel.popen.stdout
+        if self._selector is None:
+            threading.Thread(target=self._drain_blocking, args=(tunnel, stream), daemon=True).start()
+            return
+        os.set_blocking(stream.fileno(), False)
+        with self._lock:
+            # Registered by the supervisor thread itself, never while it selects
+            self._pending.append((tunnel, stream))
+            self._start()
+        self._wakeup.set()
+
+    def _start(self):
+        """Start the supervisor thread; lock must be held"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='tunnel-supervisor', daemon=True)
+            self._thread.start()
+
+    @staticmethod
+    def _drain_blocking(tunnel, stream):
+        try:
+            for raw in iter(stream.readline, b''):
+                tunnel.feed(raw)
+        except (OSError, ValueError):
+            pass
+
+    def _read(self, key):
+        """Read what is available on one registered pipe, feeding complete lines"""
+        tunnel, buffer = key.data
+        try:
+            data = os.read(key.fd, READ_SIZE)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self._selector.unregister(key.fileobj)
+            key.fileobj.close()
+            if buffer:
+                tunnel.feed(bytes(buffer))
+            return
+        buffer += data
+        *lines, rest = buffer.split(b'\n')
+        buffer[:] = rest
+        for line in lines:
+            tunnel.feed(line)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                watched = list(self._watched.items())
+                pending, self._pending = self._pending, []
+            for tunnel, stream in pending:
+                self._selector.register(stream, selectors.EVENT_READ, (tunnel, bytearray()))
+            draining = self._selector is not None and bool(self._selector.get_map())
+
+            if not watched and not draining:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+
+            if draining:
+                for key, _ in self._selector.select(self.poll_interval):
+                    self._read(key)
+
+            if time.monotonic() >= self._next_probe:
+                self._next_probe = time.monotonic() + PROBE_INTERVAL
+                for _, (tunnel, _) in watched:
+                    if tunnel.local_port and not tunnel.ready.is_set() and tunnel.is_running():
+                        tunnel.probe()
+
+            for key, (tunnel, on_exit) in watched:
+                if tunnel.is_running():
+                    continue
+                with self._lock:
+                    # Skip if it was unwatched (or replaced) in the meantime
+                    if self._watched.get(key, (None,))[0] is not tunnel:
+                        continue
+                    del self._watched[key]
+                logger.debug(f"Session process {tunnel.pid} ({key}) exited with code {tunnel.popen.returncode}")
+                try:
+                    on_exit(key, tunnel)
+                except Exception as e:
+                    logger.error(f"Error handling exit of {key}: {str(e)}")
+
+            if not draining:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+
+_shared_supervisor = None
+_shared_lock = threading.Lock()
+
+
+def shared_supervisor():
+    """Return the process-wide TunnelSupervisor that drains every session's output"""
+    global _shared_supervisor
+    with _shared_lock:
+        if _shared_supervisor is None:
+            _shared_supervisor = TunnelSupervisor()
+        return _shared_supervisor